@@ -12,6 +12,8 @@ from datetime import datetime, date
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, PROJECT_ROOT)
 
+from src import tax_rules
+
 # Load investment data
 DATA_PATH = os.path.join(PROJECT_ROOT, "datasets", "investment_data.json")
 try:
@@ -114,11 +116,7 @@ def format_inr(amount): return f"₹{amount:,.0f}"
 
 def compute_tax(taxable_income):
     """Calculate tax under New Tax Regime (Mandatory from FY 2025-26)"""
-    tax = 0.0
-    slabs = [(0, 300000, 0.0), (300000, 600000, 0.05), (600000, 900000, 0.10), (900000, 1200000, 0.15), (1200000, 1500000, 0.20), (1500000, float("inf"), 0.30)]
-    for lower, upper, rate in slabs:
-        if taxable_income > lower: tax += (min(taxable_income, upper) - lower) * rate
-    return 0.0 if taxable_income <= 700000 else tax * 1.04
+    return tax_rules.compute_tax(taxable_income)
 
 # ======================================================
 # SIDEBAR
@@ -604,8 +602,8 @@ elif page == "📈 Investment Optimizer":
         base_gross = base_salary + base_other_income
         mod_gross = mod_salary + mod_other_income
 
-        base_taxable = max(0, base_gross - 50000)
-        mod_taxable = max(0, mod_gross - 50000)
+        base_taxable = tax_rules.taxable_income_from_gross(base_gross)
+        mod_taxable = tax_rules.taxable_income_from_gross(mod_gross)
 
         base_tax = compute_tax(base_taxable)
         mod_tax = compute_tax(mod_taxable)
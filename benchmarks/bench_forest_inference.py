@@ -0,0 +1,114 @@
+"""
+Forest Inference Benchmark
+==========================
+Single-row latency and batch throughput of the flattened forest
+(src/forest_inference.py) against sklearn's predict_proba, the largest
+probability difference between the two, and the time to load each from
+disk (joblib unpickling vs memory-mapping the exported arrays).
+
+Uses models/itr_risk_rf.pkl when it holds a trained forest; otherwise a
+stand-in with the training defaults (300 trees, unbounded depth) is
+fitted on synthetic filings.
+
+To run: python benchmarks/bench_forest_inference.py [batch rows ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.forest_inference import FlatForest
+
+MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "itr_risk_rf.pkl")
+DEFAULT_SIZES = [100, 10_000, 100_000]
+SINGLE_CALLS = 500
+N_FEATURES = 13
+
+
+def make_rows(n: int, seed: int = 42) -> np.ndarray:
+    """Rupee-scale feature rows (salary, deductions, expenses)."""
+    rng = np.random.default_rng(seed)
+    salary = rng.integers(3, 40, n) * 100_000.0
+    return np.column_stack([salary] + [rng.uniform(0, 0.3, n) * salary for _ in range(N_FEATURES - 1)])
+
+
+def load_forest():
+    try:
+        model = joblib.load(MODEL_PATH)["model"]
+        model.estimators_
+        return model, MODEL_PATH
+    except Exception:
+        X = make_rows(100_000, seed=7)
+        y = (X[:, 1:6].sum(axis=1) > 0.7 * X[:, 0]).astype(int)
+        model = RandomForestClassifier(n_estimators=300, random_state=42, class_weight="balanced", n_jobs=-1)
+        model.fit(X, y)
+        model.set_params(n_jobs=None)
+        return model, "stand-in 300-tree forest"
+
+
+def single_row_ms(predictor, rows: np.ndarray) -> np.ndarray:
+    timings = np.empty(SINGLE_CALLS)
+    for i in range(SINGLE_CALLS):
+        row = rows[i % len(rows)].reshape(1, -1)
+        start = time.perf_counter()
+        predictor.predict_proba(row)
+        timings[i] = time.perf_counter() - start
+    return timings * 1000
+
+
+def batch_rate(predictor, rows: np.ndarray) -> float:
+    start = time.perf_counter()
+    predictor.predict_proba(rows)
+    return len(rows) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    model, source = load_forest()
+    start = time.perf_counter()
+    flat = FlatForest.from_sklearn(model)
+    export_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pickle_path = os.path.join(tmp_dir, "forest.pkl")
+        joblib.dump(model, pickle_path)
+        flat.save(os.path.join(tmp_dir, "flat"))
+        start = time.perf_counter()
+        joblib.load(pickle_path)
+        pickle_load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        FlatForest.load(os.path.join(tmp_dir, "flat"), mmap_mode="r")
+        mmap_load_s = time.perf_counter() - start
+
+    rows = make_rows(max(sizes + [SINGLE_CALLS]))
+    check = rows[:10_000]
+    max_diff = np.abs(flat.predict_proba(check) - model.predict_proba(check)).max()
+
+    print("=" * 60)
+    print("FOREST INFERENCE BENCHMARK")
+    print("=" * 60)
+    print(f"Model: {source} ({flat.n_trees} trees, {len(flat.feature):,} nodes, depth {flat.max_depth})")
+    print(f"Export: {export_s:.2f}s, {flat.nbytes / 1e6:.1f} MB of arrays")
+    print(f"Load: joblib {pickle_load_s:.3f}s vs memory-mapped arrays {mmap_load_s:.4f}s")
+    print(f"Max |proba difference| vs sklearn on {len(check):,} rows: {max_diff:.2e}\n")
+
+    print("Single row (one filing):")
+    for name, predictor in (("sklearn", model), ("flat", flat)):
+        timings = single_row_ms(predictor, rows)
+        print(f"   {name:<8} median {np.median(timings):7.3f} ms   p99 {np.percentile(timings, 99):7.3f} ms")
+
+    print("\nBatch:")
+    for n in sizes:
+        sklearn_rate = batch_rate(model, rows[:n])
+        flat_rate = batch_rate(flat, rows[:n])
+        print(f"   {n:>9,} rows: sklearn {sklearn_rate:>12,.0f} rows/s   flat {flat_rate:>12,.0f} rows/s"
+              f"   ({flat_rate / sklearn_rate:.2f}x)")
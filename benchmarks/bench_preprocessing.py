@@ -0,0 +1,109 @@
+"""
+Preprocessing Benchmark
+=======================
+Wall time of run_preprocessing in memory, streamed under several memory
+budgets and partitioned on process pools, and a check that every mode
+writes the same bytes (random fills are drawn per fixed partition of
+PARTITION_ROWS rows, so chunking and worker counts must not show).
+
+Source datasets are generated into a temporary directory; the default
+size spans several partitions.
+
+To run: python benchmarks/bench_preprocessing.py [rows]
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.data_preprocessing import PARTITION_ROWS, run_preprocessing
+
+DEFAULT_ROWS = 3 * PARTITION_ROWS + 12_345  # ends mid-partition
+CITIES = ["Mumbai", "Delhi", "Bangalore", "Chennai", "Kolkata", "Hyderabad"]
+
+# (label, run_preprocessing keyword arguments)
+MODES = [
+    ("in memory", {}),
+    ("streaming, 1 MB", {"streaming": True, "max_memory_mb": 1}),
+    ("streaming, 16 MB", {"streaming": True, "max_memory_mb": 16}),
+    ("streaming, 33,333 rows", {"streaming": True, "chunk_rows": 33_333}),
+    ("2 workers, 4 MB", {"workers": 2, "max_memory_mb": 4}),
+    ("4 workers", {"workers": 4}),
+]
+
+
+def make_sources(directory: str, n: int, seed: int = 42) -> tuple:
+    """Synthetic users (half without rent), spending habits and city rents"""
+    rng = np.random.default_rng(seed)
+    salary = rng.integers(30, 400, n) * 10_000
+    pd.DataFrame({
+        "User_ID": np.arange(n),
+        "Annual_Salary": salary,
+        "City": rng.choice(CITIES, n),
+        "Rent_Paid": np.where(rng.random(n) < 0.5, np.nan, (salary * 0.2).round()),
+        "Investment_80C": rng.integers(0, 200_000, n),
+        "Medical_Insurance_80D": rng.integers(0, 40_000, n),
+        "NPS_Contribution_80CCD": rng.integers(0, 60_000, n),
+        "Home_Loan_Interest_24b": rng.integers(0, 200_000, n),
+        "Donations_80G": rng.integers(0, 50_000, n),
+    }).to_csv(os.path.join(directory, "synthetic.csv"), index=False)
+
+    m = 3_000  # sparse salaries, so many users fall back to random fills
+    pd.DataFrame({
+        "Income": rng.integers(30, 400, m) * 10_000,
+        "Rent": rng.integers(50_000, 300_000, m),
+        "Groceries": rng.integers(20_000, 100_000, m),
+        "Utilities": rng.integers(5_000, 50_000, m),
+        "Healthcare": rng.integers(5_000, 50_000, m),
+        "Education": rng.integers(0, 100_000, m),
+        "Entertainment": rng.integers(0, 100_000, m),
+    }).to_csv(os.path.join(directory, "spending.csv"), index=False)
+
+    pd.DataFrame({
+        "City": rng.choice(CITIES, 5_000),
+        "Rent": rng.integers(5_000, 80_000, 5_000),
+    }).to_csv(os.path.join(directory, "rent.csv"), index=False)
+
+    return tuple(os.path.join(directory, name) for name in ("synthetic.csv", "spending.csv", "rent.csv"))
+
+
+def run_mode(sources: tuple, output_path: str, options: dict) -> tuple:
+    """(seconds, sha256 of the output file) for one run, its progress output muted"""
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        run_preprocessing(*sources, output_path, **options)
+    elapsed = time.perf_counter() - start
+    with open(output_path, "rb") as f:
+        return elapsed, hashlib.sha256(f.read()).hexdigest()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+
+    print("=" * 60)
+    print("PREPROCESSING BENCHMARK")
+    print("=" * 60)
+    print(f"{n:,} users, {PARTITION_ROWS:,} rows per random-fill partition\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = make_sources(tmp, n)
+        digests = {}
+        for i, (label, options) in enumerate(MODES):
+            elapsed, digest = run_mode(sources, os.path.join(tmp, f"out_{i}.csv"), options)
+            digests[label] = digest
+            print(f"{label:<24} {elapsed:8.2f}s  {n / elapsed:>12,.0f} rows/s  sha256 {digest[:12]}")
+
+    reference = digests[MODES[0][0]]
+    differing = [label for label, digest in digests.items() if digest != reference]
+    if differing:
+        raise SystemExit(f"❌ Output differs from the in-memory pass: {', '.join(differing)}")
+    print(f"\n✅ All {len(MODES)} modes wrote identical output")
@@ -0,0 +1,112 @@
+"""
+Recommendation Engine Benchmark
+===============================
+Throughput of the vectorized rules (evaluate_recommendations +
+render_recommendations) against the three row-wise df.apply passes they
+replace, an exact text comparison between the two, and the cost of the
+coded output the pipeline stores instead of text.
+
+To run: python benchmarks/bench_recommendations.py [rows ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.recommendation_engine import (
+    decode_recommendations,
+    encode_recommendations,
+    evaluate_recommendations,
+    render_recommendations,
+    suggest_expenses,
+    suggest_investments,
+    suggest_tax_planning,
+)
+from src.tax_rules import compute_tax_batch
+
+DEFAULT_SIZES = [1_000_000]
+APPLY_SAMPLE = 100_000  # row-wise baseline is timed on a sample only
+
+
+def make_frame(n: int, seed: int = 42) -> pd.DataFrame:
+    """Tax results shaped like final_tax_results.csv, hitting every rule branch."""
+    rng = np.random.default_rng(seed)
+    salary = rng.integers(200_000, 4_000_000, n)
+    df = pd.DataFrame({
+        "Annual_Salary": salary,
+        "Investment_80C": rng.integers(0, 200_000, n),
+        "NPS_Contribution_80CCD": rng.integers(0, 70_000, n),
+        "Medical_Insurance_80D": rng.integers(0, 40_000, n),
+        "Entertainment": rng.uniform(0, 0.2, n) * salary,
+        "Groceries": rng.uniform(0, 0.3, n) * salary,
+        "Expense_Ratio": rng.uniform(0.2, 0.9, n).round(2),
+        "Taxable_Income": (salary * rng.uniform(0.5, 1.0, n)).round(),
+    })
+    df["Tax_Amount"] = compute_tax_batch(df["Taxable_Income"].to_numpy())
+    return df
+
+
+def vectorized(df: pd.DataFrame) -> dict:
+    return render_recommendations(evaluate_recommendations(df))
+
+
+def row_wise(df: pd.DataFrame) -> dict:
+    return {
+        "Recommendation_Investments": df.apply(suggest_investments, axis=1).to_numpy(),
+        "Recommendation_Expenses": df.apply(suggest_expenses, axis=1).to_numpy(),
+        "Recommendation_Tax_Planning": df.apply(suggest_tax_planning, axis=1).to_numpy(),
+    }
+
+
+def count_mismatches(df: pd.DataFrame) -> int:
+    """Differences from df.apply, rendering both directly and via the stored codes"""
+    expected = row_wise(df)
+    rules = evaluate_recommendations(df)
+    mismatches = 0
+    for actual in (render_recommendations(rules), render_recommendations(decode_recommendations(encode_recommendations(rules)))):
+        mismatches += sum(int((expected[name] != actual[name]).sum()) for name in expected)
+    return mismatches
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    sample = make_frame(APPLY_SAMPLE)
+    mismatches = count_mismatches(sample)
+    start = time.perf_counter()
+    row_wise(sample)
+    apply_rate = APPLY_SAMPLE / (time.perf_counter() - start)
+
+    print("=" * 60)
+    print("RECOMMENDATION ENGINE BENCHMARK")
+    print("=" * 60)
+    print(f"Text mismatches vs df.apply on {APPLY_SAMPLE:,} rows: {mismatches}")
+    print(f"3 x df.apply(suggest_*): {apply_rate:>14,.0f} rows/s\n")
+
+    for n in sizes:
+        df = make_frame(n)
+
+        start = time.perf_counter()
+        rules = evaluate_recommendations(df)
+        evaluate_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = render_recommendations(rules)
+        render_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        codes = encode_recommendations(rules)
+        encode_s = time.perf_counter() - start
+
+        text_mb = pd.DataFrame(text).memory_usage(deep=True).sum() / 1e6
+        codes_mb = pd.DataFrame(codes).memory_usage(deep=True).sum() / 1e6
+        rate = n / (evaluate_s + render_s)
+        print(f"{n:>12,} rows: evaluate {evaluate_s:6.3f}s  render {render_s:6.3f}s"
+              f"  {rate:>14,.0f} rows/s  ({rate / apply_rate:,.0f}x apply)")
+        print(f"{'':>18}encode {encode_s:6.3f}s  codes {codes_mb:7.1f} MB vs text {text_mb:7.1f} MB in memory")
@@ -0,0 +1,130 @@
+"""
+ITR Risk Engine Benchmark
+=========================
+Throughput of compute_risk_for_frame (vectorized rule checks, one
+predict_proba call per chunk) against compute_risk_for_row applied to
+every row, and a check that both give the same scores and flags.
+
+Uses models/itr_risk_rf.pkl when it is present; otherwise a stand-in
+forest is fitted on the benchmark rows so the ML path is still timed.
+
+To run: python benchmarks/bench_risk_engine.py [rows ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src import itr_risk_engine
+from src.itr_risk_engine import FLAG_NAMES, compute_risk_for_frame, compute_risk_for_row
+
+DEFAULT_SIZES = [1_000_000]
+ROW_SAMPLE = 2_000  # row-wise baseline is timed on a sample only
+FEATURES = [
+    "Annual_Salary", "Total_Deductions", "Taxable_Income", "Rent_Paid", "Investment_80C",
+    "Medical_Insurance_80D", "NPS_Contribution_80CCD", "Home_Loan_Interest_24b", "Donations_80G",
+    "Groceries", "Utilities", "Entertainment", "Healthcare",
+]
+
+# Start of each row-path flag message, by FLAG_* bit
+FLAG_PREFIXES = {
+    itr_risk_engine.FLAG_80C_LIMIT: "Section 80C claimed",
+    itr_risk_engine.FLAG_80D_LIMIT: "Section 80D claimed",
+    itr_risk_engine.FLAG_NPS_LIMIT: "NPS (80CCD) claimed",
+    itr_risk_engine.FLAG_DEDUCTION_RATIO: "Total deductions are",
+    itr_risk_engine.FLAG_DONATION_RATIO: "Donations are",
+    itr_risk_engine.FLAG_EXPENSE_RATIO: "Key expenses are",
+    itr_risk_engine.FLAG_RENT_RATIO: "Rent is",
+}
+
+
+def make_filings(n: int, seed: int = 42) -> pd.DataFrame:
+    """Filings shaped like the training data, hitting every rule check."""
+    rng = np.random.default_rng(seed)
+    salary = rng.integers(0, 40, n) * 100_000.0
+    df = pd.DataFrame({
+        "Annual_Salary": salary,
+        "Investment_80C": rng.integers(0, 250_000, n),
+        "Medical_Insurance_80D": rng.integers(0, 60_000, n),
+        "NPS_Contribution_80CCD": rng.integers(0, 80_000, n),
+        "Home_Loan_Interest_24b": rng.integers(0, 250_000, n),
+        "Donations_80G": rng.integers(0, 400_000, n),
+        "Rent_Paid": rng.uniform(0, 0.8, n) * salary,
+        "Groceries": rng.uniform(0, 0.2, n) * salary,
+        "Utilities": rng.uniform(0, 0.05, n) * salary,
+        "Entertainment": rng.uniform(0, 0.1, n) * salary,
+        "Healthcare": rng.uniform(0, 0.05, n) * salary,
+    })
+    deduction_cols = ["Investment_80C", "Medical_Insurance_80D", "NPS_Contribution_80CCD",
+                      "Home_Loan_Interest_24b", "Donations_80G"]
+    df["Total_Deductions"] = df[deduction_cols].sum(axis=1)
+    df["Taxable_Income"] = (df["Annual_Salary"] - df["Total_Deductions"]).clip(lower=0)
+    # Missing values, as in hand-entered filings
+    df.loc[rng.random(n) < 0.01, "Rent_Paid"] = np.nan
+    return df
+
+
+def ensure_model(df: pd.DataFrame):
+    if itr_risk_engine.get_risk_model()[0] is not None:
+        print(f"Model: {itr_risk_engine.MODEL_PATH} (row engine: {itr_risk_engine.RISK_ENGINE})")
+        return
+    labels = (df["Total_Deductions"] > 0.5 * df["Annual_Salary"]).to_numpy(dtype=int)
+    model = RandomForestClassifier(n_estimators=100, max_depth=12, random_state=42, n_jobs=-1)
+    model.fit(df[FEATURES].fillna(0).to_numpy(), labels)
+    model.set_params(n_jobs=None)
+    itr_risk_engine.use_model(model, FEATURES)
+    print(f"Model: stand-in 100-tree forest (row engine: {itr_risk_engine.RISK_ENGINE})")
+
+
+def count_mismatches(df: pd.DataFrame, batch: dict) -> int:
+    """Rows whose scores or flags differ from compute_risk_for_row"""
+    mismatches = 0
+    for i, (_, row) in enumerate(df.iterrows()):
+        expected = compute_risk_for_row(row)
+        flags = sum(bit for bit, prefix in FLAG_PREFIXES.items()
+                    if any(message.startswith(prefix) for message in expected["flags"]))
+        mismatches += int(
+            expected["risk_score"] != batch["risk_score"][i]
+            or expected["rule_score"] != batch["rule_score"][i]
+            or expected["ml_score"] != round(float(batch["ml_score"][i]), 2)
+            or flags != batch["flags"][i]
+        )
+    return mismatches
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    sample = make_filings(ROW_SAMPLE)
+    ensure_model(make_filings(50_000, seed=7))
+
+    start = time.perf_counter()
+    for _, row in sample.iterrows():
+        compute_risk_for_row(row)
+    row_rate = ROW_SAMPLE / (time.perf_counter() - start)
+    mismatches = count_mismatches(sample, compute_risk_for_frame(sample))
+
+    print("=" * 60)
+    print("ITR RISK ENGINE BENCHMARK")
+    print("=" * 60)
+    print(f"Score/flag mismatches vs compute_risk_for_row on {ROW_SAMPLE:,} rows: {mismatches}")
+    print(f"compute_risk_for_row: {row_rate:>14,.0f} rows/s\n")
+
+    for n in sizes:
+        df = make_filings(n)
+        start = time.perf_counter()
+        result = compute_risk_for_frame(df)
+        elapsed = time.perf_counter() - start
+        rate = n / elapsed
+        flagged = (result["flags"] != 0).mean() * 100
+        print(f"{n:>12,} rows: {elapsed:7.2f}s  {rate:>14,.0f} rows/s  ({rate / row_rate:,.0f}x row path)"
+              f"  {flagged:.1f}% flagged")
+        for bit, name in FLAG_NAMES.items():
+            print(f"{'':>18}{name:<16} {(result['flags'] & bit != 0).mean() * 100:5.1f}%")
@@ -0,0 +1,104 @@
+"""
+Tax Engine Benchmark
+====================
+Throughput of the compiled-table batch kernel (src/tax_rules.py) against
+the row-wise path it replaced: df.apply over the original tax_engine
+compute_tax slab loop, kept verbatim below as the reference. The kernel's
+slab tax must match that loop; the pipeline's Tax_Amount adds the 4% cess
+on top (compute_tax_batch).
+
+To run: python benchmarks/bench_tax_engine.py [rows ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.tax_rules import compute_tax_batch, get_tax_table, tax_before_cess_batch
+
+DEFAULT_SIZES = [1_000_000, 10_000_000]
+APPLY_SAMPLE = 200_000  # row-wise baseline is timed on a sample only
+# The original slabs and 87A limit are the FY 2024-25 New Regime rules
+BASELINE_TABLE = get_tax_table("2024-25")
+MAX_DIFF_RUPEES = 1e-6
+
+
+def baseline_compute_tax(taxable_income):
+    """The original src/tax_engine.py compute_tax, applied row by row before the kernel"""
+    tax = 0
+
+    slabs = [
+        (0, 300000, 0),
+        (300000, 600000, 0.05),
+        (600000, 900000, 0.10),
+        (900000, 1200000, 0.15),
+        (1200000, 1500000, 0.20),
+        (1500000, float("inf"), 0.30),
+    ]
+
+    for lower, upper, rate in slabs:
+        if taxable_income > lower:
+            taxable_amount = min(taxable_income, upper) - lower
+            tax += taxable_amount * rate
+
+    # Rebate under Section 87A (income ≤ ₹7 lakh)
+    if taxable_income <= 700000:
+        return 0
+
+    return tax
+
+
+def make_incomes(n: int, seed: int = 42) -> np.ndarray:
+    """Taxable incomes spread over every slab, including the 87A cliff."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 4_000_000, n).round()
+
+
+def bench_kernel(incomes: np.ndarray, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        compute_tax_batch(incomes, BASELINE_TABLE)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_apply(incomes: np.ndarray) -> float:
+    series = pd.Series(incomes)
+    start = time.perf_counter()
+    series.apply(baseline_compute_tax)
+    return time.perf_counter() - start
+
+
+def check_agreement(incomes: np.ndarray) -> float:
+    """Largest difference between the kernel's slab tax and the original loop"""
+    expected = pd.Series(incomes).apply(baseline_compute_tax).to_numpy(dtype=float)
+    return float(np.max(np.abs(tax_before_cess_batch(incomes, BASELINE_TABLE) - expected)))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    sample = make_incomes(APPLY_SAMPLE)
+    max_diff = check_agreement(sample)
+    apply_rate = APPLY_SAMPLE / bench_apply(sample)
+
+    print("=" * 60)
+    print("TAX ENGINE BENCHMARK")
+    print("=" * 60)
+    print(f"Max |kernel slab tax - original compute_tax| on {APPLY_SAMPLE:,} rows: {max_diff:.2e}")
+    print(f"df.apply(original compute_tax): {apply_rate:>14,.0f} rows/s\n")
+    if max_diff > MAX_DIFF_RUPEES:
+        raise SystemExit(f"❌ Kernel disagrees with the original compute_tax by ₹{max_diff:,.2f}")
+
+    for n in sizes:
+        incomes = make_incomes(n)
+        elapsed = bench_kernel(incomes)
+        rate = n / elapsed
+        print(f"{n:>12,} rows: {elapsed:8.3f}s  {rate:>14,.0f} rows/s  ({rate / apply_rate:,.0f}x apply)")
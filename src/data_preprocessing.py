@@ -1,67 +1,44 @@
 '''
-    To run: python src/data_preprocessing.py
+    To run: python src/data_preprocessing.py [--streaming --max-memory-mb 256] [--workers 32]
     This script preprocesses multiple datasets to create a final clean dataset
     suitable for tax-saving analysis.
     Datasets used:
-    - Software_Professional_Salaries.csv
-    - paysim.csv
     - spending_habits.csv
     - synthetic_tax_user_dataset.csv
-    - House_Rent_Dataset.csv    
+    - House_Rent_Dataset.csv
+    (Software_Professional_Salaries.csv and paysim.csv are not needed by
+    the transformation and are no longer loaded.)
 '''
 
 import pandas as pd
 import numpy as np
 import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 
 # Get project root directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATASETS_DIR = os.path.join(BASE_DIR, "datasets")
 
-print("🚀 Starting preprocessing pipeline...")
-
-# === Load all datasets ===
-try:
-    salary_df = pd.read_csv(os.path.join(DATASETS_DIR, "Software_Professional_Salaries.csv"))
-    paysim_df = pd.read_csv(os.path.join(DATASETS_DIR, "paysim.csv"))
-    spend_df = pd.read_csv(os.path.join(DATASETS_DIR, "spending_habits.csv"))
-    synthetic_df = pd.read_csv(os.path.join(DATASETS_DIR, "synthetic_tax_user_dataset.csv"))
-    rent_df = pd.read_csv(os.path.join(DATASETS_DIR, "House_Rent_Dataset.csv"))
-    print("✅ All datasets loaded successfully!")
-except Exception as e:
-    raise SystemExit(f"❌ Error loading datasets: {e}")
-
-# === Clean and align column names ===
-spend_df.rename(
-    columns={
-        "Income": "Annual_Salary",
-        "Rent": "Rent_Paid",
-        "Insurance": "Medical_Insurance_80D",
-    },
-    inplace=True,
-)
-
-if "Rent" in rent_df.columns:
-    rent_df["Rent"] = rent_df["Rent"].replace("[^0-9]", "", regex=True).astype(float)
-    rent_df["Annual_Rent"] = rent_df["Rent"] * 12
-
-# === Merge median rent by city ===
-city_rent = (
-    rent_df.groupby("City")["Annual_Rent"]
-    .median()
-    .reset_index()
-    .rename(columns={"Annual_Rent": "Median_Rent"})
-)
-synthetic_df = synthetic_df.merge(city_rent, on="City", how="left")
-synthetic_df["Rent_Paid"] = synthetic_df["Rent_Paid"].fillna(
-    synthetic_df["Median_Rent"]
-)
-
-# === Merge spending habits on salary ===
-spend_df["Annual_Salary"] = spend_df["Annual_Salary"].astype(int)
-synthetic_df["Annual_Salary"] = synthetic_df["Annual_Salary"].astype(int)
-
-cols_to_merge = [
+# Allow `python src/data_preprocessing.py` as well as package imports
+sys.path.insert(0, BASE_DIR)
+
+from src.dataset_io import FrameWriter, write_frame
+
+SPENDING_PATH = os.path.join(DATASETS_DIR, "spending_habits.csv")
+SYNTHETIC_PATH = os.path.join(DATASETS_DIR, "synthetic_tax_user_dataset.csv")
+RENT_PATH = os.path.join(DATASETS_DIR, "House_Rent_Dataset.csv")
+OUTPUT_PATH = os.path.join(DATASETS_DIR, "final_preprocessed_dataset.csv")
+
+
+SPEND_COLUMN_MAP = {
+    "Income": "Annual_Salary",
+    "Rent": "Rent_Paid",
+    "Insurance": "Medical_Insurance_80D",
+}
+SPEND_MERGE_COLS = [
     "Annual_Salary",
     "Rent_Paid",
     "Groceries",
@@ -70,71 +47,439 @@ cols_to_merge = [
     "Education",
     "Entertainment",
 ]
-available_cols = [c for c in cols_to_merge if c in spend_df.columns]
-synthetic_df = synthetic_df.merge(spend_df[available_cols], on="Annual_Salary", how="left")
-
-# === Ensure valid Rent_Paid column ===
-rent_like_cols = [c for c in synthetic_df.columns if "rent" in c.lower()]
-if not rent_like_cols:
-    synthetic_df["Rent_Paid"] = (synthetic_df["Annual_Salary"] * 0.15).astype(int)
-else:
-    best_rent_col = max(
-        rent_like_cols, key=lambda c: synthetic_df[c].notna().sum()
+EXPENSE_COLS = ["Rent_Paid", "Groceries", "Utilities", "Healthcare", "Education", "Entertainment"]
+
+# Spending habits are joined on the nearest salary within this relative
+# distance; users with no spending row that close fall back to random fill.
+SALARY_MATCH_TOLERANCE = 0.05
+
+# Streaming mode: rows per chunk are sized so one chunk's working set
+# (raw rows, merged columns and temporaries) fits in max_memory_mb.
+DEFAULT_MAX_MEMORY_MB = 256
+CHUNK_MEMORY_OVERHEAD = 4  # working-set multiplier over the output frame
+SAMPLE_ROWS = 1000
+
+# Random expense fills and jitter are drawn per fixed partition of
+# PARTITION_ROWS input rows, from a Generator seeded by (seed, partition
+# index). Every row gets the same draws whether the table is processed in
+# memory, in budget-sized chunks or on any number of workers, so the
+# output depends only on the seed. The rent source column is also chosen
+# from the first partition in every mode.
+DEFAULT_SEED = 42
+PARTITION_ROWS = 50_000
+PARTITIONS_IN_FLIGHT_PER_WORKER = 2
+FILL_COLS = ["Groceries", "Utilities", "Healthcare", "Education", "Entertainment"]
+JITTER_COLS = {"Groceries": 5000, "Utilities": 3000, "Healthcare": 2000}
+
+
+def partition_rng(seed: int, partition: int) -> np.random.Generator:
+    """Independent random stream for one partition of the user table"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(partition,)))
+
+
+def draw_row_randoms(rng: np.random.Generator, rows: int) -> np.ndarray:
+    """(rows, fills + jitters) random values: one fill per FILL_COLS column, one jitter per JITTER_COLS"""
+    fills = rng.integers(20000, 100000, (rows, len(FILL_COLS)))
+    jitters = [rng.integers(-var, var, rows) for var in JITTER_COLS.values()]
+    return np.column_stack([fills] + jitters)
+
+
+def partition_randoms(seed: int, start: int, rows: int) -> np.ndarray:
+    """draw_row_randoms for input rows [start, start + rows), drawn per fixed partition"""
+    if rows <= 0:
+        return np.empty((0, len(FILL_COLS) + len(JITTER_COLS)), dtype=np.int64)
+    first, last = start // PARTITION_ROWS, (start + rows - 1) // PARTITION_ROWS
+    draws = np.concatenate([draw_row_randoms(partition_rng(seed, partition), PARTITION_ROWS)
+                            for partition in range(first, last + 1)])
+    offset = start - first * PARTITION_ROWS
+    return draws[offset:offset + rows]
+
+
+def clean_spending(spend_df: pd.DataFrame) -> pd.DataFrame:
+    """Align spending_habits.csv column names and keep the merge columns"""
+    spend_df = spend_df.rename(columns=SPEND_COLUMN_MAP)
+    spend_df["Annual_Salary"] = spend_df["Annual_Salary"].astype(int)
+    available_cols = [c for c in SPEND_MERGE_COLS if c in spend_df.columns]
+    return spend_df[available_cols]
+
+
+@dataclass
+class SpendIndex:
+    """Spending habits collapsed to one row per salary, sorted by salary"""
+    salaries: np.ndarray
+    values: pd.DataFrame  # spending columns, one row per entry in salaries
+    # Source rows behind each salary (what an exact merge would fan out to)
+    counts: np.ndarray
+
+
+def build_spend_index(spend_df: pd.DataFrame) -> SpendIndex:
+    """Average duplicate salaries so every user matches at most one row"""
+    grouped = spend_df.groupby("Annual_Salary", sort=True)
+    sizes = grouped.size()
+    return SpendIndex(
+        salaries=sizes.index.to_numpy(dtype=float),
+        values=grouped.mean().reset_index(drop=True),
+        counts=sizes.to_numpy(),
+    )
+
+
+def nearest_salary_positions(salaries: np.ndarray, spend_index: SpendIndex,
+                             tolerance: float = SALARY_MATCH_TOLERANCE) -> np.ndarray:
+    """
+    Position of the nearest indexed salary for each user (binary search,
+    O(n log m)), or -1 where the nearest one is further than tolerance.
+    """
+    keys = spend_index.salaries
+    if len(keys) == 0:
+        return np.full(len(salaries), -1)
+
+    upper = np.searchsorted(keys, salaries).clip(max=len(keys) - 1)
+    lower = (upper - 1).clip(min=0)
+    take_lower = np.abs(salaries - keys[lower]) <= np.abs(keys[upper] - salaries)
+    nearest = np.where(take_lower, lower, upper)
+
+    within = np.abs(keys[nearest] - salaries) <= tolerance * np.abs(salaries)
+    return np.where(within, nearest, -1)
+
+
+def nearest_salary_join(synthetic_df: pd.DataFrame, spend_index: SpendIndex,
+                        stats: dict = None) -> pd.DataFrame:
+    """
+    Left-join spending habits on the nearest salary. Row count and order
+    are preserved; overlapping columns get merge()'s _x/_y suffixes.
+    When a stats dict is passed, rows, matches and the row count an exact
+    many-to-many merge would have produced are added to it.
+    """
+    salaries = synthetic_df["Annual_Salary"].to_numpy(dtype=float)
+    positions = nearest_salary_positions(salaries, spend_index)
+    matched = positions >= 0
+
+    # Label -1 is not in the index, so unmatched users get an all-NaN row
+    joined = spend_index.values.reindex(positions)
+    joined.index = synthetic_df.index
+
+    if stats is not None:
+        keys = spend_index.salaries
+        exact = np.searchsorted(keys, salaries)
+        hit = exact < len(keys)
+        hit[hit] = keys[exact[hit]] == salaries[hit]
+        fan_out = np.ones(len(salaries), dtype=np.int64)
+        fan_out[hit] = spend_index.counts[exact[hit]]
+        stats["rows"] = stats.get("rows", 0) + len(salaries)
+        stats["matched"] = stats.get("matched", 0) + int(matched.sum())
+        stats["exact_merge_rows"] = stats.get("exact_merge_rows", 0) + int(fan_out.sum())
+
+    return synthetic_df.join(joined, lsuffix="_x", rsuffix="_y")
+
+
+def print_join_report(stats: dict, bytes_per_row: float):
+    """Match rate and the memory an exact many-to-many merge would have used"""
+    rows = max(stats.get("rows", 0), 1)
+    extra_rows = stats.get("exact_merge_rows", 0) - stats.get("rows", 0)
+    print(f"🔗 Salary join: {stats.get('matched', 0):,}/{stats.get('rows', 0):,} users matched "
+          f"({stats.get('matched', 0) / rows:.1%}) within ±{SALARY_MATCH_TOLERANCE:.0%}")
+    print(f"💾 Exact salary merge would have added {extra_rows:,} duplicate rows "
+          f"(~{extra_rows * bytes_per_row / 1e6:.1f} MB saved)")
+
+
+def clean_rent(rent_df: pd.DataFrame) -> pd.DataFrame:
+    """Parse House_Rent_Dataset.csv rents into annual amounts"""
+    rent_df = rent_df.copy()
+    if "Rent" in rent_df.columns:
+        rent_df["Rent"] = rent_df["Rent"].replace("[^0-9]", "", regex=True).astype(float)
+        rent_df["Annual_Rent"] = rent_df["Rent"] * 12
+    return rent_df
+
+
+def median_rent_by_city(rent_df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        rent_df.groupby("City")["Annual_Rent"]
+        .median()
+        .reset_index()
+        .rename(columns={"Annual_Rent": "Median_Rent"})
     )
-    synthetic_df["Rent_Paid"] = synthetic_df[best_rent_col].fillna(
-        (synthetic_df["Annual_Salary"] * 0.15).astype(int)
+
+
+def choose_rent_column(df: pd.DataFrame):
+    """Pick the rent-like column with the most values (None if there is none)"""
+    rent_like_cols = [c for c in df.columns if "rent" in c.lower()]
+    if not rent_like_cols:
+        return None
+    return max(rent_like_cols, key=lambda c: df[c].notna().sum())
+
+
+def merge_lookups(synthetic_df: pd.DataFrame, city_rent: pd.DataFrame, spend_index: SpendIndex,
+                  join_stats: dict = None) -> pd.DataFrame:
+    """Join city median rent and spending habits onto a block of users"""
+    # === Merge median rent by city ===
+    synthetic_df = synthetic_df.merge(city_rent, on="City", how="left")
+    synthetic_df["Rent_Paid"] = synthetic_df["Rent_Paid"].fillna(
+        synthetic_df["Median_Rent"]
     )
-    for c in rent_like_cols:
-        if c != "Rent_Paid":
-            synthetic_df.drop(columns=c, inplace=True, errors="ignore")
-
-# === Fill missing expense fields ===
-for col in ["Groceries", "Utilities", "Healthcare", "Education", "Entertainment"]:
-    if col not in synthetic_df.columns:
-        synthetic_df[col] = np.random.randint(20000, 100000, len(synthetic_df))
+
+    # === Join spending habits on the nearest salary ===
+    synthetic_df["Annual_Salary"] = synthetic_df["Annual_Salary"].astype(int)
+    synthetic_df = nearest_salary_join(synthetic_df, spend_index, join_stats)
+    return synthetic_df
+
+
+def derive_columns(synthetic_df: pd.DataFrame, rent_column=None,
+                   randoms: np.ndarray = None) -> pd.DataFrame:
+    """
+    Resolve Rent_Paid, fill missing expenses and compute deductions,
+    taxable income, expenses and savings. rent_column is fixed from the
+    first partition so every block of rows uses the same source column.
+    Random fills come from randoms, one draw_row_randoms row per user
+    (partition_randoms of DEFAULT_SEED from row 0 by default).
+    """
+    if randoms is None:
+        randoms = partition_randoms(DEFAULT_SEED, 0, len(synthetic_df))
+    draws = dict(zip(FILL_COLS, randoms[:, :len(FILL_COLS)].T))
+    jitters = dict(zip(JITTER_COLS, randoms[:, len(FILL_COLS):].T))
+
+    # === Ensure valid Rent_Paid column ===
+    rent_like_cols = [c for c in synthetic_df.columns if "rent" in c.lower()]
+    if not rent_like_cols:
+        synthetic_df["Rent_Paid"] = (synthetic_df["Annual_Salary"] * 0.15).astype(int)
     else:
-        mask = synthetic_df[col].isna()
-        synthetic_df.loc[mask, col] = np.random.randint(20000, 100000, mask.sum())
-
-# === Compute deductions and taxable income ===
-synthetic_df["Total_Deductions"] = (
-    synthetic_df["Investment_80C"]
-    + synthetic_df["Medical_Insurance_80D"]
-    + synthetic_df["NPS_Contribution_80CCD"]
-    + synthetic_df["Home_Loan_Interest_24b"]
-    + synthetic_df["Donations_80G"]
-)
-
-synthetic_df["Taxable_Income"] = (
-    synthetic_df["Annual_Salary"] - (synthetic_df["Total_Deductions"] + 50000)
-).clip(lower=0)
-
-# === Compute expenses and savings ===
-expense_cols = [
-    c
-    for c in [
-        "Rent_Paid",
-        "Groceries",
-        "Utilities",
-        "Healthcare",
-        "Education",
-        "Entertainment",
+        best_rent_col = rent_column or choose_rent_column(synthetic_df)
+        synthetic_df["Rent_Paid"] = synthetic_df[best_rent_col].fillna(
+            (synthetic_df["Annual_Salary"] * 0.15).astype(int)
+        )
+        for c in rent_like_cols:
+            if c != "Rent_Paid":
+                synthetic_df.drop(columns=c, inplace=True, errors="ignore")
+
+    # === Fill missing expense fields ===
+    for col in FILL_COLS:
+        if col not in synthetic_df.columns:
+            synthetic_df[col] = draws[col]
+        else:
+            mask = synthetic_df[col].isna().to_numpy()
+            synthetic_df.loc[mask, col] = draws[col][mask]
+
+    # === Compute deductions and taxable income ===
+    synthetic_df["Total_Deductions"] = (
+        synthetic_df["Investment_80C"]
+        + synthetic_df["Medical_Insurance_80D"]
+        + synthetic_df["NPS_Contribution_80CCD"]
+        + synthetic_df["Home_Loan_Interest_24b"]
+        + synthetic_df["Donations_80G"]
+    )
+
+    synthetic_df["Taxable_Income"] = (
+        synthetic_df["Annual_Salary"] - (synthetic_df["Total_Deductions"] + 50000)
+    ).clip(lower=0)
+
+    # === Compute expenses and savings ===
+    expense_cols = [c for c in EXPENSE_COLS if c in synthetic_df.columns]
+    synthetic_df["Total_Expenses"] = synthetic_df[expense_cols].sum(axis=1)
+    synthetic_df["Savings"] = synthetic_df["Annual_Salary"] - synthetic_df["Total_Expenses"]
+    synthetic_df["Expense_Ratio"] = (
+        synthetic_df["Total_Expenses"] / synthetic_df["Annual_Salary"]
+    ).round(2)
+
+    # === Add slight randomness for realism ===
+    for col in JITTER_COLS:
+        synthetic_df[col] += jitters[col]
+
+    return synthetic_df
+
+
+def preprocess_chunk(synthetic_df: pd.DataFrame, city_rent: pd.DataFrame, spend_index: SpendIndex,
+                     rent_column=None, join_stats: dict = None,
+                     randoms: np.ndarray = None) -> pd.DataFrame:
+    """Preprocess a block of synthetic users against the prepared lookup tables"""
+    return derive_columns(merge_lookups(synthetic_df, city_rent, spend_index, join_stats), rent_column, randoms)
+
+
+def preprocess_frames(synthetic_df: pd.DataFrame, spend_df: pd.DataFrame, rent_df: pd.DataFrame,
+                      join_stats: dict = None, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Build the clean tax-analysis dataset from the raw source frames"""
+    city_rent = median_rent_by_city(clean_rent(rent_df))
+    spend_index = build_spend_index(clean_spending(spend_df))
+    merged = merge_lookups(synthetic_df, city_rent, spend_index, join_stats)
+    rent_column = choose_rent_column(merged.head(PARTITION_ROWS))
+    return derive_columns(merged, rent_column, partition_randoms(seed, 0, len(merged)))
+
+
+# ======================================================
+# STREAMING MODE (bounded memory on multi-GB inputs)
+# ======================================================
+
+def build_lookup_tables(spending_path: str, rent_path: str, chunk_rows: int = 500_000):
+    """
+    One pass over the lookup sources, reading only the columns that are
+    used: city median rent and the spending index keyed by salary.
+    """
+    rent_parts = []
+    for chunk in pd.read_csv(rent_path, chunksize=chunk_rows, usecols=lambda c: c in ("City", "Rent")):
+        rent_parts.append(clean_rent(chunk)[["City", "Annual_Rent"]])
+    city_rent = median_rent_by_city(pd.concat(rent_parts, ignore_index=True))
+
+    spend_usecols = lambda c: SPEND_COLUMN_MAP.get(c, c) in SPEND_MERGE_COLS
+    spend_parts = [
+        clean_spending(chunk)
+        for chunk in pd.read_csv(spending_path, chunksize=chunk_rows, usecols=spend_usecols)
     ]
-    if c in synthetic_df.columns
-]
-synthetic_df["Total_Expenses"] = synthetic_df[expense_cols].sum(axis=1)
-synthetic_df["Savings"] = synthetic_df["Annual_Salary"] - synthetic_df["Total_Expenses"]
-synthetic_df["Expense_Ratio"] = (
-    synthetic_df["Total_Expenses"] / synthetic_df["Annual_Salary"]
-).round(2)
-
-# === Add slight randomness for realism ===
-for col, var in zip(["Groceries", "Utilities", "Healthcare"], [5000, 3000, 2000]):
-    synthetic_df[col] += np.random.randint(-var, var, len(synthetic_df))
-
-# === Save final clean dataset ===
-output_path = os.path.join(DATASETS_DIR, "final_preprocessed_dataset.csv")
-synthetic_df.to_csv(output_path, index=False)
-
-print(f"✅ Preprocessing complete! Clean dataset saved at: {output_path}")
-print(f"🧾 Rows: {len(synthetic_df)} | Columns: {len(synthetic_df.columns)}")
+    spend_index = build_spend_index(pd.concat(spend_parts, ignore_index=True))
+
+    return city_rent, spend_index
+
+
+def estimate_chunk_rows(synthetic_path: str, city_rent: pd.DataFrame, spend_index: SpendIndex,
+                        max_memory_mb: float = DEFAULT_MAX_MEMORY_MB) -> int:
+    """Rows per chunk that keep one chunk's working set under max_memory_mb"""
+    sample = pd.read_csv(synthetic_path, nrows=SAMPLE_ROWS)
+    processed = preprocess_chunk(sample, city_rent, spend_index)
+    bytes_per_row = processed.memory_usage(deep=True).sum() / max(len(sample), 1)
+    budget = max_memory_mb * 1024 * 1024
+    return max(SAMPLE_ROWS, int(budget / (bytes_per_row * CHUNK_MEMORY_OVERHEAD)))
+
+
+# Lookup tables shared with pool workers, set once per process by _init_partition_worker
+_PARTITION_STATE = {}
+
+
+def _init_partition_worker(city_rent: pd.DataFrame, spend_index: SpendIndex, rent_column, seed: int):
+    _PARTITION_STATE.update(city_rent=city_rent, spend_index=spend_index, rent_column=rent_column, seed=seed)
+
+
+def _process_partition(start: int, chunk: pd.DataFrame):
+    """Preprocess the chunk starting at input row start; returns (frame, join stats)"""
+    state = _PARTITION_STATE
+    join_stats = {}
+    processed = preprocess_chunk(chunk, state["city_rent"], state["spend_index"], state["rent_column"],
+                                 join_stats, partition_randoms(state["seed"], start, len(chunk)))
+    return processed, join_stats
+
+
+def _chunk_starts(chunks):
+    """(first input row, chunk) for each chunk"""
+    start = 0
+    for chunk in chunks:
+        yield start, chunk
+        start += len(chunk)
+
+
+def _processed_partitions(chunks, workers: int):
+    """Yield processed chunks in input order, keeping a bounded number in flight"""
+    if workers <= 1:
+        for start, chunk in _chunk_starts(chunks):
+            yield _process_partition(start, chunk)
+        return
+
+    state = _PARTITION_STATE
+    initargs = (state["city_rent"], state["spend_index"], state["rent_column"], state["seed"])
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_partition_worker, initargs=initargs) as pool:
+        for start, chunk in _chunk_starts(chunks):
+            pending.append(pool.submit(_process_partition, start, chunk))
+            if len(pending) >= workers * PARTITIONS_IN_FLIGHT_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_preprocessing_streaming(synthetic_path: str = SYNTHETIC_PATH, spending_path: str = SPENDING_PATH,
+                                rent_path: str = RENT_PATH, output_path: str = OUTPUT_PATH,
+                                max_memory_mb: float = DEFAULT_MAX_MEMORY_MB, chunk_rows: int = None,
+                                workers: int = 1, seed: int = DEFAULT_SEED) -> int:
+    """
+    Preprocess synthetic_tax_user_dataset.csv in bounded chunks and append
+    each processed chunk to the output (CSV or Parquet by extension). Peak
+    memory is set by max_memory_mb (or an explicit chunk_rows), not by the
+    input size.
+
+    Random fills are drawn per fixed partition of PARTITION_ROWS rows, not
+    per chunk. With workers > 1 chunks are processed on a process pool (up
+    to 2 x workers chunks in memory) and written in input order, so the
+    output is byte-identical to run_preprocessing's in-memory pass for
+    any worker count and memory budget.
+    Returns the number of rows written.
+    """
+    mode = "streaming" if workers <= 1 else f"partitioned, {workers} workers"
+    print(f"🚀 Starting preprocessing pipeline ({mode})...")
+
+    try:
+        city_rent, spend_index = build_lookup_tables(spending_path, rent_path)
+        if chunk_rows is None:
+            chunk_rows = estimate_chunk_rows(synthetic_path, city_rent, spend_index, max_memory_mb)
+        print(f"✅ Lookup tables built | {chunk_rows:,} rows per chunk")
+    except Exception as e:
+        raise SystemExit(f"❌ Error loading datasets: {e}")
+
+    # Fix the rent source column from the first partition so all chunks agree
+    first = pd.read_csv(synthetic_path, nrows=PARTITION_ROWS)
+    rent_column = choose_rent_column(merge_lookups(first, city_rent, spend_index))
+    _init_partition_worker(city_rent, spend_index, rent_column, seed)
+
+    join_stats = {}
+    bytes_per_row = 0.0
+    chunks = pd.read_csv(synthetic_path, chunksize=chunk_rows)
+    with FrameWriter(output_path) as writer:
+        for processed, partition_stats in _processed_partitions(chunks, workers):
+            for key, value in partition_stats.items():
+                join_stats[key] = join_stats.get(key, 0) + value
+            if not bytes_per_row and len(processed):
+                bytes_per_row = processed.memory_usage(deep=True).sum() / len(processed)
+            writer.append(processed)
+
+    print(f"✅ Preprocessing complete! Clean dataset saved at: {output_path}")
+    print(f"🧾 Rows: {writer.rows}")
+    print_join_report(join_stats, bytes_per_row)
+    return writer.rows
+
+
+def run_preprocessing(synthetic_path: str = SYNTHETIC_PATH, spending_path: str = SPENDING_PATH,
+                      rent_path: str = RENT_PATH, output_path: str = OUTPUT_PATH,
+                      streaming: bool = False, max_memory_mb: float = DEFAULT_MAX_MEMORY_MB,
+                      chunk_rows: int = None, workers: int = 1, seed: int = DEFAULT_SEED):
+    """
+    Load the source CSVs, preprocess them and save the clean dataset.
+    With streaming=True or workers > 1 the work is delegated to
+    run_preprocessing_streaming.
+    """
+    if streaming or workers > 1:
+        return run_preprocessing_streaming(synthetic_path, spending_path, rent_path, output_path,
+                                           max_memory_mb=max_memory_mb, chunk_rows=chunk_rows,
+                                           workers=workers, seed=seed)
+
+    print("🚀 Starting preprocessing pipeline...")
+
+    # === Load all datasets ===
+    try:
+        spend_df = pd.read_csv(spending_path)
+        synthetic_df = pd.read_csv(synthetic_path)
+        rent_df = pd.read_csv(rent_path)
+        print("✅ All datasets loaded successfully!")
+    except Exception as e:
+        raise SystemExit(f"❌ Error loading datasets: {e}")
+
+    join_stats = {}
+    synthetic_df = preprocess_frames(synthetic_df, spend_df, rent_df, join_stats, seed=seed)
+
+    # === Save final clean dataset ===
+    write_frame(synthetic_df, output_path)
+
+    print(f"✅ Preprocessing complete! Clean dataset saved at: {output_path}")
+    print(f"🧾 Rows: {len(synthetic_df)} | Columns: {len(synthetic_df.columns)}")
+    print_join_report(join_stats, synthetic_df.memory_usage(deep=True).sum() / max(len(synthetic_df), 1))
+    return synthetic_df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Preprocess the Tax Saver AI source datasets")
+    parser.add_argument("--streaming", action="store_true", help="process the user table in bounded chunks")
+    parser.add_argument("--max-memory-mb", type=float, default=DEFAULT_MAX_MEMORY_MB,
+                        help="working-set budget per chunk in streaming mode")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="explicit rows per chunk (overrides the budget)")
+    parser.add_argument("--workers", type=int, default=1, help="process partitions on a pool of this many workers")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed for the per-partition random streams "
+                                                                       "(output is identical in every mode)")
+    args = parser.parse_args()
+
+    run_preprocessing(streaming=args.streaming, max_memory_mb=args.max_memory_mb, chunk_rows=args.chunk_rows,
+                      workers=args.workers, seed=args.seed)
@@ -0,0 +1,291 @@
+"""
+Dataset I/O for Pipeline Intermediates
+======================================
+Reads and writes the frames passed between pipeline stages
+(final_preprocessed_dataset, final_tax_results, tax_recommendations,
+itr_risk_training_data) as CSV or as typed, columnar Parquet.
+
+The format follows the file extension. Parquet readers project only the
+requested columns and memory-map the file. Frames are narrowed to the
+compact dtypes in src/schema.py on every read, and before Parquet writes
+so the file stores them. CSV has no dtypes to keep, so CSV writes widen
+float32 back to float64 and the text matches the uncompacted frame. Every read and
+write is timed so a run can report its I/O cost, the memory the compact
+dtypes saved, and a comparison with CSV.
+"""
+
+import os
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from src.schema import compact_dtypes, compact_frame, csv_frame, csv_read_dtypes, frame_memory_mb
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+FORMATS = ("csv", "parquet")
+DEFAULT_FORMAT = os.getenv("TAX_SAVER_INTERMEDIATE_FORMAT", "csv")
+
+# (operation, path, seconds, bytes on disk, MB in memory before/after
+# compaction) for every read/write this process
+IO_LOG: List[Dict] = []
+
+
+def _format_of(path: str) -> str:
+    return "parquet" if path.endswith(".parquet") else "csv"
+
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Parquet intermediates need pyarrow (pip install pyarrow)")
+
+
+def _record(operation: str, path: str, start: float, memory_before_mb: float = 0.0,
+            memory_after_mb: float = 0.0):
+    IO_LOG.append({
+        "operation": operation,
+        "path": path,
+        "seconds": time.perf_counter() - start,
+        "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+        "memory_before_mb": memory_before_mb,
+        "memory_after_mb": memory_after_mb,
+    })
+
+
+def intermediate_path(datasets_dir: str, stem: str, fmt: str = DEFAULT_FORMAT) -> str:
+    """datasets/<stem>.csv or datasets/<stem>.parquet"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown intermediate format {fmt!r}; expected one of {FORMATS}")
+    return os.path.join(datasets_dir, f"{stem}.{fmt}")
+
+
+def resolve_intermediate(datasets_dir: str, stem: str, fmt: str = DEFAULT_FORMAT) -> str:
+    """Path in the preferred format, falling back to whichever copy exists"""
+    preferred = intermediate_path(datasets_dir, stem, fmt)
+    if os.path.exists(preferred):
+        return preferred
+    for other in FORMATS:
+        candidate = intermediate_path(datasets_dir, stem, other)
+        if os.path.exists(candidate):
+            return candidate
+    return preferred
+
+
+def read_frame(path: str, columns: Optional[List[str]] = None, compact: bool = True) -> pd.DataFrame:
+    """Read an intermediate, loading only `columns` when given"""
+    start = time.perf_counter()
+    if _format_of(path) == "parquet":
+        _require_pyarrow()
+        if columns is not None:
+            available = set(pq.read_schema(path, memory_map=True).names)
+            columns = [c for c in columns if c in available]
+        df = pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+    else:
+        wanted = None if columns is None else set(columns)
+        header = pd.read_csv(path, nrows=0).columns
+        df = pd.read_csv(path, usecols=None if wanted is None else (lambda c: c in wanted),
+                         dtype=csv_read_dtypes(header))
+
+    memory_before = frame_memory_mb(df) if compact else 0.0
+    if compact:
+        df = compact_frame(df)
+    _record("read", path, start, memory_before, frame_memory_mb(df) if compact else 0.0)
+    return df
+
+
+def iter_frame_chunks(path: str, chunk_rows: int, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield a CSV or Parquet file as frames of at most chunk_rows rows, so
+    memory is bounded by the chunk size rather than the file size. Chunks
+    keep the file's dtypes (no compaction).
+    """
+    if _format_of(path) == "parquet":
+        _require_pyarrow()
+        parquet = pq.ParquetFile(path, memory_map=True)
+        if columns is not None:
+            columns = [c for c in columns if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        wanted = None if columns is None else set(columns)
+        yield from pd.read_csv(path, chunksize=chunk_rows,
+                               usecols=None if wanted is None else (lambda c: c in wanted))
+
+
+def write_frame(df: pd.DataFrame, path: str, compact: bool = True):
+    """Write an intermediate atomically in the format given by its extension"""
+    start = time.perf_counter()
+    compact = compact and _format_of(path) == "parquet"
+    memory_before = frame_memory_mb(df) if compact else 0.0
+    if compact:
+        df = compact_frame(df)
+    tmp_path = path + ".tmp"
+    if _format_of(path) == "parquet":
+        _require_pyarrow()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+    else:
+        csv_frame(df).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    _record("write", path, start, memory_before, frame_memory_mb(df) if compact else 0.0)
+
+
+def append_frame(df: pd.DataFrame, path: str):
+    """
+    Append rows to an existing CSV intermediate in O(len(df)). Columns are
+    written in the file's header order. Parquet files are immutable, so
+    they must be rewritten with write_frame instead.
+    """
+    if _format_of(path) != "csv":
+        raise ValueError(f"Only CSV intermediates can be appended to: {path}")
+    start = time.perf_counter()
+    header = list(pd.read_csv(path, nrows=0).columns)
+    missing = [c for c in header if c not in df.columns]
+    if missing or len(header) != len(df.columns):
+        raise ValueError(f"Rows for {path} do not match its columns (missing {missing})")
+    csv_frame(df[header]).to_csv(path, mode="a", header=False, index=False)
+    _record("append", path, start)
+
+
+class FrameWriter:
+    """
+    Appends chunks to one CSV or Parquet file (used by streaming stages).
+    For Parquet, the compact dtypes chosen for the first chunk are kept for
+    the rest.
+    """
+
+    def __init__(self, path: str, compact: bool = True):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.format = _format_of(path)
+        self.compact = compact and self.format == "parquet"
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._dtypes = None
+        self._seconds = 0.0
+        self._memory_before = 0.0
+        self._memory_after = 0.0
+
+    def append(self, df: pd.DataFrame):
+        start = time.perf_counter()
+        if self.compact:
+            if self._dtypes is None:
+                self._dtypes = compact_dtypes(df)
+            self._memory_before += frame_memory_mb(df)
+            df = compact_frame(df, self._dtypes)
+            self._memory_after += frame_memory_mb(df)
+        if self.format == "parquet":
+            _require_pyarrow()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.tmp_path, self._schema)
+            self._writer.write_table(table.cast(self._schema))
+        else:
+            csv_frame(df).to_csv(self.tmp_path, mode="w" if self.rows == 0 else "a",
+                                 header=(self.rows == 0), index=False)
+        self.rows += len(df)
+        self._seconds += time.perf_counter() - start
+
+    def close(self):
+        start = time.perf_counter()
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.tmp_path):
+            os.replace(self.tmp_path, self.path)
+        # Logged duration and memory cover every append plus the final close
+        _record("write", self.path, start - self._seconds, self._memory_before, self._memory_after)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            if self._writer is not None:
+                self._writer.close()
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+def compare_with_csv(path: str) -> Dict[str, float]:
+    """
+    Round-trip a Parquet intermediate through CSV in a temp directory and
+    return read/write seconds and on-disk bytes for both formats.
+    """
+    df = read_frame(path)
+    parquet_read = IO_LOG[-1]["seconds"]
+    parquet_bytes = os.path.getsize(path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "compare.csv")
+        parquet_path = os.path.join(tmp_dir, "compare.parquet")
+
+        start = time.perf_counter()
+        df.to_csv(csv_path, index=False)
+        csv_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pd.read_csv(csv_path)
+        csv_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), parquet_path)
+        parquet_write = time.perf_counter() - start
+
+        csv_bytes = os.path.getsize(csv_path)
+
+    return {
+        "csv_bytes": csv_bytes,
+        "parquet_bytes": parquet_bytes,
+        "csv_read_s": csv_read,
+        "parquet_read_s": parquet_read,
+        "csv_write_s": csv_write,
+        "parquet_write_s": parquet_write,
+    }
+
+
+def print_io_summary(compare_csv: bool = False):
+    """Print total I/O time per file, optionally against a CSV round trip"""
+    totals: Dict[str, Dict[str, float]] = {}
+    for entry in IO_LOG:
+        stats = totals.setdefault(entry["path"], {"read": 0.0, "write": 0.0, "bytes": 0})
+        stats["read" if entry["operation"] == "read" else "write"] += entry["seconds"]
+        stats["bytes"] = max(stats["bytes"], entry["bytes"])
+
+    print("\n💾 Intermediate I/O")
+    for path, stats in totals.items():
+        print(f"   {os.path.basename(path):<40} read {stats['read']:7.2f}s  write {stats['write']:7.2f}s"
+              f"  {stats['bytes'] / 1e6:9.1f} MB")
+    print(f"   {'total':<40} {sum(s['read'] + s['write'] for s in totals.values()):7.2f}s")
+
+    compacted = [entry for entry in IO_LOG if entry["memory_before_mb"]]
+    if compacted:
+        print("\n🧮 In-memory size with compact dtypes")
+        for entry in compacted:
+            before, after = entry["memory_before_mb"], entry["memory_after_mb"]
+            print(f"   {entry['operation']:<5} {os.path.basename(entry['path']):<34} {before:9.1f} MB → {after:8.1f} MB"
+                  f" ({before / max(after, 1e-9):.1f}x smaller)")
+
+    if not compare_csv:
+        return
+
+    print("\n📊 Parquet vs CSV")
+    for path in totals:
+        if _format_of(path) != "parquet" or not os.path.exists(path):
+            continue
+        cmp = compare_with_csv(path)
+        print(f"   {os.path.basename(path):<40} size {cmp['parquet_bytes'] / 1e6:8.1f} MB vs {cmp['csv_bytes'] / 1e6:8.1f} MB"
+              f" ({cmp['csv_bytes'] / max(cmp['parquet_bytes'], 1):.1f}x smaller)"
+              f" | read {cmp['parquet_read_s']:.2f}s vs {cmp['csv_read_s']:.2f}s"
+              f" | write {cmp['parquet_write_s']:.2f}s vs {cmp['csv_write_s']:.2f}s")
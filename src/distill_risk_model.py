@@ -0,0 +1,167 @@
+"""
+ITR Risk Model Distillation
+===========================
+Trains a small student model on the probabilities of the trained forest
+(the teacher, models/itr_risk_rf.pkl) and saves it as an alternative
+artifact with the same {"model", "features"} layout, so itr_risk_engine
+can serve it by pointing TAX_SAVER_RISK_MODEL at it.
+
+Students regress the teacher's P(risky):
+  - "trees": a few shallow trees (RandomForestRegressor)
+  - "hgb":   histogram gradient boosting (HistGradientBoostingRegressor)
+
+The report compares teacher and students on held-out rows: artifact
+load time, single-row latency, file size, agreement with the teacher's
+label, mean probability difference and accuracy on the true labels.
+Students never see the held-out rows; the teacher was trained on all of
+them, so its own accuracy there is optimistic.
+
+To run: python src/distill_risk_model.py [--student hgb|trees] [--compare-all]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.model_selection import train_test_split
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, "models")
+TEACHER_PATH = os.path.join(MODEL_DIR, "itr_risk_rf.pkl")
+STUDENT_PATH = os.path.join(MODEL_DIR, "itr_risk_student.pkl")
+REPORT_PATH = os.path.join(MODEL_DIR, "itr_risk_distill_report.csv")
+
+# Allow `python src/distill_risk_model.py` as well as package imports
+sys.path.insert(0, BASE_DIR)
+
+from src.risk_features import load_artifact, make_artifact
+from src.train_itr_risk_model import build_training_data
+
+STUDENTS = ("hgb", "trees")
+DEFAULT_STUDENT = "hgb"
+LATENCY_CALLS = 200
+
+
+class DistilledRiskModel:
+    """A student regressor on the teacher's P(risky), served through predict_proba"""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, regressor, kind: str):
+        self.regressor = regressor
+        self.kind = kind
+
+    def predict_proba(self, X) -> np.ndarray:
+        risky = np.clip(self.regressor.predict(np.asarray(X, dtype=np.float32)), 0.0, 1.0)
+        return np.column_stack([1.0 - risky, risky])
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+
+def make_student(kind: str):
+    if kind == "trees":
+        return RandomForestRegressor(n_estimators=8, max_depth=8, random_state=42, n_jobs=-1)
+    if kind == "hgb":
+        return HistGradientBoostingRegressor(max_iter=100, max_depth=6, random_state=42)
+    raise ValueError(f"Unknown student {kind!r}; expected one of {STUDENTS}")
+
+
+def load_teacher(teacher_path: str = TEACHER_PATH):
+    try:
+        return load_artifact(teacher_path)
+    except Exception as e:
+        raise SystemExit(f"❌ No trained forest at {teacher_path} ({e}). Run train_itr_risk_model.py first.")
+
+
+def distill(teacher, X: np.ndarray, kind: str = DEFAULT_STUDENT) -> DistilledRiskModel:
+    """Fit a student on the teacher's probabilities for X"""
+    targets = teacher.predict_proba(X)[:, 1]
+    regressor = make_student(kind)
+    regressor.fit(X, targets)
+    if "n_jobs" in regressor.get_params():
+        # Serving scores one filing at a time, where a thread pool only adds overhead
+        regressor.set_params(n_jobs=None)
+    return DistilledRiskModel(regressor, kind)
+
+
+def _single_row_ms(model, X: np.ndarray, calls: int = LATENCY_CALLS) -> float:
+    timings = []
+    for i in range(calls):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def _load_seconds(path: str) -> float:
+    start = time.perf_counter()
+    joblib.load(path)
+    return time.perf_counter() - start
+
+
+def describe(name: str, path: str, model, teacher_proba: np.ndarray, X_test: np.ndarray,
+             y_test: np.ndarray) -> dict:
+    proba = model.predict_proba(X_test)[:, 1]
+    return {
+        "model": name,
+        "load_s": round(_load_seconds(path), 3),
+        "latency_ms": round(_single_row_ms(model, X_test), 3),
+        "size_mb": round(os.path.getsize(path) / 1e6, 2),
+        "agreement": round(float(((proba >= 0.5) == (teacher_proba >= 0.5)).mean()), 4),
+        "mean_abs_proba_diff": round(float(np.abs(proba - teacher_proba).mean()), 4),
+        "accuracy": round(float(((proba >= 0.5) == y_test).mean()), 4),
+    }
+
+
+def run_distillation(kind: str = DEFAULT_STUDENT, compare_all: bool = False, teacher_path: str = TEACHER_PATH,
+                     student_path: str = STUDENT_PATH, report_path: str = REPORT_PATH) -> pd.DataFrame:
+    teacher, features = load_teacher(teacher_path)
+    X, y, _ = build_training_data()
+    X_train, X_test, _, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    teacher_proba = teacher.predict_proba(X_test)[:, 1]
+
+    rows = [describe("teacher", teacher_path, teacher, teacher_proba, X_test, y_test)]
+    for candidate in (STUDENTS if compare_all else (kind,)):
+        start = time.perf_counter()
+        student = distill(teacher, X_train, candidate)
+        print(f"🎓 Distilled '{candidate}' student in {time.perf_counter() - start:.1f}s")
+
+        # Every student is written (and timed) as a file; only the chosen one is kept
+        tmp_path = f"{student_path}.{candidate}.tmp"
+        joblib.dump({**make_artifact(student, features), "teacher": os.path.basename(teacher_path)}, tmp_path)
+        rows.append(describe(f"student:{candidate}", tmp_path, student, teacher_proba, X_test, y_test))
+        if candidate == kind:
+            os.replace(tmp_path, student_path)
+            print(f"✅ Student model saved to: {student_path}")
+        else:
+            os.remove(tmp_path)
+
+    report = pd.DataFrame(rows)
+    print("\n📊 Teacher vs student (held-out rows)")
+    print(report.to_string(index=False))
+    if report_path:
+        report.to_csv(report_path, index=False)
+        print(f"📝 Report saved to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distil the ITR risk forest into a compact student model")
+    parser.add_argument("--student", choices=STUDENTS, default=DEFAULT_STUDENT, help="student model to save")
+    parser.add_argument("--compare-all", action="store_true", help="also fit and report the other students")
+    parser.add_argument("--teacher", default=TEACHER_PATH, help="trained forest artifact")
+    parser.add_argument("--out", default=STUDENT_PATH, help="where to save the student artifact")
+    args = parser.parse_args()
+
+    # Run through the package module so the pickled student is
+    # src.distill_risk_model.DistilledRiskModel, not __main__.DistilledRiskModel
+    from src.distill_risk_model import run_distillation as run_packaged
+
+    run_packaged(args.student, compare_all=args.compare_all, teacher_path=args.teacher, student_path=args.out)
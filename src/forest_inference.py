@@ -0,0 +1,231 @@
+"""
+Flattened Forest Inference
+==========================
+Exports a trained RandomForestClassifier to flat NumPy arrays (split
+feature, threshold, left/right child and leaf class probabilities for
+every node of every tree) and scores it with a NumPy traversal that
+advances all trees one level at a time.
+
+A single predict_proba on the sklearn forest validates its input and
+dispatches every tree through joblib, which costs milliseconds for one
+filing. The flat traversal costs one vectorized step per tree level,
+advancing only the (row, tree) pairs that have not reached a leaf. For
+large batches sklearn's compiled traversal is still faster, so batch
+scoring keeps the sklearn model.
+
+Splits follow sklearn: inputs are cast to float32 and a row goes left
+when value <= threshold, so probabilities match predict_proba up to
+float rounding in the average over trees.
+
+Engines: "sklearn" (the fitted model) or "flat" (FlatForest). The
+default comes from TAX_SAVER_RISK_ENGINE.
+
+Training also exports the flat arrays as .npy files next to the pickle
+(models/itr_risk_rf_flat/). load_flat opens them memory-mapped, so
+loading is near-instant and every process on a host shares one copy of
+the trees through the page cache. The export records the size and mtime
+of the pickle it came from and is ignored once that no longer matches.
+
+To export an existing model: python src/forest_inference.py [--model PATH]
+"""
+
+import argparse
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+ENGINES = ("sklearn", "flat")
+DEFAULT_ENGINE = os.getenv("TAX_SAVER_RISK_ENGINE", "flat")
+
+# Rows traversed together; bounds the (rows x trees) node index arrays
+BATCH_ROWS = 2048
+
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "roots", "is_leaf")
+
+
+class FlatForest:
+    """A fitted forest as flat node arrays, with a sklearn-style predict_proba"""
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, n_features: int,
+                 classes: Optional[List] = None, feature_names: Optional[List[str]] = None,
+                 is_leaf: Optional[np.ndarray] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = np.asarray(classes if classes is not None else np.arange(value.shape[1]))
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.is_leaf = is_leaf if is_leaf is not None else left == np.arange(len(left))
+
+    @classmethod
+    def from_sklearn(cls, model, feature_names: Optional[List[str]] = None) -> "FlatForest":
+        """Flatten a fitted RandomForestClassifier (or ExtraTreesClassifier)"""
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("Only single-output forests can be flattened")
+
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        feature, threshold, left, right, value = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            nodes = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+            # Leaves point at themselves (that is how is_leaf is recovered)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            left.append(np.where(is_leaf, nodes, tree.children_left + offset))
+            right.append(np.where(is_leaf, nodes, tree.children_right + offset))
+            # Counts (older sklearn) or fractions (newer): normalise to probabilities
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1, keepdims=True)
+            value.append(counts / np.where(totals == 0, 1.0, totals))
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            value=np.concatenate(value),
+            roots=offsets[:-1].astype(np.int32),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=model.n_features_in_,
+            classes=list(model.classes_),
+            feature_names=feature_names,
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node of every (row, tree) pair"""
+        n_rows, n_features = X.shape
+        node = np.tile(self.roots, n_rows).astype(np.intp)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, self.n_trees)
+        values = X.ravel()
+        # Only (row, tree) pairs still at a split are advanced each level
+        active = np.flatnonzero(~self.is_leaf[node])
+        while len(active):
+            current = node[active]
+            go_left = values[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            child = np.where(go_left, self.left[current], self.right[current])
+            node[active] = child
+            active = active[~self.is_leaf[child]]
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features_in_}")
+
+        proba = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), BATCH_ROWS):
+            leaves = self._leaves(X[start:start + BATCH_ROWS])
+            proba[start:start + BATCH_ROWS] = self.value[leaves].mean(axis=1)
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+    def save(self, directory: str, source: Optional[dict] = None):
+        """
+        Write one .npy file per array plus meta.json (written last). Files
+        are replaced by rename, so processes that have the old ones mapped
+        keep reading them.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp_path, getattr(self, name))
+            os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+        meta = {
+            "max_depth": self.max_depth,
+            "n_features": self.n_features_in_,
+            "classes": [c.item() if isinstance(c, np.generic) else c for c in self.classes_],
+            "feature_names": self.feature_names,
+            "source": source,
+        }
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "FlatForest":
+        """Open a saved forest; with mmap_mode="r" the arrays are mapped, not read"""
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ARRAY_NAMES}
+        return cls(**arrays, max_depth=meta["max_depth"], n_features=meta["n_features"],
+                   classes=meta["classes"], feature_names=meta["feature_names"])
+
+
+# ======================================================
+# Exported artifacts
+# ======================================================
+def flat_dir_for(model_path: str) -> str:
+    """models/itr_risk_rf.pkl -> models/itr_risk_rf_flat"""
+    return os.path.splitext(model_path)[0] + "_flat"
+
+
+def _source_signature(model_path: str) -> dict:
+    stat = os.stat(model_path)
+    return {"file": os.path.basename(model_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def export_flat(model, model_path: str, feature_names: Optional[List[str]] = None) -> str:
+    """Save the flat arrays of the forest just written to model_path"""
+    directory = flat_dir_for(model_path)
+    FlatForest.from_sklearn(model, feature_names).save(directory, source=_source_signature(model_path))
+    return directory
+
+
+def load_flat(model_path: str, mmap_mode: Optional[str] = "r") -> Optional[FlatForest]:
+    """The memory-mapped export of model_path, or None if missing or stale"""
+    directory = flat_dir_for(model_path)
+    try:
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            source = json.load(f).get("source")
+        if source != _source_signature(model_path):
+            return None
+        return FlatForest.load(directory, mmap_mode=mmap_mode)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def make_predictor(model, engine: str = DEFAULT_ENGINE, feature_names: Optional[List[str]] = None):
+    """The object whose predict_proba serves `model` under the chosen engine"""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown risk engine {engine!r}; expected one of {ENGINES}")
+    if model is None or engine == "sklearn":
+        return model
+    return FlatForest.from_sklearn(model, feature_names)
+
+
+if __name__ == "__main__":
+    import joblib
+
+    default_model = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "itr_risk_rf.pkl")
+    parser = argparse.ArgumentParser(description="Export a trained risk forest to memory-mappable flat arrays")
+    parser.add_argument("--model", default=default_model, help="joblib artifact with 'model' and 'features'")
+    args = parser.parse_args()
+
+    data = joblib.load(args.model)
+    directory = export_flat(data["model"], args.model, data.get("features"))
+    print(f"✅ Flat forest exported to: {directory}")
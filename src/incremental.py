@@ -0,0 +1,263 @@
+"""
+Incremental Batch Refresh
+=========================
+Runs preprocessing → tax engine → recommendations only for users that are
+new or changed since the last run, keyed by a stable user ID (User_ID),
+and merges them into the existing intermediates.
+
+A watermark (datasets/.incremental/watermark.json) records each run, and
+a per-user hash of the input row (row_hashes.<fmt>) detects changes.
+Users missing from the input are removed from the results. A change to
+the lookup tables, the stage code or the seed triggers a full rebuild,
+since it can affect every row.
+
+Compute is proportional to the number of new/changed users. When the
+only change is new users appended to the input (the usual monthly
+refresh) and the intermediates are CSV, their rows are appended in place
+so I/O is proportional to the change too. Otherwise the merge rewrites
+each intermediate once (plain sequential I/O).
+
+To run: python src/incremental.py [--format parquet] [--full]
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASETS_DIR = os.path.join(BASE_DIR, "datasets")
+
+# Allow `python src/incremental.py` as well as package imports
+sys.path.insert(0, BASE_DIR)
+
+from src import data_preprocessing, dataset_io, recommendation_engine, schema, tax_engine, tax_rules
+from src.data_preprocessing import DEFAULT_SEED
+from src.dataset_io import append_frame, read_frame, write_frame
+
+KEY_COLUMN = "User_ID"
+STATE_DIRNAME = ".incremental"
+HASH_BLOCK_SIZE = 1 << 20
+# Delta runs draw random fills from SeedSequence(seed, (DELTA_STREAM, run)),
+# disjoint from the per-partition streams of a full run
+DELTA_STREAM = 1 << 32
+
+STAGE_MODULES = [data_preprocessing, tax_engine, tax_rules, recommendation_engine, dataset_io, schema]
+
+
+def _sha256_files(paths) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _json_scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """64-bit content hash of every input row (column order independent)"""
+    return pd.util.hash_pandas_object(df[sorted(df.columns)], index=False).to_numpy()
+
+
+class IncrementalRefresh:
+    """Watermarked, key-based delta runner over the default batch chain"""
+
+    def __init__(self, datasets_dir: str = DATASETS_DIR, fmt: str = dataset_io.DEFAULT_FORMAT,
+                 key: str = KEY_COLUMN, seed: int = DEFAULT_SEED):
+        self.datasets_dir = datasets_dir
+        self.fmt = fmt
+        self.key = key
+        self.seed = seed
+
+        self.synthetic_path = os.path.join(datasets_dir, "synthetic_tax_user_dataset.csv")
+        self.spending_path = os.path.join(datasets_dir, "spending_habits.csv")
+        self.rent_path = os.path.join(datasets_dir, "House_Rent_Dataset.csv")
+        self.outputs = {
+            stem: dataset_io.intermediate_path(datasets_dir, stem, fmt)
+            for stem in ("final_preprocessed_dataset", "final_tax_results", "tax_recommendations")
+        }
+
+        self.state_dir = os.path.join(datasets_dir, STATE_DIRNAME)
+        self.watermark_path = os.path.join(self.state_dir, "watermark.json")
+        self.hashes_path = dataset_io.intermediate_path(self.state_dir, "row_hashes", fmt)
+
+    # ------------------------------------------------------------------
+    # Watermark
+    # ------------------------------------------------------------------
+    def load_watermark(self):
+        try:
+            with open(self.watermark_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_watermark(self, watermark: dict):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = self.watermark_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(watermark, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.watermark_path)
+
+    def _fingerprints(self) -> dict:
+        return {
+            "lookup_digest": _sha256_files([self.spending_path, self.rent_path]),
+            "code_digest": _sha256_files([inspect.getsourcefile(m) for m in STAGE_MODULES]),
+            "seed": self.seed,
+            "format": self.fmt,
+        }
+
+    def _needs_full_rebuild(self, watermark, fingerprints: dict) -> str:
+        """Reason a full rebuild is required, or '' when a delta run is safe"""
+        if watermark is None:
+            return "no watermark"
+        for name, value in fingerprints.items():
+            if watermark.get(name) != value:
+                return f"{name} changed"
+        missing = [p for p in self._tracked_paths() if not os.path.exists(p)]
+        if missing:
+            return f"missing {os.path.basename(missing[0])}"
+        if watermark.get("file_sizes") != self._file_sizes():
+            return "outputs modified since the last run"
+        return ""
+
+    def _tracked_paths(self):
+        return list(self.outputs.values()) + [self.hashes_path]
+
+    def _file_sizes(self) -> dict:
+        return {os.path.basename(p): os.path.getsize(p) for p in self._tracked_paths() if os.path.exists(p)}
+
+    # ------------------------------------------------------------------
+    # Runs
+    # ------------------------------------------------------------------
+    def _full_rebuild(self, users: pd.DataFrame) -> dict:
+        data_preprocessing.run_preprocessing(self.synthetic_path, self.spending_path, self.rent_path,
+                                             self.outputs["final_preprocessed_dataset"], seed=self.seed)
+        tax_engine.run_tax_engine(self.outputs["final_preprocessed_dataset"], self.outputs["final_tax_results"])
+        recommendation_engine.run_recommendations(self.outputs["final_tax_results"], self.outputs["tax_recommendations"])
+        return {"new": len(users), "changed": 0, "deleted": 0}
+
+    def _delta_run(self, users: pd.DataFrame, hashes: np.ndarray, run: int) -> dict:
+        previous = read_frame(self.hashes_path)
+        previous_hash = pd.Series(previous["Row_Hash"].to_numpy(dtype=np.uint64), index=previous[self.key])
+
+        keys = users[self.key]
+        known = keys.isin(previous_hash.index).to_numpy()
+        changed = known.copy()
+        changed[known] = previous_hash.reindex(keys[known]).to_numpy() != hashes[known]
+        new = ~known
+        deleted = previous_hash.index[~previous_hash.index.isin(keys)]
+
+        delta = users[new | changed]
+        stats = {"new": int(new.sum()), "changed": int(changed.sum()), "deleted": len(deleted)}
+        print(f"🔁 Delta: {stats['new']:,} new, {stats['changed']:,} changed, "
+              f"{stats['deleted']:,} deleted of {len(users):,} users")
+        if len(delta) == 0 and len(deleted) == 0:
+            return stats
+
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(DELTA_STREAM, run)))
+        city_rent, spend_index = data_preprocessing.build_lookup_tables(self.spending_path, self.rent_path)
+        preprocessed = data_preprocessing.preprocess_chunk(delta.copy(), city_rent, spend_index,
+                                                           randoms=data_preprocessing.draw_row_randoms(rng, len(delta)))
+        taxed = tax_engine.add_tax_amount(preprocessed.copy())
+        recommended = recommendation_engine.add_recommendations(taxed.copy())
+
+        results = (("final_preprocessed_dataset", preprocessed),
+                   ("final_tax_results", taxed),
+                   ("tax_recommendations", recommended))
+
+        # Pure tail append: add the new rows without touching existing ones
+        tail_only = stats["changed"] == 0 and stats["deleted"] == 0 and new[len(new) - stats["new"]:].all()
+        if tail_only and self.fmt == "csv":
+            for stem, fresh in results:
+                append_frame(fresh, self.outputs[stem])
+                print(f"✅ Appended {len(fresh):,} rows to {self.outputs[stem]}")
+            stats["appended"] = True
+            return stats
+
+        replaced = pd.Index(delta[self.key]).append(deleted)
+        order = keys.to_numpy()
+        for stem, fresh in results:
+            path = self.outputs[stem]
+            current = read_frame(path)
+            kept = current[~current[self.key].isin(replaced)]
+            merged = pd.concat([kept, fresh], ignore_index=True)
+            # Same row order as a full run: the order of the input table
+            merged = merged.set_index(self.key).reindex(order).reset_index()
+            write_frame(merged, path)
+            print(f"✅ Merged {len(fresh):,} rows into {path}")
+        return stats
+
+    def run(self, full: bool = False) -> dict:
+        """Refresh the intermediates; returns the new watermark"""
+        start = time.perf_counter()
+        print("🚀 Starting incremental refresh...")
+
+        try:
+            users = pd.read_csv(self.synthetic_path)
+        except Exception as e:
+            raise SystemExit(f"❌ Error loading users: {e}")
+        if self.key not in users.columns:
+            raise SystemExit(f"❌ Incremental mode needs a stable '{self.key}' column in {self.synthetic_path}")
+        if users[self.key].duplicated().any():
+            raise SystemExit(f"❌ '{self.key}' is not unique in {self.synthetic_path}")
+
+        hashes = row_hashes(users)
+        watermark = self.load_watermark()
+        fingerprints = self._fingerprints()
+        reason = "requested" if full else self._needs_full_rebuild(watermark, fingerprints)
+        run = (watermark or {}).get("run", 0) + 1
+
+        if reason:
+            print(f"🧱 Full rebuild ({reason})")
+            stats = self._full_rebuild(users)
+        else:
+            stats = self._delta_run(users, hashes, run)
+
+        os.makedirs(self.state_dir, exist_ok=True)
+        hash_frame = pd.DataFrame({self.key: users[self.key], "Row_Hash": hashes})
+        if stats.pop("appended", False):
+            append_frame(hash_frame.tail(stats["new"]), self.hashes_path)
+        elif reason or stats["new"] or stats["changed"] or stats["deleted"]:
+            write_frame(hash_frame, self.hashes_path)
+
+        watermark = {
+            **fingerprints,
+            **stats,
+            "run": run,
+            "mode": "full" if reason else "delta",
+            "rows": len(users),
+            "max_key": _json_scalar(users[self.key].max()) if len(users) else None,
+            "file_sizes": self._file_sizes(),
+            "completed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        self._save_watermark(watermark)
+        print(f"📌 Watermark run {run} ({watermark['mode']}) saved in {watermark['seconds']:.2f}s")
+        return watermark
+
+
+def run_incremental(datasets_dir: str = DATASETS_DIR, fmt: str = dataset_io.DEFAULT_FORMAT,
+                    full: bool = False, seed: int = DEFAULT_SEED) -> dict:
+    return IncrementalRefresh(datasets_dir, fmt=fmt, seed=seed).run(full=full)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the batch datasets for new or changed users only")
+    parser.add_argument("--datasets-dir", default=DATASETS_DIR, help="directory holding the datasets")
+    parser.add_argument("--format", choices=dataset_io.FORMATS, default=dataset_io.DEFAULT_FORMAT,
+                        help="file format for the intermediate datasets")
+    parser.add_argument("--full", action="store_true", help="rebuild every row and reset the watermark")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed for the random expense fills")
+    args = parser.parse_args()
+
+    run_incremental(args.datasets_dir, fmt=args.format, full=args.full, seed=args.seed)
@@ -16,29 +16,26 @@ from dataclasses import dataclass
 from datetime import datetime, date
 import json
 
+from src.tax_rules import (
+    NEW_REGIME_RULES, DEFAULT_TAX_TABLE, compute_tax, compute_tax_columns, solve_gross_for_net
+)
+
 # ======================================================
 # TAX CONSTANTS (FY 2024-25)
 # ======================================================
 
-# Section limits
-LIMIT_80C = 150000
-LIMIT_80D_SELF = 25000
-LIMIT_80D_PARENTS = 25000
-LIMIT_80D_SENIOR = 50000
-LIMIT_80CCD_1B = 50000
-LIMIT_24B = 200000
-LIMIT_80TTA = 10000
-STANDARD_DEDUCTION = 50000
-
-# Tax Slabs (New Regime - Mandatory from FY 2025-26)
-TAX_SLABS = [
-    (0, 300000, 0.0),
-    (300000, 600000, 0.05),
-    (600000, 900000, 0.10),
-    (900000, 1200000, 0.15),
-    (1200000, 1500000, 0.20),
-    (1500000, float("inf"), 0.30),
-]
+# Section limits (versioned per financial year in src/tax_rules.py)
+LIMIT_80C = NEW_REGIME_RULES.limit_80c
+LIMIT_80D_SELF = NEW_REGIME_RULES.limit_80d_self
+LIMIT_80D_PARENTS = NEW_REGIME_RULES.limit_80d_parents
+LIMIT_80D_SENIOR = NEW_REGIME_RULES.limit_80d_senior
+LIMIT_80CCD_1B = NEW_REGIME_RULES.limit_80ccd_1b
+LIMIT_24B = NEW_REGIME_RULES.limit_24b
+LIMIT_80TTA = NEW_REGIME_RULES.limit_80tta
+STANDARD_DEDUCTION = NEW_REGIME_RULES.standard_deduction
+
+# Tax Slabs (New Regime - Mandatory from FY 2025-26), see src/tax_rules.py
+TAX_SLABS = NEW_REGIME_RULES.slabs
 
 # ELSS Historical Returns (for simulation)
 ELSS_AVG_RETURN = 0.12  # 12% average
@@ -102,21 +99,28 @@ def calculate_tax(taxable_income: float) -> float:
     """
     Calculate tax under New Tax Regime (Mandatory from FY 2025-26)
     This is now the only applicable regime for all Indian citizens.
+    Includes the Section 87A rebate and 4% Health & Education Cess.
     """
-    tax = 0
-    for lower, upper, rate in TAX_SLABS:
-        if taxable_income > lower:
-            taxable_amount = min(taxable_income, upper) - lower
-            tax += taxable_amount * rate
+    return compute_tax(taxable_income, DEFAULT_TAX_TABLE)
 
-    # Rebate under Section 87A (income ≤ ₹7 lakh)
-    if taxable_income <= 700000:
-        tax = 0
 
-    # Add 4% Health & Education Cess
-    tax *= 1.04
+def calculate_tax_batch(taxable_incomes, gross_incomes=None) -> Dict[str, np.ndarray]:
+    """
+    Batch form of calculate_tax for payroll-sized inputs.
+    Takes a NumPy array, pandas Series or pyarrow column and returns
+    tax, cess, rebate_applied and effective_rate as NumPy columns.
+    """
+    return compute_tax_columns(taxable_incomes, DEFAULT_TAX_TABLE, gross_income=gross_incomes)
 
-    return tax
+
+def calculate_gross_for_take_home(target_take_home):
+    """
+    Gross salary (CTC) needed for a target annual take-home under the New
+    Tax Regime. Accepts a single amount or an array of targets and solves
+    them all at once; returns a float for scalar input.
+    """
+    gross = solve_gross_for_net(target_take_home, DEFAULT_TAX_TABLE)
+    return float(gross) if np.ndim(gross) == 0 else gross
 
 
 def calculate_tax_liability(profile: UserFinancialProfile) -> Dict[str, Any]:
@@ -1,144 +1,172 @@
 import os
-from typing import Dict, List, Tuple, Any
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-import joblib
 
-# Current typical limits (adjust if law changes)
-LIMIT_80C = 150000
-LIMIT_80D = 25000
-LIMIT_NPS = 50000
+from src.forest_inference import DEFAULT_ENGINE, ENGINES, load_flat, make_predictor
+from src.itr_rules import DEFAULT_RULE_TABLE, evaluate_frame, evaluate_row, flag_names
+from src.result_cache import ResultCache
+from src.risk_features import RiskFeatures, build_features, build_features_frame, load_artifact
+from src.tax_rules import NEW_REGIME_RULES
+
+# Current typical limits (versioned per financial year in src/tax_rules.py)
+LIMIT_80C = NEW_REGIME_RULES.limit_80c
+LIMIT_80D = NEW_REGIME_RULES.limit_80d_self
+LIMIT_NPS = NEW_REGIME_RULES.limit_80ccd_1b
 
 # Model path relative to project root
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, "models", "itr_risk_rf.pkl")
+# TAX_SAVER_RISK_MODEL selects another artifact, e.g. models/itr_risk_student.pkl
+MODEL_PATH = os.getenv("TAX_SAVER_RISK_MODEL", os.path.join(BASE_DIR, "models", "itr_risk_rf.pkl"))
+
+# Rule checks as bits of the flags bitmask returned by compute_risk_for_frame
+# (the rules themselves are the table in src/itr_rules.py)
+FLAG_80C_LIMIT = DEFAULT_RULE_TABLE.bit("80c_limit")
+FLAG_80D_LIMIT = DEFAULT_RULE_TABLE.bit("80d_limit")
+FLAG_NPS_LIMIT = DEFAULT_RULE_TABLE.bit("nps_limit")
+FLAG_DEDUCTION_RATIO = DEFAULT_RULE_TABLE.bit("deduction_ratio")
+FLAG_DONATION_RATIO = DEFAULT_RULE_TABLE.bit("donation_ratio")
+FLAG_EXPENSE_RATIO = DEFAULT_RULE_TABLE.bit("expense_ratio")
+FLAG_RENT_RATIO = DEFAULT_RULE_TABLE.bit("rent_ratio")
 
+FLAG_NAMES = {int(bit): rule.name for rule, bit in zip(DEFAULT_RULE_TABLE.rules, DEFAULT_RULE_TABLE.bits)}
 
-def _safe_div(num: float, den: float) -> float:
-    den = den if den not in (0, None) else 1.0
-    return float(num) / float(den)
+# Rows per predict_proba call in compute_risk_for_frame
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Rule features reported with every score
+ENGINEERED_FEATURES = ("deduction_ratio", "donation_ratio", "rent_ratio", "expense_ratio",
+                       "total_deductions", "total_expenses")
 
 
 def compute_engineered_features(row: pd.Series) -> Dict[str, float]:
     """
     Compute key ratios used for explainability and rule checks.
     """
-    income = float(row.get("Annual_Salary", 0.0) or 0.0)
-    total_deductions = float(row.get("Total_Deductions", 0.0) or 0.0)
-    donations = float(row.get("Donations_80G", 0.0) or 0.0)
-    rent = float(row.get("Rent_Paid", 0.0) or 0.0)
-    groceries = float(row.get("Groceries", 0.0) or 0.0)
-    utilities = float(row.get("Utilities", 0.0) or 0.0)
-    entertainment = float(row.get("Entertainment", 0.0) or 0.0)
-    healthcare = float(row.get("Healthcare", 0.0) or 0.0)
-
-    total_expenses = rent + groceries + utilities + entertainment + healthcare
-
-    return {
-        "deduction_ratio": _safe_div(total_deductions, income),
-        "donation_ratio": _safe_div(donations, income),
-        "rent_ratio": _safe_div(rent, income),
-        "expense_ratio": _safe_div(total_expenses, income),
-        "total_deductions": total_deductions,
-        "total_expenses": total_expenses,
-    }
+    features = build_features(row, ()).rule
+    return {name: features[name] for name in ENGINEERED_FEATURES}
 
 
-def apply_rule_checks(row: pd.Series) -> Tuple[List[str], int, Dict[str, float]]:
+def apply_rule_checks(row: pd.Series, features: Optional[RiskFeatures] = None) -> Tuple[List[str], int, Dict[str, float]]:
     """
     Apply rule-based checks and return:
       - flags (human readable messages)
       - rule-based risk score (0–40)
       - engineered features (ratios, totals)
     """
-    flags: List[str] = []
-    risk_score = 0
-
-    feat = compute_engineered_features(row)
-
-    income = float(row.get("Annual_Salary", 0.0) or 0.0)
-    inv_80c = float(row.get("Investment_80C", 0.0) or 0.0)
-    med_80d = float(row.get("Medical_Insurance_80D", 0.0) or 0.0)
-    nps = float(row.get("NPS_Contribution_80CCD", 0.0) or 0.0)
-    donations = float(row.get("Donations_80G", 0.0) or 0.0)
-
-    # Hard limit checks
-    if inv_80c > LIMIT_80C:
-        excess = inv_80c - LIMIT_80C
-        flags.append(f"Section 80C claimed ₹{inv_80c:.0f}, exceeds limit by ₹{excess:.0f}.")
-        risk_score += 25
-
-    if med_80d > LIMIT_80D:
-        excess = med_80d - LIMIT_80D
-        flags.append(f"Section 80D claimed ₹{med_80d:.0f}, exceeds typical limit by ₹{excess:.0f}.")
-        risk_score += 20
-
-    if nps > LIMIT_NPS:
-        excess = nps - LIMIT_NPS
-        flags.append(f"NPS (80CCD) claimed ₹{nps:.0f}, exceeds typical limit by ₹{excess:.0f}.")
-        risk_score += 15
-
-    # Ratio-based sanity checks
-    if feat["deduction_ratio"] > 0.7:
-        flags.append(
-            f"Total deductions are {feat['deduction_ratio']*100:.1f}% of income — unusually high."
-        )
-        risk_score += 20
-
-    if feat["donation_ratio"] > 0.3:
-        flags.append(
-            f"Donations are {feat['donation_ratio']*100:.1f}% of income — may draw scrutiny."
-        )
-        risk_score += 15
-
-    if feat["expense_ratio"] > 0.8:
-        flags.append(
-            f"Key expenses are {feat['expense_ratio']*100:.1f}% of income — very high."
-        )
-        risk_score += 10
-
-    if income > 0 and feat["rent_ratio"] > 0.6:
-        flags.append(
-            f"Rent is {feat['rent_ratio']*100:.1f}% of income — unusually high in most cases."
-        )
-        risk_score += 10
-
-    # Cap rule-based contribution
-    risk_score = int(max(0, min(40, risk_score)))
-    return flags, risk_score, feat
+    flags, risk_score, _, rule_features = evaluate_row(row, features=None if features is None else features.rule)
+    return flags, risk_score, {name: rule_features[name] for name in ENGINEERED_FEATURES}
 
 
 def _load_rf_model():
     """
-    Load the RandomForest risk model from disk.
+    Load the RandomForest risk model from disk. Without an artifact, scores
+    come from the rule checks alone; an unreadable artifact or one whose
+    features do not match the feature store is reported, not served.
     """
     if not os.path.exists(MODEL_PATH):
         return None, None
     try:
-        data = joblib.load(MODEL_PATH)
-        return data.get("model"), data.get("features")
-    except Exception:
+        return load_artifact(MODEL_PATH)
+    except Exception as e:
+        print(f"⚠️  Risk model {MODEL_PATH} not used ({e}); scoring with rule checks only")
         return None, None
 
 
-RF_MODEL, RF_FEATURES = _load_rf_model()
+# Filled on first use, not at import: "model"/"features" (the unpickled
+# artifact), "predictor"/"predictor_features" (single-row scoring),
+# "version" (result cache key) and "in_memory" when use_model replaced
+# the artifact
+_MODEL_STATE: Dict[str, Any] = {}
+RISK_ENGINE = DEFAULT_ENGINE
 
+# compute_risk_for_dict results, keyed on rupee-rounded inputs and model_version()
+RISK_CACHE = ResultCache()
 
-def compute_ml_risk_score(row: pd.Series) -> float:
+
+def get_risk_model():
+    """(model, features) of the artifact at MODEL_PATH, unpickled once per process"""
+    if "model" not in _MODEL_STATE:
+        _MODEL_STATE["model"], _MODEL_STATE["features"] = _load_rf_model()
+    return _MODEL_STATE["model"], _MODEL_STATE["features"]
+
+
+def get_row_predictor():
+    """
+    (predictor, features) for single-row scoring. The flat engine maps the
+    exported arrays (models/itr_risk_rf_flat/) when they match MODEL_PATH,
+    without unpickling the forest; otherwise it flattens the loaded model.
+    """
+    if "predictor" not in _MODEL_STATE:
+        from_disk = RISK_ENGINE == "flat" and not _MODEL_STATE.get("in_memory")
+        flat = load_flat(MODEL_PATH) if from_disk else None
+        if flat is not None and flat.feature_names:
+            _MODEL_STATE["predictor"], _MODEL_STATE["predictor_features"] = flat, flat.feature_names
+        else:
+            model, features = get_risk_model()
+            try:
+                predictor = make_predictor(model, RISK_ENGINE, features)
+            except (AttributeError, ValueError):
+                # Not a flattenable forest: serve it through sklearn
+                predictor = model
+            _MODEL_STATE["predictor"], _MODEL_STATE["predictor_features"] = predictor, features
+    return _MODEL_STATE["predictor"], _MODEL_STATE["predictor_features"]
+
+
+def model_version() -> Tuple:
+    """Identifies the model behind the scores: engine plus artifact size and mtime"""
+    if "version" not in _MODEL_STATE:
+        try:
+            stat = os.stat(MODEL_PATH)
+            _MODEL_STATE["version"] = (RISK_ENGINE, MODEL_PATH, stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            _MODEL_STATE["version"] = (RISK_ENGINE, MODEL_PATH, None, None)
+    return _MODEL_STATE["version"]
+
+
+def set_engine(engine: str):
+    """Switch single-row scoring between the sklearn forest and its flattened copy"""
+    global RISK_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown risk engine {engine!r}; expected one of {ENGINES}")
+    RISK_ENGINE = engine
+    _MODEL_STATE.pop("predictor", None)
+    if _MODEL_STATE.get("in_memory"):
+        _MODEL_STATE["version"] = (engine,) + _MODEL_STATE["version"][1:]
+    else:
+        _MODEL_STATE.pop("version", None)
+
+
+def set_model_path(path: str):
+    """Score with the artifact at path (loaded on next use) instead of MODEL_PATH"""
+    global MODEL_PATH
+    MODEL_PATH = path
+    _MODEL_STATE.clear()
+
+
+def use_model(model, features: List[str]):
+    """Score with an in-memory model instead of MODEL_PATH (benchmarks, notebooks)"""
+    _MODEL_STATE.clear()
+    _MODEL_STATE["model"], _MODEL_STATE["features"] = model, features
+    _MODEL_STATE["in_memory"] = True
+    _MODEL_STATE["version"] = (RISK_ENGINE, f"in-memory:{id(model)}")
+
+
+def compute_ml_risk_score(row: pd.Series, features: Optional[RiskFeatures] = None) -> float:
     """
     Use trained RandomForest to predict probability of 'risky' (label=1).
     Map probability to a 0–60 risk contribution.
     """
-    if RF_MODEL is None or RF_FEATURES is None:
+    predictor, names = get_row_predictor()
+    if predictor is None or names is None:
         return 0.0
 
-    x = []
-    for col in RF_FEATURES:
-        x.append(float(row.get(col, 0.0) or 0.0))
-    X = np.array(x, dtype=float).reshape(1, -1)
+    # Missing and NaN features read as 0 (the forest does not accept NaN)
+    if features is None or features.names != tuple(names):
+        features = build_features(row, names)
 
-    proba = RF_MODEL.predict_proba(X)[0, 1]  # probability of risky
+    proba = predictor.predict_proba(features.matrix)[0, 1]  # probability of risky
     ml_score = float(proba * 60.0)  # 0–60
     return ml_score
 
@@ -149,9 +177,15 @@ def compute_risk_for_row(row: pd.Series) -> Dict[str, Any]:
       - Run rule-based checks
       - Run ML model
       - Combine into final risk score
+
+    A row without Total_Deductions gets the sum of its deduction columns
+    (as the SHAP analyzer always did), where this engine used to read it
+    as 0; such rows can now raise the high-deduction-ratio flag.
     """
-    rule_flags, rule_score, feat = apply_rule_checks(row)
-    ml_score = compute_ml_risk_score(row)
+    # Rule and model features computed once, by the feature store
+    features = build_features(row, get_row_predictor()[1] or ())
+    rule_flags, rule_score, feat = apply_rule_checks(row, features)
+    ml_score = compute_ml_risk_score(row, features)
 
     total_risk = int(max(0, min(100, rule_score + ml_score)))
 
@@ -169,7 +203,68 @@ def compute_risk_for_row(row: pd.Series) -> Dict[str, Any]:
 
 def compute_risk_for_dict(data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Convenience wrapper to be used from Streamlit.
+    Convenience wrapper to be used from Streamlit. Amounts are rounded to
+    the rupee, and repeat inputs are answered from RISK_CACHE.
     """
-    row = pd.Series(data)
-    return compute_risk_for_row(row)
+    return RISK_CACHE.get_or_compute(data, lambda inputs: compute_risk_for_row(pd.Series(inputs)),
+                                     version=model_version())
+
+
+# ======================================================
+# Batch scoring
+# ======================================================
+def compute_engineered_features_frame(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Vectorized compute_engineered_features: one array per feature"""
+    features = build_features_frame(df, ()).rule
+    return {name: features[name] for name in ENGINEERED_FEATURES}
+
+
+def apply_rule_checks_frame(df: pd.DataFrame, features: Optional[RiskFeatures] = None
+                            ) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Vectorized apply_rule_checks. Returns the flags bitmask (see FLAG_*),
+    the capped rule score (0–40) and the engineered features.
+    """
+    flags, risk_score, rule_features = evaluate_frame(df, features=None if features is None else features.rule)
+    return flags, risk_score, {name: rule_features[name] for name in ENGINEERED_FEATURES}
+
+
+def compute_ml_risk_score_frame(df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                features: Optional[RiskFeatures] = None) -> np.ndarray:
+    """Vectorized compute_ml_risk_score: one predict_proba call per chunk of rows"""
+    ml_score = np.zeros(len(df))
+    model, names = get_risk_model()
+    if model is None or names is None:
+        return ml_score
+
+    # Missing model features read as 0, as in the row path. Batches always
+    # use the sklearn forest: its compiled traversal wins past a few rows
+    if features is None or features.names != tuple(names):
+        features = build_features_frame(df, names)
+    X = features.matrix
+    for start in range(0, len(df), chunk_size):
+        stop = start + chunk_size
+        ml_score[start:stop] = model.predict_proba(X[start:stop])[:, 1] * 60.0
+    return ml_score
+
+
+def compute_risk_for_frame(df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """
+    compute_risk_for_row over every row of df at once. Returns arrays
+    aligned with the rows: risk_score, rule_score, ml_score (unrounded),
+    flags (bitmask of FLAG_*) and the engineered features. A frame
+    without Total_Deductions gets it summed from the deduction columns,
+    as in compute_risk_for_row.
+    """
+    features = build_features_frame(df, get_risk_model()[1] or ())
+    flags, rule_score, feat = apply_rule_checks_frame(df, features)
+    ml_score = compute_ml_risk_score_frame(df, chunk_size, features)
+    risk_score = np.clip(rule_score + ml_score, 0, 100).astype(np.int32)
+
+    return {
+        "risk_score": risk_score,
+        "rule_score": rule_score,
+        "ml_score": ml_score,
+        "flags": flags,
+        **feat,
+    }
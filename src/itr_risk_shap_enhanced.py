@@ -6,100 +6,114 @@ Provides clear, visual explanations of WHY AI predicted a certain risk score
 
 import os
 import sys
-import pickle
 import numpy as np
 import pandas as pd
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import shap
-from typing import Dict, Tuple, List
+from typing import Dict, List, Optional, Tuple
 import io
 import base64
 
 # Get project root
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "itr_risk_rf.pkl")
+# Same artifact as itr_risk_engine: TAX_SAVER_RISK_MODEL, else the trained forest
+MODEL_PATH = os.getenv("TAX_SAVER_RISK_MODEL", os.path.join(PROJECT_ROOT, "models", "itr_risk_rf.pkl"))
+
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.forest_inference import DEFAULT_ENGINE, ENGINES, load_flat, make_predictor
+from src.itr_rules import evaluate_row
+from src.result_cache import ResultCache
+from src.risk_features import RiskFeatures, build_features, load_artifact
+from src.tax_rules import NEW_REGIME_RULES
+
+# (model, predictor, features) per (engine, artifact mtime), shared by every analyzer
+# (Streamlit session) in this process
+_SHARED_MODELS: Dict[Tuple, Tuple] = {}
+
+# analyze() results per (engine, artifact mtime) and rupee-rounded inputs
+ANALYSIS_CACHE = ResultCache()
 
 
 class EnhancedITRRiskAnalyzer:
     """Enhanced ITR Risk Analyzer with Detailed SHAP Explanations"""
 
-    def __init__(self):
-        """Initialize the analyzer"""
-        self.model = None
-        self.feature_names = [
-            'Annual_Salary',
-            'Investment_80C',
-            'Medical_Insurance_80D',
-            'Home_Loan_Interest_24b',
-            'Donations_80G',
-            'Rent_Paid',
-            'Deduction_Ratio',
-            'Donation_Ratio',
-            'Rent_Ratio'
-        ]
-        self.load_model()
+    def __init__(self, engine: str = DEFAULT_ENGINE):
+        """Initialize the analyzer; engine scores with "sklearn" or the "flat" forest"""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown risk engine {engine!r}; expected one of {ENGINES}")
+        self.engine = engine
+        self._model = None
+        self._predictor = None
+        self._features = None
+
+    @property
+    def model(self):
+        """The loaded model (forest or distilled student), loaded on first use"""
+        if self._model is None:
+            self.load_model()
+        return self._model
+
+    @property
+    def predictor(self):
+        """What risk scores come from (the forest or its flat copy), loaded on first use"""
+        if self._predictor is None:
+            self.load_model()
+        return self._predictor
+
+    @property
+    def feature_names(self) -> List[str]:
+        """The model's feature columns, as saved in its artifact"""
+        if self._features is None:
+            self.load_model()
+        return self._features
+
+    @property
+    def explained_model(self):
+        """The trees SHAP explains: a distilled student's regressor, else the model itself"""
+        return getattr(self.model, "regressor", self.model)
+
+    def model_key(self) -> Tuple:
+        """(engine, artifact, mtime): which shared model, and which cached analyses, apply"""
+        try:
+            return self.engine, MODEL_PATH, os.stat(MODEL_PATH).st_mtime_ns
+        except OSError:
+            return self.engine, MODEL_PATH, None
 
     def load_model(self):
-        """Load or create the Random Forest model"""
+        """Load the Random Forest model (once per process); raises if it is missing or mismatched"""
+        key = self.model_key()
+        if key not in _SHARED_MODELS:
+            _SHARED_MODELS[key] = self._load_shared_model()
+        self._model, self._predictor, self._features = _SHARED_MODELS[key]
+
+    def _load_shared_model(self) -> Tuple:
+        # The artifact's features are validated against src/risk_features.py
+        model, features = load_artifact(MODEL_PATH)
+        print(f"Model loaded from {MODEL_PATH}")
+
+        # The flat engine maps the exported arrays, shared by all processes
+        flat = load_flat(MODEL_PATH) if self.engine == "flat" else None
+        if flat is not None:
+            return model, flat, features
         try:
-            with open(MODEL_PATH, 'rb') as f:
-                self.model = pickle.load(f)
-            print(f"Model loaded from {MODEL_PATH}")
-        except:
-            print("Warning: Creating dummy model for demonstration...")
-            from sklearn.ensemble import RandomForestClassifier
-            self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-            X_dummy = np.random.rand(100, len(self.feature_names))
-            y_dummy = np.random.randint(0, 2, 100)
-            self.model.fit(X_dummy, y_dummy)
-
-    def calculate_derived_features(self, data: Dict) -> Dict:
-        """Calculate derived ratios"""
-        salary = data.get('Annual_Salary', 0)
+            return model, make_predictor(model, self.engine, features), features
+        except (AttributeError, ValueError):
+            return model, model, features
 
-        if salary > 0:
-            total_deductions = (
-                data.get('Investment_80C', 0) +
-                data.get('Medical_Insurance_80D', 0) +
-                data.get('Home_Loan_Interest_24b', 0) +
-                data.get('Donations_80G', 0)
-            )
-            data['Deduction_Ratio'] = total_deductions / salary
-            data['Donation_Ratio'] = data.get('Donations_80G', 0) / salary
-            data['Rent_Ratio'] = data.get('Rent_Paid', 0) / salary
-        else:
-            data['Deduction_Ratio'] = 0
-            data['Donation_Ratio'] = 0
-            data['Rent_Ratio'] = 0
-
-        return data
-
-    def prepare_features(self, data: Dict) -> np.ndarray:
-        """Prepare feature vector"""
-        data = self.calculate_derived_features(data)
-
-        features = np.array([
-            data.get('Annual_Salary', 0),
-            data.get('Investment_80C', 0),
-            data.get('Medical_Insurance_80D', 0),
-            data.get('Home_Loan_Interest_24b', 0),
-            data.get('Donations_80G', 0),
-            data.get('Rent_Paid', 0),
-            data.get('Deduction_Ratio', 0),
-            data.get('Donation_Ratio', 0),
-            data.get('Rent_Ratio', 0)
-        ]).reshape(1, -1)
-
-        return features
-
-    def predict_risk(self, data: Dict) -> Dict:
+    def prepare_features(self, data: Dict) -> RiskFeatures:
+        """Rule features and the model's feature vector, from the shared feature store"""
+        return build_features(data, self.feature_names)
+
+    def predict_risk(self, data: Dict, features: Optional[RiskFeatures] = None) -> Dict:
         """Predict ITR risk score"""
         try:
-            features = self.prepare_features(data)
+            if features is None:
+                features = self.prepare_features(data)
 
-            risk_prob = self.model.predict_proba(features)[0][1]
+            risk_prob = self.predictor.predict_proba(features.matrix)[0][1]
             risk_score = int(risk_prob * 100)
 
             if risk_score < 30:
@@ -121,7 +135,7 @@ class EnhancedITRRiskAnalyzer:
                 "risk_color": risk_color,
                 "risk_emoji": risk_emoji,
                 "risk_probability": float(risk_prob),
-                "features": features
+                "features": features.matrix
             }
 
         except Exception as e:
@@ -134,14 +148,16 @@ class EnhancedITRRiskAnalyzer:
                 "features": None
             }
 
-    def generate_detailed_shap_explanation(self, data: Dict) -> Dict:
+    def generate_detailed_shap_explanation(self, data: Dict, features: Optional[RiskFeatures] = None) -> Dict:
         """Generate detailed SHAP explanations with clear interpretations"""
         try:
-            features = self.prepare_features(data)
+            if features is None:
+                features = self.prepare_features(data)
 
-            # Create SHAP explainer
-            explainer = shap.TreeExplainer(self.model)
-            shap_values = explainer.shap_values(features)
+            # Create SHAP explainer. A student regressor predicts P(risky) directly,
+            # so its (rows, features) values are already on the high-risk scale
+            explainer = shap.TreeExplainer(self.explained_model)
+            shap_values = explainer.shap_values(features.matrix)
 
             # Get SHAP values for high risk class (class 1)
             # SHAP values could be:
@@ -178,7 +194,7 @@ class EnhancedITRRiskAnalyzer:
 
             # Create feature importance dataframe
             # Ensure all arrays are 1-dimensional and same length
-            feature_values = features[0].flatten()
+            feature_values = features.matrix[0].flatten()
 
             # Handle shap_values_risk - could be 1D or 2D
             if hasattr(shap_values_risk, 'flatten'):
@@ -229,7 +245,7 @@ class EnhancedITRRiskAnalyzer:
                     impact_color = "#10b981"
 
                 # Generate human-readable explanation
-                explanation_text = self._generate_feature_explanation(feature, value, shap_val, data)
+                explanation_text = self._generate_feature_explanation(feature, value, shap_val, features.rule)
 
                 explanation = {
                     "feature": self._format_feature_name(feature),
@@ -283,21 +299,23 @@ class EnhancedITRRiskAnalyzer:
         """Format feature name for display"""
         name_map = {
             'Annual_Salary': 'Annual Salary',
+            'Total_Deductions': 'Total Deductions',
+            'Taxable_Income': 'Taxable Income',
             'Investment_80C': '80C Investments',
             'Medical_Insurance_80D': 'Health Insurance (80D)',
+            'NPS_Contribution_80CCD': 'NPS (80CCD)',
             'Home_Loan_Interest_24b': 'Home Loan Interest',
             'Donations_80G': 'Donations (80G)',
             'Rent_Paid': 'Rent Paid',
-            'Deduction_Ratio': 'Total Deductions / Salary',
-            'Donation_Ratio': 'Donations / Salary',
-            'Rent_Ratio': 'Rent / Salary'
+            'Groceries': 'Groceries',
+            'Utilities': 'Utilities',
+            'Entertainment': 'Entertainment',
+            'Healthcare': 'Healthcare Expenses'
         }
         return name_map.get(feature, feature)
 
-    def _generate_feature_explanation(self, feature: str, value: float, shap_val: float, data: Dict) -> str:
+    def _generate_feature_explanation(self, feature: str, value: float, shap_val: float, rule_features: Dict) -> str:
         """Generate human-readable explanation for each feature"""
-        salary = data.get('Annual_Salary', 0)
-
         if feature == 'Annual_Salary':
             if shap_val > 0:
                 return f"Your salary of ₹{value:,.0f} is in a bracket that slightly increases scrutiny risk."
@@ -305,7 +323,7 @@ class EnhancedITRRiskAnalyzer:
                 return f"Your salary of ₹{value:,.0f} is normal and doesn't raise concerns."
 
         elif feature == 'Investment_80C':
-            if value > 150000:
+            if value > NEW_REGIME_RULES.limit_80c:
                 return f"Your 80C investments of ₹{value:,.0f} exceed the limit of ₹1.5L, which is a red flag."
             elif shap_val > 0:
                 return f"Your 80C investments of ₹{value:,.0f} are high relative to income, raising minor concerns."
@@ -313,7 +331,7 @@ class EnhancedITRRiskAnalyzer:
                 return f"Your 80C investments of ₹{value:,.0f} are within normal limits."
 
         elif feature == 'Medical_Insurance_80D':
-            limit = 50000 if data.get('age', 30) >= 60 else 25000
+            limit = rule_features['limit_80d']
             if value > limit:
                 return f"Your health insurance of ₹{value:,.0f} exceeds the limit of ₹{limit:,.0f}."
             elif shap_val > 0:
@@ -321,6 +339,14 @@ class EnhancedITRRiskAnalyzer:
             else:
                 return f"Your health insurance of ₹{value:,.0f} is reasonable."
 
+        elif feature == 'NPS_Contribution_80CCD':
+            if value > NEW_REGIME_RULES.limit_80ccd_1b:
+                return f"Your NPS contribution of ₹{value:,.0f} exceeds the 80CCD(1B) limit of ₹{NEW_REGIME_RULES.limit_80ccd_1b:,.0f}."
+            elif shap_val > 0:
+                return f"Your NPS contribution of ₹{value:,.0f} is on the higher side."
+            else:
+                return f"Your NPS contribution of ₹{value:,.0f} is within normal limits."
+
         elif feature == 'Home_Loan_Interest_24b':
             if value > 200000:
                 return f"Your home loan interest of ₹{value:,.0f} exceeds the ₹2L limit for self-occupied property."
@@ -341,8 +367,8 @@ class EnhancedITRRiskAnalyzer:
             else:
                 return f"Your rent of ₹{value:,.0f}/year seems reasonable."
 
-        elif feature == 'Deduction_Ratio':
-            percentage = value * 100
+        elif feature == 'Total_Deductions':
+            percentage = rule_features['deduction_ratio'] * 100
             if percentage > 70:
                 return f"Your total deductions are {percentage:.1f}% of income - this is unusually high and may trigger scrutiny."
             elif percentage > 50:
@@ -350,23 +376,18 @@ class EnhancedITRRiskAnalyzer:
             else:
                 return f"Your deductions are {percentage:.1f}% of income - within normal range."
 
-        elif feature == 'Donation_Ratio':
-            percentage = value * 100
-            if percentage > 30:
-                return f"Donations are {percentage:.1f}% of income - very high proportion may be questioned."
-            elif percentage > 15:
-                return f"Donations are {percentage:.1f}% of income - ensure proper documentation."
+        elif feature == 'Taxable_Income':
+            if shap_val > 0:
+                return f"Your taxable income of ₹{value:,.0f} is low relative to your salary, which slightly increases scrutiny risk."
             else:
-                return f"Donations are {percentage:.1f}% of income - reasonable amount."
-
-        elif feature == 'Rent_Ratio':
-            percentage = value * 100
-            if percentage > 50:
-                return f"Rent is {percentage:.1f}% of income - very high. Verify HRA exemption calculation."
-            elif percentage > 30:
-                return f"Rent is {percentage:.1f}% of income - on the higher side but acceptable."
+                return f"Your taxable income of ₹{value:,.0f} is consistent with your salary and deductions."
+
+        elif feature in ('Groceries', 'Utilities', 'Entertainment', 'Healthcare'):
+            percentage = value / rule_features['income'] * 100 if rule_features['income'] > 0 else 0.0
+            if shap_val > 0:
+                return f"{self._format_feature_name(feature)} of ₹{value:,.0f} ({percentage:.1f}% of income) is high for your income."
             else:
-                return f"Rent is {percentage:.1f}% of income - normal for most cities."
+                return f"{self._format_feature_name(feature)} of ₹{value:,.0f} ({percentage:.1f}% of income) looks normal."
 
         return f"Value: ₹{value:,.0f}"
 
@@ -414,15 +435,36 @@ class EnhancedITRRiskAnalyzer:
         return interpretation
 
     def analyze(self, data: Dict) -> Dict:
-        """Complete analysis with risk prediction and SHAP explanation"""
-        # Get risk prediction
-        prediction = self.predict_risk(data)
+        """Complete analysis with risk prediction and SHAP explanation (cached per input)"""
+        return ANALYSIS_CACHE.get_or_compute(data, self._analyze, version=self.model_key())
+
+    def _analyze(self, data: Dict) -> Dict:
+        """Uncached analyze()"""
+        # Features computed once, shared by the prediction, SHAP and the flags
+        try:
+            features = self.prepare_features(data)
+        except Exception as e:
+            # No stand-in model: report the score as unavailable, keep the rule flags
+            print(f"❌ No usable risk model at {MODEL_PATH}: {e}")
+            features = None
 
-        # Generate SHAP explanation
-        shap_result = self.generate_detailed_shap_explanation(data)
+        if features is not None:
+            # Get risk prediction
+            prediction = self.predict_risk(data, features)
+
+            # Generate SHAP explanation
+            shap_result = self.generate_detailed_shap_explanation(data, features)
+        else:
+            prediction = self.predict_risk(data)
+            shap_result = {
+                "explanations": [],
+                "overall_interpretation": "Risk model unavailable. Run src/train_itr_risk_model.py to train it.",
+                "success": False
+            }
 
         # Generate flags
-        flags = self._generate_flags(data, prediction['risk_score'])
+        model_ok = prediction['risk_level'] != "ERROR"
+        flags = self._generate_flags(data, prediction['risk_score'] if model_ok else None, features)
 
         return {
             "risk_score": prediction['risk_score'],
@@ -437,31 +479,21 @@ class EnhancedITRRiskAnalyzer:
             "success": shap_result['success']
         }
 
-    def _generate_flags(self, data: Dict, risk_score: int) -> List[str]:
-        """Generate specific risk flags"""
+    def _generate_flags(self, data: Dict, risk_score: Optional[int], features: Optional[RiskFeatures] = None) -> List[str]:
+        """Generate specific risk flags (risk_score is None when the model is unavailable)"""
         flags = []
         salary = data.get('Annual_Salary', 0)
 
         if salary == 0:
             return ["No income data provided"]
 
-        if data.get('Investment_80C', 0) > 150000:
-            flags.append("🚨 Section 80C exceeds Rs.1.5L limit - major red flag")
-
-        if data.get('Medical_Insurance_80D', 0) > 50000:
-            flags.append("⚠️  Health insurance exceeds Rs.50K limit (senior citizen)")
-
-        deduction_ratio = (
-            data.get('Investment_80C', 0) +
-            data.get('Medical_Insurance_80D', 0) +
-            data.get('Home_Loan_Interest_24b', 0) +
-            data.get('Donations_80G', 0)
-        ) / salary if salary > 0 else 0
-
-        if deduction_ratio > 0.7:
-            flags.append(f"⚠️  Total deductions are {deduction_ratio*100:.1f}% of income - unusually high")
+        # Same checks and limits as itr_risk_engine (80D: ₹25K, ₹50K from age 60)
+        messages, _, _, _ = evaluate_row(data, features=None if features is None else features.rule)
+        flags.extend(f"⚠️  {message}" for message in messages)
 
-        if risk_score < 30:
+        if risk_score is None:
+            flags.append("❓ Risk model unavailable - flags come from the rule checks only")
+        elif risk_score < 30:
             if not flags:
                 flags.append("✅ Your return looks normal - low scrutiny risk")
         elif risk_score >= 60:
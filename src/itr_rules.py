@@ -0,0 +1,268 @@
+"""
+ITR Risk Rule Table
+===================
+Single source of truth for the rule-based ITR scrutiny checks used by
+itr_risk_engine and the SHAP analyzer.
+
+Each rule is a row of data: the feature it tests, a comparison, a
+threshold (a constant, or the name of a per-row feature such as the
+age-dependent 80D limit), the score it adds and a message template.
+Section limits come from the FY rule set in src/tax_rules.py.
+
+compile_risk_rules turns a table into arrays once. evaluate_frame then
+scores any number of rows with a few NumPy operations per comparison
+operator, and evaluate_row is the scalar path for single filings.
+Neither knows about individual rules, so adding a check is a new
+RiskRule in default_rules and nothing else.
+"""
+
+import operator
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.tax_rules import NEW_REGIME_RULES, TaxRuleSet
+
+
+@dataclass(frozen=True)
+class RiskRule:
+    """One check: flag when `feature op threshold` (and `guard` > 0, if set)"""
+    name: str
+    feature: str
+    op: str
+    threshold: Union[float, str]  # constant, or the name of a per-row feature
+    score: int
+    # str.format template; fields: value, threshold, excess, percent
+    message: str
+    guard: Optional[str] = None
+
+
+OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+# Rule-based contribution to the 0–100 risk score
+RULE_SCORE_CAP = 40
+SENIOR_CITIZEN_AGE = 60
+DEFAULT_AGE = 30
+
+DEDUCTION_COLUMNS = ("Investment_80C", "Medical_Insurance_80D", "NPS_Contribution_80CCD",
+                     "Home_Loan_Interest_24b", "Donations_80G")
+EXPENSE_COLUMNS = ("Rent_Paid", "Groceries", "Utilities", "Entertainment", "Healthcare")
+
+
+def default_rules(rules: TaxRuleSet = NEW_REGIME_RULES) -> Tuple[RiskRule, ...]:
+    """The ITR checks for one financial year's section limits"""
+    return (
+        # Hard limit checks
+        RiskRule("80c_limit", "Investment_80C", ">", rules.limit_80c, 25,
+                 "Section 80C claimed ₹{value:.0f}, exceeds limit by ₹{excess:.0f}."),
+        RiskRule("80d_limit", "Medical_Insurance_80D", ">", "limit_80d", 20,
+                 "Section 80D claimed ₹{value:.0f}, exceeds typical limit by ₹{excess:.0f}."),
+        RiskRule("nps_limit", "NPS_Contribution_80CCD", ">", rules.limit_80ccd_1b, 15,
+                 "NPS (80CCD) claimed ₹{value:.0f}, exceeds typical limit by ₹{excess:.0f}."),
+        # Ratio-based sanity checks
+        RiskRule("deduction_ratio", "deduction_ratio", ">", 0.7, 20,
+                 "Total deductions are {percent:.1f}% of income — unusually high."),
+        RiskRule("donation_ratio", "donation_ratio", ">", 0.3, 15,
+                 "Donations are {percent:.1f}% of income — may draw scrutiny."),
+        RiskRule("expense_ratio", "expense_ratio", ">", 0.8, 10,
+                 "Key expenses are {percent:.1f}% of income — very high."),
+        RiskRule("rent_ratio", "rent_ratio", ">", 0.6, 10,
+                 "Rent is {percent:.1f}% of income — unusually high in most cases.",
+                 guard="income"),
+    )
+
+
+ITR_RISK_RULES = default_rules()
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledRuleTable:
+    """Arrays built from a rule table by compile_risk_rules()"""
+    rules: Tuple[RiskRule, ...]
+    features: Tuple[str, ...]  # feature tested by each rule
+    bits: np.ndarray  # flag bit of each rule
+    scores: np.ndarray
+    thresholds: np.ndarray  # constant thresholds (NaN where per-row)
+    row_thresholds: Tuple[Tuple[int, str], ...]  # (rule index, feature) for per-row thresholds
+    guards: Tuple[Tuple[int, str], ...]  # (rule index, feature that must be > 0)
+    op_groups: Tuple[Tuple[str, np.ndarray], ...]  # rule indexes per operator
+    flag_dtype: Any
+    score_cap: int
+
+    def bit(self, name: str) -> int:
+        for rule, bit in zip(self.rules, self.bits):
+            if rule.name == name:
+                return int(bit)
+        raise KeyError(f"No rule named {name!r}")
+
+
+def _flag_dtype(n_rules: int):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n_rules <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError(f"At most 64 rules fit a flags bitmask, got {n_rules}")
+
+
+def compile_risk_rules(rules: Tuple[RiskRule, ...] = ITR_RISK_RULES,
+                       score_cap: int = RULE_SCORE_CAP) -> CompiledRuleTable:
+    """Compile a rule table; rule i sets bit 1 << i of the flags bitmask"""
+    for rule in rules:
+        if rule.op not in OPS:
+            raise ValueError(f"Rule {rule.name!r} has unknown operator {rule.op!r}; expected one of {tuple(OPS)}")
+    if len({rule.name for rule in rules}) != len(rules):
+        raise ValueError("Rule names must be unique")
+
+    flag_dtype = _flag_dtype(len(rules))
+    return CompiledRuleTable(
+        rules=tuple(rules),
+        features=tuple(rule.feature for rule in rules),
+        bits=np.array([1 << i for i in range(len(rules))], dtype=np.uint64),
+        scores=np.array([rule.score for rule in rules], dtype=np.int64),
+        thresholds=np.array([np.nan if isinstance(rule.threshold, str) else rule.threshold for rule in rules],
+                            dtype=float),
+        row_thresholds=tuple((i, rule.threshold) for i, rule in enumerate(rules) if isinstance(rule.threshold, str)),
+        guards=tuple((i, rule.guard) for i, rule in enumerate(rules) if rule.guard),
+        op_groups=tuple((op, np.array([i for i, rule in enumerate(rules) if rule.op == op]))
+                        for op in OPS if any(rule.op == op for rule in rules)),
+        flag_dtype=flag_dtype,
+        score_cap=score_cap,
+    )
+
+
+DEFAULT_RULE_TABLE = compile_risk_rules()
+
+
+# ======================================================
+# FEATURES
+# ======================================================
+def _value(row: Mapping, key: str, default: float = 0.0) -> float:
+    """A field as float; missing or falsy reads as default, NaN stays NaN"""
+    return float(row.get(key, default) or default)
+
+
+def _safe_div(num: float, den: float) -> float:
+    den = den if den not in (0, None) else 1.0
+    return float(num) / float(den)
+
+
+def derive_features(row: Mapping, rules: TaxRuleSet = NEW_REGIME_RULES) -> Dict[str, float]:
+    """Every feature a rule can test, for one filing (dict or Series)"""
+    income = _value(row, "Annual_Salary")
+    if "Total_Deductions" in row:
+        total_deductions = _value(row, "Total_Deductions")
+    else:
+        total_deductions = sum(_value(row, col) for col in DEDUCTION_COLUMNS)
+    total_expenses = sum(_value(row, col) for col in EXPENSE_COLUMNS)
+    senior = _value(row, "age", DEFAULT_AGE) >= SENIOR_CITIZEN_AGE
+
+    features = {col: _value(row, col) for col in DEDUCTION_COLUMNS + EXPENSE_COLUMNS}
+    features.update({
+        "income": income,
+        "total_deductions": total_deductions,
+        "total_expenses": total_expenses,
+        "deduction_ratio": _safe_div(total_deductions, income),
+        "donation_ratio": _safe_div(features["Donations_80G"], income),
+        "rent_ratio": _safe_div(features["Rent_Paid"], income),
+        "expense_ratio": _safe_div(total_expenses, income),
+        "limit_80d": float(rules.limit_80d_senior if senior else rules.limit_80d_self),
+    })
+    return features
+
+
+def _frame_column(df: pd.DataFrame, col: str, default: float = 0.0) -> np.ndarray:
+    """A column as float64; missing columns read as default and NaN stays NaN"""
+    if col not in df.columns:
+        return np.full(len(df), default)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+
+def _safe_div_array(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    return num / np.where(den == 0, 1.0, den)
+
+
+def derive_features_frame(df: pd.DataFrame, rules: TaxRuleSet = NEW_REGIME_RULES) -> Dict[str, np.ndarray]:
+    """derive_features for every row of df, one array per feature"""
+    features = {col: _frame_column(df, col) for col in DEDUCTION_COLUMNS + EXPENSE_COLUMNS}
+    income = _frame_column(df, "Annual_Salary")
+    if "Total_Deductions" in df.columns:
+        total_deductions = _frame_column(df, "Total_Deductions")
+    else:
+        total_deductions = sum(features[col] for col in DEDUCTION_COLUMNS)
+    total_expenses = sum(features[col] for col in EXPENSE_COLUMNS)
+    senior = _frame_column(df, "age", DEFAULT_AGE) >= SENIOR_CITIZEN_AGE
+
+    features.update({
+        "income": income,
+        "total_deductions": total_deductions,
+        "total_expenses": total_expenses,
+        "deduction_ratio": _safe_div_array(total_deductions, income),
+        "donation_ratio": _safe_div_array(features["Donations_80G"], income),
+        "rent_ratio": _safe_div_array(features["Rent_Paid"], income),
+        "expense_ratio": _safe_div_array(total_expenses, income),
+        "limit_80d": np.where(senior, rules.limit_80d_senior, rules.limit_80d_self).astype(float),
+    })
+    return features
+
+
+# ======================================================
+# EVALUATION
+# ======================================================
+def evaluate_row(row: Mapping, table: CompiledRuleTable = DEFAULT_RULE_TABLE,
+                 tax_rules: TaxRuleSet = NEW_REGIME_RULES,
+                 features: Optional[Dict[str, float]] = None) -> Tuple[List[str], int, int, Dict[str, float]]:
+    """
+    Scalar path for one filing. Returns the messages of the rules that
+    fired, the capped score, the flags bitmask and the features (pass
+    derive_features output as `features` to reuse it).
+    """
+    if features is None:
+        features = derive_features(row, tax_rules)
+    messages: List[str] = []
+    score = 0
+    flags = 0
+    for rule, bit in zip(table.rules, table.bits):
+        value = features[rule.feature]
+        threshold = features[rule.threshold] if isinstance(rule.threshold, str) else rule.threshold
+        if not OPS[rule.op](value, threshold) or (rule.guard and not features[rule.guard] > 0):
+            continue
+        messages.append(rule.message.format(value=value, threshold=threshold,
+                                            excess=value - threshold, percent=value * 100))
+        score += rule.score
+        flags |= int(bit)
+    return messages, int(max(0, min(table.score_cap, score))), flags, features
+
+
+def evaluate_frame(df: pd.DataFrame, table: CompiledRuleTable = DEFAULT_RULE_TABLE,
+                   tax_rules: TaxRuleSet = NEW_REGIME_RULES,
+                   features: Optional[Dict[str, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Vectorized path for any number of filings. Returns the flags bitmask
+    (table.flag_dtype), the capped score (int32) and the features (pass
+    derive_features_frame output as `features` to reuse it).
+    """
+    if features is None:
+        features = derive_features_frame(df, tax_rules)
+    n_rows, n_rules = len(df), len(table.rules)
+
+    values = np.column_stack([features[name] for name in table.features]) if n_rules else np.empty((n_rows, 0))
+    thresholds = np.empty((n_rows, n_rules))
+    thresholds[:] = table.thresholds
+    for i, name in table.row_thresholds:
+        thresholds[:, i] = features[name]
+
+    hits = np.zeros((n_rows, n_rules), dtype=bool)
+    for op, index in table.op_groups:
+        hits[:, index] = OPS[op](values[:, index], thresholds[:, index])
+    for i, name in table.guards:
+        hits[:, i] &= features[name] > 0
+
+    flags = np.bitwise_or.reduce(np.where(hits, table.bits, np.uint64(0)), axis=1).astype(table.flag_dtype)
+    score = np.clip(hits @ table.scores, 0, table.score_cap).astype(np.int32)
+    return flags, score, features
+
+
+def flag_names(flags: int, table: CompiledRuleTable = DEFAULT_RULE_TABLE) -> List[str]:
+    """Names of the rules set in one row's flags bitmask"""
+    return [rule.name for rule, bit in zip(table.rules, table.bits) if int(flags) & int(bit)]
@@ -12,6 +12,8 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
+from src.tax_rules import DEFAULT_TAX_TABLE, compute_tax
+
 try:
     import tensorflow as tf
     from tensorflow import keras
@@ -36,32 +38,12 @@ class LSTMTaxPredictor:
         self.sequence_length = 3  # Use 3 years of history
         self.tensorflow_available = TENSORFLOW_AVAILABLE
 
-        # Tax slabs (New Regime)
-        self.tax_slabs = [
-            (0, 300000, 0.0),
-            (300000, 600000, 0.05),
-            (600000, 900000, 0.10),
-            (900000, 1200000, 0.15),
-            (1200000, 1500000, 0.20),
-            (1500000, float("inf"), 0.30),
-        ]
+        # Compiled New Regime tax table (slabs, 87A rebate, cess)
+        self.tax_table = DEFAULT_TAX_TABLE
 
     def calculate_tax(self, income: float) -> float:
-        """Calculate tax under New Tax Regime"""
-        tax = 0
-        for lower, upper, rate in self.tax_slabs:
-            if income > lower:
-                taxable_amount = min(income, upper) - lower
-                tax += taxable_amount * rate
-
-        # Rebate under Section 87A
-        if income <= 700000:
-            tax = 0
-
-        # Add 4% cess
-        tax *= 1.04
-
-        return tax
+        """Calculate tax under New Tax Regime (87A rebate and 4% cess included)"""
+        return compute_tax(income, self.tax_table)
 
     def generate_training_data(self, base_salary: float, years: int = 10, growth_rate: float = 0.08) -> Tuple[List, List]:
         """Generate synthetic training data with salary growth"""
@@ -0,0 +1,266 @@
+"""
+Batch Pipeline Runner
+=====================
+Runs preprocessing → tax engine → recommendations as a small DAG of
+stages with declared inputs and outputs.
+
+A stage is skipped when the content hash of its input files, its code and
+its parameters matches the previous run and its outputs still exist.
+Per-stage timings are printed for every run.
+
+Intermediates are CSV by default; --format parquet writes typed, columnar
+files instead and --compare-csv reports the I/O time and size difference.
+
+To run: python src/pipeline.py [--force] [--stage NAME ...] [--format parquet]
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASETS_DIR = os.path.join(BASE_DIR, "datasets")
+STATE_PATH = os.path.join(DATASETS_DIR, ".pipeline_state.json")
+
+# Allow `python src/pipeline.py` as well as `import src.pipeline`
+sys.path.insert(0, BASE_DIR)
+
+from src import dataset_io, schema
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class Stage:
+    """One pipeline step: func(*inputs, *outputs, **params, **options)"""
+    name: str
+    func: Callable
+    inputs: List[str]
+    outputs: List[str]
+    params: Dict[str, Any] = field(default_factory=dict)
+    # Passed to func but not fingerprinted: settings that cannot change the
+    # outputs, such as worker counts and memory budgets
+    options: Dict[str, Any] = field(default_factory=dict)
+    # Extra source files whose changes should invalidate this stage
+    code_deps: List[str] = field(default_factory=list)
+
+    def code_files(self) -> List[str]:
+        return [inspect.getsourcefile(self.func)] + list(self.code_deps)
+
+
+class Pipeline:
+    """Content-hash cached runner over a list of stages"""
+
+    def __init__(self, stages: List[Stage], state_path: str = STATE_PATH):
+        self.stages = self._topological_order(stages)
+        self.state_path = state_path
+        self.state = self._load_state()
+
+    @staticmethod
+    def _topological_order(stages: List[Stage]) -> List[Stage]:
+        producers = {path: stage.name for stage in stages for path in stage.outputs}
+        by_name = {stage.name: stage for stage in stages}
+        ordered, visiting, done = [], set(), set()
+
+        def visit(stage: Stage):
+            if stage.name in done:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage '{stage.name}'")
+            visiting.add(stage.name)
+            for path in stage.inputs:
+                if path in producers:
+                    visit(by_name[producers[path]])
+            visiting.discard(stage.name)
+            done.add(stage.name)
+            ordered.append(stage)
+
+        for stage in stages:
+            visit(stage)
+        return ordered
+
+    # ------------------------------------------------------------------
+    # State & hashing
+    # ------------------------------------------------------------------
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"stages": {}, "files": {}}
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def file_digest(self, path: str) -> str:
+        """
+        SHA-256 of a file's content. Digests are remembered against the
+        file's size and mtime, so unchanged multi-GB inputs are not reread.
+        """
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.state["files"].get(path)
+        if cached and cached["signature"] == signature:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+
+        self.state["files"][path] = {"signature": signature, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def fingerprint(self, stage: Stage) -> str:
+        digest = hashlib.sha256()
+        digest.update(stage.name.encode())
+        for path in stage.code_files():
+            digest.update(self.file_digest(path).encode())
+        digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+        for path in stage.inputs:
+            digest.update(path.encode())
+            digest.update(self.file_digest(path).encode())
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    def run(self, force: bool = False, only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Run (or skip) every stage in dependency order and report timings"""
+        report = {}
+        pipeline_start = time.perf_counter()
+
+        for stage in self.stages:
+            if only and stage.name not in only:
+                continue
+
+            missing = [path for path in stage.inputs if not os.path.exists(path)]
+            if missing:
+                raise SystemExit(f"❌ Stage '{stage.name}' is missing inputs: {', '.join(missing)}")
+
+            start = time.perf_counter()
+            fingerprint = self.fingerprint(stage)
+            previous = self.state["stages"].get(stage.name, {})
+            up_to_date = (
+                not force
+                and previous.get("fingerprint") == fingerprint
+                and all(os.path.exists(path) for path in stage.outputs)
+            )
+
+            if up_to_date:
+                status = "skipped"
+            else:
+                stage.func(*stage.inputs, *stage.outputs, **stage.params, **stage.options)
+                status = "ran"
+                self.state["stages"][stage.name] = {
+                    "fingerprint": fingerprint,
+                    "completed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                self._save_state()
+
+            elapsed = time.perf_counter() - start
+            report[stage.name] = {"status": status, "seconds": elapsed}
+            print(f"⏱️  {stage.name:<16} {status:<8} {elapsed:8.2f}s")
+
+        self._save_state()
+        print(f"✅ Pipeline finished in {time.perf_counter() - pipeline_start:.2f}s")
+        return report
+
+
+def build_default_pipeline(datasets_dir: str = DATASETS_DIR, streaming: bool = False,
+                           max_memory_mb: float = None, fmt: str = dataset_io.DEFAULT_FORMAT,
+                           workers: int = 1) -> Pipeline:
+    """
+    preprocessing → tax engine → recommendations over datasets/, with the
+    intermediates written as CSV or Parquet (fmt)
+    """
+    from src import data_preprocessing, recommendation_engine, tax_engine, tax_rules
+
+    def path(name: str) -> str:
+        return os.path.join(datasets_dir, name)
+
+    preprocessed = dataset_io.intermediate_path(datasets_dir, "final_preprocessed_dataset", fmt)
+    tax_results = dataset_io.intermediate_path(datasets_dir, "final_tax_results", fmt)
+    recommendations = dataset_io.intermediate_path(datasets_dir, "tax_recommendations", fmt)
+
+    # Random fills are drawn per fixed partition of rows, so the output is
+    # the same in memory, streamed under any budget and on any worker count
+    preprocessing_options = {"streaming": streaming, "workers": workers}
+    if max_memory_mb is not None:
+        preprocessing_options["max_memory_mb"] = max_memory_mb
+    # Every stage reads and writes through dataset_io, which applies the schema dtypes
+    io_deps = [inspect.getsourcefile(dataset_io), inspect.getsourcefile(schema)]
+
+    stages = [
+        Stage(
+            name="preprocessing",
+            func=data_preprocessing.run_preprocessing,
+            inputs=[
+                path("synthetic_tax_user_dataset.csv"),
+                path("spending_habits.csv"),
+                path("House_Rent_Dataset.csv"),
+            ],
+            outputs=[preprocessed],
+            options=preprocessing_options,
+            code_deps=io_deps,
+        ),
+        Stage(
+            name="tax_engine",
+            func=tax_engine.run_tax_engine,
+            inputs=[preprocessed],
+            outputs=[tax_results],
+            code_deps=[inspect.getsourcefile(tax_rules)] + io_deps,
+        ),
+        Stage(
+            name="recommendations",
+            func=recommendation_engine.run_recommendations,
+            inputs=[tax_results],
+            outputs=[recommendations],
+            code_deps=io_deps,
+        ),
+    ]
+    return Pipeline(stages, state_path=os.path.join(datasets_dir, ".pipeline_state.json"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Tax Saver AI batch pipeline")
+    parser.add_argument("--force", action="store_true", help="rerun every stage even if up to date")
+    parser.add_argument("--stage", action="append", dest="stages", help="run only the named stage(s)")
+    parser.add_argument("--datasets-dir", default=DATASETS_DIR, help="directory holding the CSV datasets")
+    parser.add_argument("--streaming", action="store_true", help="preprocess the user table in bounded chunks")
+    parser.add_argument("--max-memory-mb", type=float, default=None, help="per-chunk memory budget for --streaming")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="preprocess chunks on a process pool (implies --streaming; output is identical for any count)")
+    parser.add_argument("--format", choices=dataset_io.FORMATS, default=dataset_io.DEFAULT_FORMAT,
+                        help="file format for the intermediate datasets")
+    parser.add_argument("--compare-csv", action="store_true",
+                        help="after the run, compare Parquet intermediates with a CSV round trip")
+    parser.add_argument("--incremental", action="store_true",
+                        help="process only new or changed users (by User_ID) and merge them into the outputs")
+    args = parser.parse_args()
+
+    if args.incremental:
+        from src.incremental import run_incremental
+
+        run_incremental(args.datasets_dir, fmt=args.format, full=args.force)
+        dataset_io.print_io_summary(compare_csv=args.compare_csv)
+        return
+
+    pipeline = build_default_pipeline(args.datasets_dir, streaming=args.streaming,
+                                      max_memory_mb=args.max_memory_mb, fmt=args.format,
+                                      workers=args.workers)
+    pipeline.run(force=args.force, only=args.stages)
+    dataset_io.print_io_summary(compare_csv=args.compare_csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,21 @@ import numpy as np
 from typing import List, Dict, Tuple, Optional
 import google.generativeai as genai
 
+from src.tax_rules import DEFAULT_TAX_TABLE, tax_before_cess, solve_gross_for_net
+
+# Take-home (inverse) questions name a target net pay, e.g. "I want 12 lakh
+# in hand" or "how much CTC for a take-home of 1 lakh a month". Stating a
+# salary and asking for its in-hand pay is an ordinary tax calculation.
+TAKE_HOME_TERMS = r"(?:take[- ]home|in[- ]hand|net (?:salary|pay|income))"
+TAKE_HOME_TARGET_PATTERNS = [
+    rf"\b(?:need|want|wish|target|require|desire|aim|expect)\w*\b[^.?!]*\b{TAKE_HOME_TERMS}",
+    rf"\b(?:ctc|gross|package)\b[^.?!]*\b(?:for|gives?|to get|to take|to have)\b[^.?!]*\b{TAKE_HOME_TERMS}",
+    rf"\bhow much (?:salary|pay)\b[^.?!]*\b(?:for|to get|to take|to have)\b[^.?!]*\b{TAKE_HOME_TERMS}",
+]
+SALARY_STATEMENTS = ["my salary is", "salary is", "i earn", "i make", "income is", "my ctc is"]
+# Amounts quoted per month ("1 lakh in hand per month", "80k monthly", "50000 pm")
+MONTHLY_PATTERN = r"\b(?:per|a|every|each|/)\s*month\b|\bmonthly\b|\bp\.?m\b\.?"
+
 # Comprehensive Tax Knowledge Base for Indian Taxation
 TAX_KNOWLEDGE_BASE = [
     {
@@ -168,15 +183,8 @@ class EnhancedRAGTaxAdvisor:
         self.conversation_history = []
         self.user_context = {}  # Store user's financial info during conversation
 
-        # Tax slabs (New Regime)
-        self.tax_slabs = [
-            (0, 300000, 0.0),
-            (300000, 600000, 0.05),
-            (600000, 900000, 0.10),
-            (900000, 1200000, 0.15),
-            (1200000, 1500000, 0.20),
-            (1500000, float("inf"), 0.30),
-        ]
+        # Compiled New Regime tax table (slabs, 87A rebate, cess, standard deduction)
+        self.tax_table = DEFAULT_TAX_TABLE
 
         # Initialize Gemini
         if self.api_key:
@@ -247,26 +255,15 @@ class EnhancedRAGTaxAdvisor:
     def calculate_tax(self, gross_income: float) -> Dict:
         """Calculate tax under New Tax Regime"""
         # Standard deduction
-        standard_deduction = 50000
+        standard_deduction = self.tax_table.standard_deduction
         taxable_income = max(0, gross_income - standard_deduction)
 
-        # Calculate tax
-        tax = 0
-        for lower, upper, rate in self.tax_slabs:
-            if taxable_income > lower:
-                taxable_amount = min(taxable_income, upper) - lower
-                tax += taxable_amount * rate
-
-        # Section 87A rebate
-        if taxable_income <= 700000:
-            tax = 0
-            rebate_applied = True
-        else:
-            rebate_applied = False
+        # Slab tax with Section 87A rebate
+        slab_tax = tax_before_cess(taxable_income, self.tax_table)
+        rebate_applied = taxable_income <= self.tax_table.rebate_87a_limit
 
         # Add 4% cess
-        tax_before_cess = tax
-        tax *= 1.04
+        tax = slab_tax * (1.0 + self.tax_table.cess_rate)
 
         effective_rate = (tax / gross_income * 100) if gross_income > 0 else 0
 
@@ -274,14 +271,38 @@ class EnhancedRAGTaxAdvisor:
             "gross_income": gross_income,
             "standard_deduction": standard_deduction,
             "taxable_income": taxable_income,
-            "tax_before_cess": tax_before_cess,
-            "cess": tax - tax_before_cess,
+            "tax_before_cess": slab_tax,
+            "cess": tax - slab_tax,
             "total_tax": tax,
             "effective_rate": effective_rate,
             "rebate_applied": rebate_applied,
             "net_income": gross_income - tax
         }
 
+    def calculate_gross_for_net(self, target_net_income: float) -> Dict:
+        """Find the gross salary needed for a target annual take-home"""
+        gross_income = float(solve_gross_for_net(target_net_income, self.tax_table))
+        tax_result = self.calculate_tax(gross_income)
+
+        return {
+            "target_net_income": target_net_income,
+            "required_gross_income": gross_income,
+            "tax_result": tax_result
+        }
+
+    def detect_take_home_intent(self, query: str) -> bool:
+        """Detect if user wants the salary needed for a target take-home"""
+        query_lower = query.lower()
+        has_amount = bool(re.search(r'\d+', query))
+        if not has_amount or any(statement in query_lower for statement in SALARY_STATEMENTS):
+            # "My salary is 15 lakh, what is my in-hand?" asks for tax on a known salary
+            return False
+        return any(re.search(pattern, query_lower) for pattern in TAKE_HOME_TARGET_PATTERNS)
+
+    def is_monthly_amount(self, query: str) -> bool:
+        """Detect if the amount in the query is per month rather than per year"""
+        return bool(re.search(MONTHLY_PATTERN, query.lower()))
+
     def detect_tax_calculation_intent(self, query: str) -> bool:
         """Detect if user wants to calculate tax (not just ask about tax concepts)"""
         query_lower = query.lower()
@@ -342,6 +363,40 @@ class EnhancedRAGTaxAdvisor:
 
     def generate_response(self, query: str, context_docs: List[Dict]) -> str:
         """Generate response using Gemini LLM or fallback"""
+        # Check if user wants the gross salary for a target take-home (only
+        # target phrasing; other in-hand questions are tax calculations below)
+        if self.detect_take_home_intent(query):
+            target_net = self.extract_salary_from_query(query)
+
+            if target_net:
+                # The solver works on annual amounts; monthly targets are scaled up
+                monthly = self.is_monthly_amount(query)
+                result = self.calculate_gross_for_net(target_net * 12 if monthly else target_net)
+                tax_result = result['tax_result']
+                gross = result['required_gross_income']
+                self.user_context['last_salary'] = gross
+                self.user_context['last_tax_result'] = tax_result
+
+                if monthly:
+                    heading = f"Salary Needed for Take-Home of Rs.{target_net:,.0f} per month (Rs.{target_net * 12:,.0f} a year)"
+                    amounts = f"""- Required Gross Salary (CTC): **Rs.{gross / 12:,.0f} per month** (Rs.{gross:,.0f} a year)
+- Taxable Income: Rs.{tax_result['taxable_income']:,.0f} a year
+- Total Tax Payable: Rs.{tax_result['total_tax'] / 12:,.0f} per month (Rs.{tax_result['total_tax']:,.0f} a year)
+- Net Take-Home: Rs.{tax_result['net_income'] / 12:,.0f} per month (Rs.{tax_result['net_income']:,.0f} a year)"""
+                else:
+                    heading = f"Salary Needed for Take-Home of Rs.{target_net:,.0f}"
+                    amounts = f"""- Required Gross Salary (CTC): **Rs.{gross:,.0f}**
+- Taxable Income: Rs.{tax_result['taxable_income']:,.0f}
+- Total Tax Payable: Rs.{tax_result['total_tax']:,.0f}
+- Net Take-Home: Rs.{tax_result['net_income']:,.0f}"""
+
+                return f"""**{heading}**
+
+{amounts}
+
+{"**Section 87A Rebate Applied! Your tax is ZERO.**" if tax_result['rebate_applied'] else f"Effective Tax Rate: {tax_result['effective_rate']:.2f}%"}
+"""
+
         # Check if this is a tax calculation request
         if self.detect_tax_calculation_intent(query):
             salary = self.extract_salary_from_query(query)
@@ -443,7 +498,7 @@ Example: "My salary is 12 lakhs" or "I earn 15 lakh annually" """
             "answer": response,
             "sources": relevant_docs,
             "llm_used": self.llm_available,
-            "calculation_performed": self.detect_tax_calculation_intent(query),
+            "calculation_performed": self.detect_tax_calculation_intent(query) or self.detect_take_home_intent(query),
             "user_context": self.user_context
         }
 
@@ -482,7 +537,37 @@ if __name__ == "__main__":
         "I earn 8 lakh per year, how much tax do I pay?",
         "How to claim HRA exemption?",
         "Calculate tax for income of 15 lakh",
+        "My salary is 15 lakh, what is my in-hand salary?",
+        "I want a take-home of 12 lakh, how much CTC do I need?",
+        "How much CTC for 1 lakh in hand per month?",
+    ]
+
+    # Intent check: (query, take-home target?, tax calculation?)
+    intent_cases = [
+        ("My salary is 15 lakh, what is my in-hand salary?", False, True),
+        ("I earn 20 lakh, what will be my net pay?", False, True),
+        ("I want a take-home of 12 lakh, how much CTC do I need?", True, False),
+        ("How much CTC for 1 lakh in hand per month?", True, False),
+        ("I need 10 lakh net salary", True, False),
+        ("What is take-home pay?", False, False),
+    ]
+    for query, take_home, calculation in intent_cases:
+        got = (advisor.detect_take_home_intent(query), advisor.detect_tax_calculation_intent(query))
+        assert got == (take_home, calculation), f"Intent mismatch for {query!r}: {got}"
+    print(f"Intent detection checks passed ({len(intent_cases)} queries)")
+
+    # Take-home targets: (query, annual net the solved CTC must leave)
+    take_home_cases = [
+        ("I want a take-home of 12 lakh, how much CTC do I need?", 1_200_000),
+        ("How much CTC for 1 lakh in hand per month?", 1_200_000),
+        ("I need Rs. 80,000 monthly take-home", 960_000),
     ]
+    for query, annual_net in take_home_cases:
+        target = advisor.extract_salary_from_query(query)
+        target = target * 12 if advisor.is_monthly_amount(query) else target
+        net = advisor.calculate_gross_for_net(target)["tax_result"]["net_income"]
+        assert abs(net - annual_net) < 1, f"Take-home mismatch for {query!r}: net {net:,.0f}"
+    print(f"Take-home target checks passed ({len(take_home_cases)} queries)")
 
     print("\n" + "="*70)
     print("TESTING ENHANCED RAG TAX ADVISOR")
@@ -1,23 +1,39 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 
 # Get project root directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATASETS_DIR = os.path.join(BASE_DIR, "datasets")
+TAX_RESULTS_PATH = os.path.join(DATASETS_DIR, "final_tax_results.csv")
+OUTPUT_PATH = os.path.join(DATASETS_DIR, "tax_recommendations.csv")
 
-print("🤖 Starting Recommendation Engine...")
+# Allow `python src/recommendation_engine.py` as well as package imports
+sys.path.insert(0, BASE_DIR)
 
-# ======================================================
-# Load tax results dataset
-# ======================================================
-TAX_RESULTS_PATH = os.path.join(DATASETS_DIR, "final_tax_results.csv")
+from src.dataset_io import read_frame, write_frame
+
+RECOMMENDATION_COLUMNS = [
+    "Recommendation_Investments",
+    "Recommendation_Expenses",
+    "Recommendation_Tax_Planning",
+]
 
-try:
-    df = pd.read_csv(TAX_RESULTS_PATH)
-    print("✅ Loaded tax results successfully!")
-except Exception as e:
-    raise SystemExit(f"❌ Error loading tax results: {e}")
+# Coded output: one small bitmask/enum per recommendation column plus the
+# numbers its text needs. Text is rendered from these on display/export.
+INVEST_ELSS, INVEST_NPS, INVEST_HEALTH = 1, 2, 4
+EXPENSE_HIGH_RATIO, EXPENSE_HIGH_ENTERTAINMENT, EXPENSE_HIGH_GROCERIES = 1, 2, 4
+TAX_CONTINUE, TAX_REBATE_87A, TAX_EFFECTIVE_RATE = 0, 1, 2
+CODE_COLUMNS = [
+    "Investment_Reco_Code",
+    "ELSS_Gap",
+    "NPS_Gap",
+    "Health_Insurance_Gap",
+    "Expense_Reco_Code",
+    "Tax_Reco_Code",
+    "Effective_Tax_Rate",
+]
 
 
 # ======================================================
@@ -89,18 +105,277 @@ def suggest_tax_planning(row):
 
 
 # ======================================================
-# Generate All Recommendations
+# Vectorized Rules (same rules as above, column-wise)
+# ======================================================
+INVESTMENT_DEFAULT = "Your investment portfolio looks good. Continue with current strategy."
+EXPENSE_DEFAULT = "Your spending pattern is balanced."
+ELSS_TEMPLATE = "Consider investing ₹{:.0f} more in ELSS for wealth creation."
+NPS_TEMPLATE = "Invest ₹{:.0f} in NPS for retirement planning."
+HEALTH_TEMPLATE = "Increase health insurance by ₹{:.0f} for better coverage."
+HIGH_EXPENSE_RATIO_TEXT = "Your expenses exceed 70% of your salary. Try reducing lifestyle expenses."
+HIGH_ENTERTAINMENT_TEXT = "Reduce entertainment expenses by 15–20% to save more."
+HIGH_GROCERIES_TEXT = "Your grocery expenses are high; consider budgeting strategies."
+REBATE_TEXT = "Great! You qualify for the rebate under Section 87A. No tax payable."
+EFFECTIVE_RATE_TEMPLATE = "Your effective tax rate is {:.1f}%. Focus on wealth creation through investments."
+TAX_DEFAULT = "Continue with current financial planning."
+
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    return df[name].to_numpy(dtype=float)
+
+
+def evaluate_recommendations(df: pd.DataFrame) -> dict:
+    """
+    Evaluate every recommendation rule for all rows at once.
+    Returns boolean masks and the gap/rate arrays the text needs.
+    """
+    investment_80c = _column(df, "Investment_80C")
+    nps = _column(df, "NPS_Contribution_80CCD")
+    health = _column(df, "Medical_Insurance_80D")
+    salary = _column(df, "Annual_Salary")
+    tax_amount = _column(df, "Tax_Amount")
+    taxable_income = _column(df, "Taxable_Income")
+
+    rebate = taxable_income <= 700000
+    effective_rate = np.zeros(len(df))
+    np.divide(tax_amount, salary, out=effective_rate, where=salary > 0)
+
+    return {
+        "elss": investment_80c < 150000,
+        "elss_gap": 150000 - investment_80c,
+        "nps": nps < 50000,
+        "nps_gap": 50000 - nps,
+        "health": health < 25000,
+        "health_gap": 25000 - health,
+        "high_expense_ratio": _column(df, "Expense_Ratio") > 0.7,
+        "high_entertainment": _column(df, "Entertainment") > 0.15 * salary,
+        "high_groceries": _column(df, "Groceries") > 0.25 * salary,
+        "rebate_87a": rebate,
+        "tax_payable": ~rebate & (tax_amount > 0),
+        "effective_rate": effective_rate * 100,
+    }
+
+
+def _display_round(values: np.ndarray, decimals: int) -> np.ndarray:
+    """
+    Values rounded exactly as f"{value:.{decimals}f}" prints them. Rows
+    within rounding error of a half step (and negatives) are formatted
+    individually; everything else is rounded arithmetically.
+    """
+    scaled = values * 10.0 ** decimals
+    rounded = np.floor(scaled + 0.5) / 10.0 ** decimals
+    exact = (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6) | (values < 0)
+    for i in np.flatnonzero(exact):
+        rounded[i] = float(f"{values[i]:.{decimals}f}")
+    return rounded
+
+
+def _format_where(mask: np.ndarray, values: np.ndarray, template: str, decimals: int) -> np.ndarray:
+    """template.format(value) on masked rows, formatting each printed value once"""
+    out = np.full(len(mask), "", dtype=object)
+    if mask.any():
+        uniques, inverse = np.unique(_display_round(values[mask], decimals), return_inverse=True)
+        out[mask] = np.array([template.format(v) for v in uniques], dtype=object)[inverse.ravel()]
+    return out
+
+
+def _join_sentences(parts, default: str) -> np.ndarray:
+    """
+    Space-join the sentences whose mask is set; default where none are.
+    parts are (mask, text) pairs where text is a string or a per-row array.
+    Rows are grouped by which sentences they have, so each group is joined
+    with whole-array concatenation.
+    """
+    n = len(parts[0][0])
+    pattern = np.zeros(n, dtype=np.int64)
+    for bit, (mask, _) in enumerate(parts):
+        pattern |= mask.astype(np.int64) << bit
+
+    out = np.full(n, default, dtype=object)
+    for code in np.unique(pattern):
+        if code == 0:
+            continue
+        rows = pattern == code
+        selected = [
+            text[rows] if isinstance(text, np.ndarray) else text
+            for bit, (_, text) in enumerate(parts)
+            if code >> bit & 1
+        ]
+        joined = selected[0]
+        for text in selected[1:]:
+            joined = joined + " " + text
+        out[rows] = joined
+    return out
+
+
+def render_recommendations(rules: dict) -> dict:
+    """Render the evaluated rules into the same text as the suggest_* functions"""
+    n = len(rules["elss"])
+
+    investments = _join_sentences([
+        (rules["elss"], _format_where(rules["elss"], rules["elss_gap"], ELSS_TEMPLATE, 0)),
+        (rules["nps"], _format_where(rules["nps"], rules["nps_gap"], NPS_TEMPLATE, 0)),
+        (rules["health"], _format_where(rules["health"], rules["health_gap"], HEALTH_TEMPLATE, 0)),
+    ], INVESTMENT_DEFAULT)
+
+    expenses = _join_sentences([
+        (rules["high_expense_ratio"], HIGH_EXPENSE_RATIO_TEXT),
+        (rules["high_entertainment"], HIGH_ENTERTAINMENT_TEXT),
+        (rules["high_groceries"], HIGH_GROCERIES_TEXT),
+    ], EXPENSE_DEFAULT)
+
+    tax_planning = np.full(n, TAX_DEFAULT, dtype=object)
+    tax_planning[rules["rebate_87a"]] = REBATE_TEXT
+    payable = rules["tax_payable"]
+    tax_planning[payable] = _format_where(payable, rules["effective_rate"], EFFECTIVE_RATE_TEMPLATE, 1)[payable]
+
+    return dict(zip(RECOMMENDATION_COLUMNS, [investments, expenses, tax_planning]))
+
+
+# ======================================================
+# Coded Recommendations (stored) ⇄ Rules (rendered)
 # ======================================================
-df["Recommendation_Investments"] = df.apply(suggest_investments, axis=1)
-df["Recommendation_Expenses"] = df.apply(suggest_expenses, axis=1)
-df["Recommendation_Tax_Planning"] = df.apply(suggest_tax_planning, axis=1)
+def encode_recommendations(rules: dict) -> dict:
+    """
+    Evaluated rules → compact code/parameter columns (see CODE_COLUMNS).
+    Amounts and rates are stored at the precision the text prints them
+    with, so rendering from the codes gives the same text.
+    """
+    def bits(*flags):
+        code = np.zeros(len(rules["elss"]), dtype=np.uint8)
+        for bit, mask in flags:
+            code[mask] |= bit
+        return code
+
+    def printed(mask, values, decimals, dtype):
+        out = np.zeros(len(mask), dtype=dtype)
+        out[mask] = _display_round(values[mask], decimals)
+        return out
+
+    tax_code = np.full(len(rules["elss"]), TAX_CONTINUE, dtype=np.uint8)
+    tax_code[rules["rebate_87a"]] = TAX_REBATE_87A
+    tax_code[rules["tax_payable"]] = TAX_EFFECTIVE_RATE
+
+    return {
+        "Investment_Reco_Code": bits(
+            (INVEST_ELSS, rules["elss"]), (INVEST_NPS, rules["nps"]), (INVEST_HEALTH, rules["health"])
+        ),
+        "ELSS_Gap": printed(rules["elss"], rules["elss_gap"], 0, np.int32),
+        "NPS_Gap": printed(rules["nps"], rules["nps_gap"], 0, np.int32),
+        "Health_Insurance_Gap": printed(rules["health"], rules["health_gap"], 0, np.int32),
+        "Expense_Reco_Code": bits(
+            (EXPENSE_HIGH_RATIO, rules["high_expense_ratio"]),
+            (EXPENSE_HIGH_ENTERTAINMENT, rules["high_entertainment"]),
+            (EXPENSE_HIGH_GROCERIES, rules["high_groceries"]),
+        ),
+        "Tax_Reco_Code": tax_code,
+        "Effective_Tax_Rate": printed(rules["tax_payable"], rules["effective_rate"], 1, np.float64),
+    }
+
+
+def decode_recommendations(coded) -> dict:
+    """Code/parameter columns (a frame, or a dict of arrays) → rules for render_recommendations"""
+    def column(name, dtype=float):
+        return np.asarray(coded[name], dtype=dtype)
+
+    invest = column("Investment_Reco_Code", np.int64)
+    expense = column("Expense_Reco_Code", np.int64)
+    tax = column("Tax_Reco_Code", np.int64)
+    return {
+        "elss": (invest & INVEST_ELSS) > 0,
+        "elss_gap": column("ELSS_Gap"),
+        "nps": (invest & INVEST_NPS) > 0,
+        "nps_gap": column("NPS_Gap"),
+        "health": (invest & INVEST_HEALTH) > 0,
+        "health_gap": column("Health_Insurance_Gap"),
+        "high_expense_ratio": (expense & EXPENSE_HIGH_RATIO) > 0,
+        "high_entertainment": (expense & EXPENSE_HIGH_ENTERTAINMENT) > 0,
+        "high_groceries": (expense & EXPENSE_HIGH_GROCERIES) > 0,
+        "rebate_87a": tax == TAX_REBATE_87A,
+        "tax_payable": tax == TAX_EFFECTIVE_RATE,
+        "effective_rate": column("Effective_Tax_Rate"),
+    }
+
+
+def render_recommendation_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of a coded frame with the three text columns rendered in place of the codes"""
+    text = render_recommendations(decode_recommendations(df))
+    rendered = df.drop(columns=[c for c in CODE_COLUMNS if c in df.columns])
+    for name, values in text.items():
+        rendered[name] = values
+    return rendered
+
+
+def render_user_recommendations(record) -> dict:
+    """Text for one user's coded row (a dict or Series), e.g. for display in the UI"""
+    single = {name: [record[name]] for name in CODE_COLUMNS}
+    text = render_recommendations(decode_recommendations(single))
+    return {name: values[0] for name, values in text.items()}
 
 
 # ======================================================
-# Save Recommendations
+# Generate All Recommendations
 # ======================================================
-OUTPUT_PATH = os.path.join(DATASETS_DIR, "tax_recommendations.csv")
-df.to_csv(OUTPUT_PATH, index=False)
+def add_recommendations(df: pd.DataFrame, render_text: bool = False) -> pd.DataFrame:
+    """
+    Add coded recommendations (CODE_COLUMNS); with render_text=True add the
+    three text columns instead.
+    """
+    rules = evaluate_recommendations(df)
+    columns = render_recommendations(rules) if render_text else encode_recommendations(rules)
+    for name, values in columns.items():
+        df[name] = values
+    return df
+
+
+def run_recommendations(input_path: str = TAX_RESULTS_PATH, output_path: str = OUTPUT_PATH,
+                        render_text: bool = False) -> pd.DataFrame:
+    print("🤖 Starting Recommendation Engine...")
+
+    # ======================================================
+    # Load tax results dataset
+    # ======================================================
+    try:
+        df = read_frame(input_path)
+        print("✅ Loaded tax results successfully!")
+    except Exception as e:
+        raise SystemExit(f"❌ Error loading tax results: {e}")
+
+    df = add_recommendations(df, render_text=render_text)
+
+    # ======================================================
+    # Save Recommendations
+    # ======================================================
+    write_frame(df, output_path)
+
+    print(f"✅ Recommendations generated successfully! Saved at: {output_path}")
+    print("🤖 Recommendation Engine Complete!")
+    return df
+
+
+def export_recommendation_text(input_path: str = OUTPUT_PATH, output_path: str = None) -> pd.DataFrame:
+    """Render a coded recommendations file to text columns (for sharing/export)"""
+    if output_path is None:
+        stem, ext = os.path.splitext(input_path)
+        output_path = f"{stem}_text{ext}"
+
+    df = render_recommendation_text(read_frame(input_path))
+    write_frame(df, output_path)
+    print(f"✅ Recommendation text exported to: {output_path}")
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate Tax Saver AI recommendations")
+    parser.add_argument("--render-text", action="store_true",
+                        help="store rendered sentences instead of compact codes")
+    parser.add_argument("--export-text", action="store_true",
+                        help="render an existing coded recommendations file to *_text")
+    args = parser.parse_args()
 
-print(f"✅ Recommendations generated successfully! Saved at: {OUTPUT_PATH}")
-print("🤖 Recommendation Engine Complete!")
+    if args.export_text:
+        export_recommendation_text()
+    else:
+        run_recommendations(render_text=args.render_text)
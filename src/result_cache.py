@@ -0,0 +1,115 @@
+"""
+Result Cache for Interactive Scoring
+====================================
+A size-bounded LRU cache with a time-to-live, used in front of
+itr_risk_engine.compute_risk_for_dict and
+EnhancedITRRiskAnalyzer.analyze so that resubmitting the same inputs
+skips the forest and the SHAP explanation.
+
+Keys are the canonicalized inputs (field names sorted, amounts rounded
+to the rupee) plus the model version, so a retrained model never serves
+stale results. The cached function is called with the canonical inputs,
+so a hit returns exactly what a fresh call with the same key would.
+Callers get a deep copy, so mutating a result cannot corrupt the cache.
+
+Sizes and TTLs default to TAX_SAVER_RISK_CACHE_SIZE (entries; 0
+disables caching) and TAX_SAVER_RISK_CACHE_TTL (seconds).
+"""
+
+import copy
+import math
+import numbers
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("TAX_SAVER_RISK_CACHE_SIZE", "4096"))
+DEFAULT_TTL_SECONDS = float(os.getenv("TAX_SAVER_RISK_CACHE_TTL", "900"))
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        number = float(value)
+        if math.isnan(number):
+            # One shared NaN object, so keys holding it still compare equal
+            return math.nan
+        return int(round(number)) if math.isfinite(number) else number
+    return value if value is None else str(value)
+
+
+def canonical_inputs(data: Mapping) -> Dict[str, Any]:
+    """Inputs with amounts rounded to the rupee and names sorted"""
+    return {str(name): _canonical_value(data[name]) for name in sorted(data, key=str)}
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(found, value); expired entries count as misses and are dropped"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, data: Mapping, compute: Callable[[Dict[str, Any]], Any], version: Hashable = None) -> Any:
+        """compute(canonical inputs), cached under (version, canonical inputs)"""
+        inputs = canonical_inputs(data)
+        key = (version, tuple(inputs.items()))
+        found, value = self.get(key)
+        if not found:
+            value = compute(dict(inputs))
+            self.put(key, value)
+        return copy.deepcopy(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -0,0 +1,150 @@
+"""
+ITR Risk Feature Store
+======================
+One definition of the features the ITR risk model is trained and served
+on, shared by train_itr_risk_model, itr_risk_engine, score_filings and
+the SHAP analyzer.
+
+build_features (one filing) and build_features_frame (any number, all
+vectorized) compute everything once:
+  - the rule features of src/itr_rules.py (totals, ratios, 80D limit)
+  - the model matrix: a model's feature columns as float32, the dtype
+    the trees use, with missing and NaN amounts read as 0. Filings that
+    do not carry Total_Deductions or Taxable_Income get them derived the
+    way the training data was built.
+
+Artifacts store the feature schema next to the model (make_artifact),
+and load_artifact checks it, so a model is never fed a vector it was
+not trained on.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.itr_rules import derive_features, derive_features_frame
+from src.tax_rules import NEW_REGIME_RULES, TaxRuleSet
+
+# Columns the risk forest is trained on, in matrix order
+MODEL_FEATURES = (
+    "Annual_Salary",
+    "Total_Deductions",
+    "Taxable_Income",
+    "Rent_Paid",
+    "Investment_80C",
+    "Medical_Insurance_80D",
+    "NPS_Contribution_80CCD",
+    "Home_Loan_Interest_24b",
+    "Donations_80G",
+    "Groceries",
+    "Utilities",
+    "Entertainment",
+    "Healthcare",
+)
+FEATURE_SCHEMA_VERSION = 1
+MATRIX_DTYPE = np.float32
+
+# Taxable_Income in the training data is salary - (deductions + ₹50K), floored at 0
+TRAINING_STANDARD_DEDUCTION = 50000
+
+
+class FeatureSchemaError(ValueError):
+    """A model artifact whose features the feature store cannot supply"""
+
+
+@dataclass(frozen=True, eq=False)
+class RiskFeatures:
+    """Features of one filing (floats, 1-row matrix) or of a frame (arrays)"""
+    rule: Dict[str, Any]  # itr_rules.derive_features(_frame) output
+    matrix: np.ndarray  # (rows, len(names)) model input
+    names: Tuple[str, ...]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.matrix[:, self.names.index(name)]
+
+
+# ======================================================
+# FEATURES
+# ======================================================
+def _taxable_income(income, total_deductions):
+    return np.maximum(0.0, income - (total_deductions + TRAINING_STANDARD_DEDUCTION))
+
+
+def _derived_model_value(name: str, rule: Mapping):
+    """Model columns that can be rebuilt from the rule features, else None"""
+    if name == "Total_Deductions":
+        return rule["total_deductions"]
+    if name == "Taxable_Income":
+        return _taxable_income(rule["income"], rule["total_deductions"])
+    return None
+
+
+def build_features(row: Mapping, names: Sequence[str] = MODEL_FEATURES,
+                   tax_rules: TaxRuleSet = NEW_REGIME_RULES) -> RiskFeatures:
+    """Rule features and the 1-row model matrix for one filing (dict or Series)"""
+    rule = derive_features(row, tax_rules)
+    values = []
+    for name in names:
+        value = row.get(name) if name in row else _derived_model_value(name, rule)
+        values.append(0.0 if value is None or pd.isna(value) else float(value or 0.0))
+    matrix = np.array(values, dtype=MATRIX_DTYPE).reshape(1, -1)
+    return RiskFeatures(rule=rule, matrix=matrix, names=tuple(names))
+
+
+def build_features_frame(df: pd.DataFrame, names: Sequence[str] = MODEL_FEATURES,
+                         tax_rules: TaxRuleSet = NEW_REGIME_RULES) -> RiskFeatures:
+    """build_features for every row of df, with one rule-feature array per name"""
+    rule = derive_features_frame(df, tax_rules)
+    matrix = np.empty((len(df), len(names)), dtype=MATRIX_DTYPE)
+    for i, name in enumerate(names):
+        if name in df.columns:
+            column = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+        else:
+            column = _derived_model_value(name, rule)
+        matrix[:, i] = 0.0 if column is None else np.nan_to_num(column, nan=0.0)
+    return RiskFeatures(rule=rule, matrix=matrix, names=tuple(names))
+
+
+# ======================================================
+# ARTIFACT SCHEMA
+# ======================================================
+def feature_schema(names: Sequence[str] = MODEL_FEATURES) -> Dict[str, Any]:
+    return {"version": FEATURE_SCHEMA_VERSION, "features": list(names), "dtype": np.dtype(MATRIX_DTYPE).name}
+
+
+def make_artifact(model, names: Sequence[str] = MODEL_FEATURES) -> Dict[str, Any]:
+    """The {"model", "features", "feature_schema"} dict saved as a risk model artifact"""
+    return {"model": model, "features": list(names), "feature_schema": feature_schema(names)}
+
+
+def validate_artifact(artifact: Any, source: str = "artifact") -> Tuple[Any, list]:
+    """(model, features) of an artifact, or FeatureSchemaError explaining the mismatch"""
+    if not isinstance(artifact, dict) or "model" not in artifact or "features" not in artifact:
+        raise FeatureSchemaError(f"{source} is not a risk model artifact (expected 'model' and 'features')")
+    model, names = artifact["model"], list(artifact["features"] or [])
+
+    schema = artifact.get("feature_schema")
+    if schema is not None:
+        if schema.get("version") != FEATURE_SCHEMA_VERSION:
+            raise FeatureSchemaError(f"{source} has feature schema v{schema.get('version')}, "
+                                     f"this code reads v{FEATURE_SCHEMA_VERSION}; retrain the model")
+        if list(schema.get("features", [])) != names:
+            raise FeatureSchemaError(f"{source} lists different features in 'features' and 'feature_schema'")
+
+    unknown = [name for name in names if name not in MODEL_FEATURES]
+    if not names or unknown:
+        raise FeatureSchemaError(f"{source} expects features the feature store does not define: {unknown or names}")
+    if len(set(names)) != len(names):
+        raise FeatureSchemaError(f"{source} lists a feature more than once: {names}")
+    n_expected = getattr(model, "n_features_in_", None)
+    if n_expected is not None and n_expected != len(names):
+        raise FeatureSchemaError(f"{source}: model takes {n_expected} features but lists {len(names)}")
+    return model, names
+
+
+def load_artifact(path: str) -> Tuple[Any, list]:
+    """Load and validate the artifact at path; returns (model, features)"""
+    return validate_artifact(joblib.load(path), source=path)
@@ -0,0 +1,142 @@
+"""
+Dataset Schema
+==============
+Compact dtypes for the frames passed between pipeline stages.
+
+Whole-rupee amounts become int32, float amounts float32, and repeated
+text (cities, recommendation strings) categorical. A column is only
+narrowed when its values fit, so a frame never loses data: an amount
+column with NaNs stays float, and a float column becomes float32 only
+when every value round-trips exactly (whole rupees up to ~1.68 crore).
+Paise, ratios and larger amounts stay float64.
+
+CSV text is written from float64 (csv_frame), so a CSV output shows the
+same numbers whether or not its frame was compacted.
+
+dataset_io applies this on every read and write; memory before and after
+is logged there.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+INT32_COLUMNS = (
+    "User_ID",
+    "Annual_Salary",
+    "Investment_80C",
+    "Medical_Insurance_80D",
+    "NPS_Contribution_80CCD",
+    "Home_Loan_Interest_24b",
+    "Donations_80G",
+    "Total_Deductions",
+    "Taxable_Income",
+)
+FLOAT32_COLUMNS = (
+    "Rent_Paid",
+    "Groceries",
+    "Utilities",
+    "Healthcare",
+    "Education",
+    "Entertainment",
+    "Total_Expenses",
+    "Savings",
+    "Expense_Ratio",
+    "Tax_Amount",
+    "Effective_Tax_Rate",
+)
+CATEGORY_COLUMNS = (
+    "City",
+    "Recommendation_Investments",
+    "Recommendation_Expenses",
+    "Recommendation_Tax_Planning",
+)
+
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+# Undeclared text columns become categorical below this unique/rows ratio
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _fits_int32(series: pd.Series) -> bool:
+    values = series.to_numpy()
+    if pd.api.types.is_integer_dtype(series):
+        return len(values) == 0 or (values.min() >= INT32_MIN and values.max() <= INT32_MAX)
+    if not pd.api.types.is_float_dtype(series) or np.isnan(values).any():
+        return False
+    return len(values) == 0 or (
+        np.array_equal(values, np.round(values))
+        and values.min() >= INT32_MIN
+        and values.max() <= INT32_MAX
+    )
+
+
+def _fits_float32(series: pd.Series) -> bool:
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return False
+    values = series.to_numpy(dtype=float)
+    finite = values[np.isfinite(values)]
+    # Exact round trip only: whole rupees up to 2**24 pass, paise and ratios do not
+    return bool(np.array_equal(finite.astype(np.float32).astype(float), finite))
+
+
+def compact_dtype(name: str, series: pd.Series) -> Optional[str]:
+    """Narrowest safe dtype for one column, or None to leave it as is"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return None
+    if name in CATEGORY_COLUMNS and _is_text(series):
+        return "category"
+    if pd.api.types.is_integer_dtype(series) and series.dtype.itemsize <= 4:
+        return None  # already compact; never widen
+    if name in INT32_COLUMNS or pd.api.types.is_integer_dtype(series):
+        if _fits_int32(series):
+            return "int32"
+    if name in INT32_COLUMNS or name in FLOAT32_COLUMNS:
+        return "float32" if _fits_float32(series) else None
+    if _is_text(series) and len(series):
+        if series.nunique(dropna=True) / len(series) <= CATEGORY_MAX_UNIQUE_RATIO:
+            return "category"
+    return None
+
+
+def compact_dtypes(df: pd.DataFrame) -> Dict[str, str]:
+    """Target dtype for every column that can be narrowed"""
+    targets = {}
+    for name in df.columns:
+        dtype = compact_dtype(name, df[name])
+        if dtype is not None and str(df[name].dtype) != dtype:
+            targets[name] = dtype
+    return targets
+
+
+def compact_frame(df: pd.DataFrame, dtypes: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Return df with compact dtypes. Pass dtypes (from compact_dtypes on an
+    earlier chunk) to give every chunk of a stream the same schema.
+    """
+    if dtypes is None:
+        dtypes = compact_dtypes(df)
+    dtypes = {name: dtype for name, dtype in dtypes.items() if name in df.columns}
+    for name, dtype in dtypes.items():
+        if dtype == "int32" and not _fits_int32(df[name]):
+            raise ValueError(f"Column '{name}' no longer fits int32 (NaN, fractional or out of range)")
+    return df.astype(dtypes) if dtypes else df
+
+
+def csv_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """df with float32 columns widened to float64, for writing as CSV text"""
+    narrow = [name for name in df.columns if df[name].dtype == np.float32]
+    return df.astype({name: np.float64 for name in narrow}) if narrow else df
+
+
+def csv_read_dtypes(columns) -> Dict[str, str]:
+    """dtype= for pd.read_csv so categorical columns are never built as objects"""
+    return {name: "category" for name in columns if name in CATEGORY_COLUMNS}
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
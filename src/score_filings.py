@@ -0,0 +1,172 @@
+"""
+Batch ITR Risk Scoring
+======================
+Scores every filing in one or more CSV / Parquet files (or directories
+of them) with itr_risk_engine.compute_risk_for_frame and writes the
+scores and flag bitmasks (see itr_risk_engine.FLAG_*) to one CSV or
+Parquet file.
+
+Inputs are streamed in chunks of --chunk-rows. With --workers > 1 the
+chunks are scored on a process pool whose workers each load the risk
+model once; at most 2 x workers chunks are in memory at a time, so
+memory stays bounded for any input size. Scored chunks are appended in
+input order as they finish, and throughput is reported at the end.
+
+To run: python src/score_filings.py datasets/filings/ --output datasets/filing_risk_scores.csv [--workers 4]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Allow `python src/score_filings.py` as well as package imports
+sys.path.insert(0, BASE_DIR)
+
+from src import itr_risk_engine
+from src.dataset_io import FrameWriter, iter_frame_chunks
+from src.itr_risk_engine import DEFAULT_CHUNK_SIZE, ENGINEERED_FEATURES, FLAG_NAMES, compute_risk_for_frame
+
+INPUT_EXTENSIONS = (".csv", ".parquet")
+# Copied from the input to the output, when present
+ID_COLUMNS = ("User_ID",)
+SCORE_COLUMNS = ("risk_score", "rule_score", "ml_score", "flags")
+HIGH_RISK_SCORE = 60
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+
+def list_inputs(paths: Iterable[str]) -> List[str]:
+    """Input files: each path, or the CSV / Parquet files of a directory"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(INPUT_EXTENSIONS)))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            raise SystemExit(f"❌ No such input: {path}")
+    if not files:
+        raise SystemExit("❌ No CSV or Parquet filings found")
+    return files
+
+
+def iter_chunks(files: List[str], chunk_rows: int) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """(file, chunk) for every chunk of every input file, in order"""
+    for path in files:
+        for chunk in iter_frame_chunks(path, chunk_rows):
+            yield path, chunk
+
+
+def _init_worker(model_path: Optional[str]):
+    """Load the risk model once per worker process"""
+    if model_path:
+        itr_risk_engine.set_model_path(model_path)
+    itr_risk_engine.get_risk_model()
+
+
+def score_chunk(chunk: pd.DataFrame, keep_columns: Tuple[str, ...] = ID_COLUMNS,
+                with_features: bool = False) -> pd.DataFrame:
+    """Scores (and optionally engineered features) for one chunk, plus its ID columns"""
+    result = compute_risk_for_frame(chunk, chunk_size=len(chunk) or 1)
+    scored = chunk[[col for col in keep_columns if col in chunk.columns]].reset_index(drop=True)
+    for name in SCORE_COLUMNS:
+        scored[name] = result[name]
+    # Same rounding as compute_risk_for_row
+    scored["ml_score"] = scored["ml_score"].round(2)
+    if with_features:
+        for name in ENGINEERED_FEATURES:
+            scored[name] = result[name]
+    return scored
+
+
+def _scored_chunks(chunks: Iterable[Tuple[str, pd.DataFrame]], workers: int, model_path: Optional[str],
+                   keep_columns: Tuple[str, ...], with_features: bool) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Yield (file, scored chunk) in input order, keeping a bounded number in flight"""
+    if workers <= 1:
+        _init_worker(model_path)
+        for path, chunk in chunks:
+            yield path, score_chunk(chunk, keep_columns, with_features)
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        for path, chunk in chunks:
+            pending.append((path, pool.submit(score_chunk, chunk, keep_columns, with_features)))
+            if len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+
+def score_filings(inputs: Iterable[str], output_path: str, workers: int = 1,
+                  chunk_rows: int = DEFAULT_CHUNK_SIZE, model_path: Optional[str] = None,
+                  keep_columns: Tuple[str, ...] = ID_COLUMNS, with_features: bool = False) -> Dict:
+    """
+    Score every filing in inputs and write the results to output_path
+    (CSV or Parquet by extension). Returns rows, seconds, rows/s and
+    counts of flagged, high-risk and per-flag rows.
+    """
+    files = list_inputs(inputs)
+    model_path = model_path or itr_risk_engine.MODEL_PATH
+    if not os.path.exists(model_path):
+        print(f"⚠️  No risk model at {model_path}; scores use the rule checks only")
+    mode = "1 process" if workers <= 1 else f"{workers} workers"
+    print(f"🚀 Scoring {len(files)} file(s) in chunks of {chunk_rows:,} rows ({mode})...")
+
+    stats = {"rows": 0, "flagged": 0, "high_risk": 0, **{name: 0 for name in FLAG_NAMES.values()}}
+    start = time.perf_counter()
+    chunks = iter_chunks(files, chunk_rows)
+    with FrameWriter(output_path, compact=False) as writer:
+        for path, scored in _scored_chunks(chunks, workers, model_path, keep_columns, with_features):
+            if len(files) > 1:
+                scored.insert(0, "Source_File", os.path.basename(path))
+            writer.append(scored)
+
+            flags = scored["flags"].to_numpy()
+            stats["rows"] += len(scored)
+            stats["flagged"] += int(np.count_nonzero(flags))
+            stats["high_risk"] += int((scored["risk_score"] >= HIGH_RISK_SCORE).sum())
+            for bit, name in FLAG_NAMES.items():
+                stats[name] += int(np.count_nonzero(flags & bit))
+            print(f"   {stats['rows']:>12,} rows scored ({stats['rows'] / (time.perf_counter() - start):,.0f} rows/s)")
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_s"] = stats["rows"] / max(stats["seconds"], 1e-9)
+    print_report(stats, output_path)
+    return stats
+
+
+def print_report(stats: Dict, output_path: str):
+    rows = max(stats["rows"], 1)
+    print(f"✅ Scores saved to: {output_path}")
+    print(f"🧾 Rows: {stats['rows']:,} in {stats['seconds']:.2f}s ({stats['rows_per_s']:,.0f} rows/s)")
+    print(f"🚩 Flagged: {stats['flagged']:,} ({stats['flagged'] / rows * 100:.1f}%)"
+          f" | risk score ≥ {HIGH_RISK_SCORE}: {stats['high_risk']:,} ({stats['high_risk'] / rows * 100:.1f}%)")
+    for name in FLAG_NAMES.values():
+        print(f"   {name:<16} {stats[name]:>12,} ({stats[name] / rows * 100:5.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Risk-score filings from CSV / Parquet files")
+    parser.add_argument("inputs", nargs="+", help="CSV or Parquet files, or directories of them")
+    parser.add_argument("--output", required=True, help="scores file (.csv or .parquet)")
+    parser.add_argument("--workers", type=int, default=1, help="score chunks on a pool of this many processes")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_SIZE, help="rows read and scored at a time")
+    parser.add_argument("--model", default=None, help="risk model artifact (default: TAX_SAVER_RISK_MODEL or models/itr_risk_rf.pkl)")
+    parser.add_argument("--keep", nargs="*", default=list(ID_COLUMNS), help="input columns copied to the output")
+    parser.add_argument("--with-features", action="store_true", help="also write the engineered ratio features")
+    args = parser.parse_args()
+
+    score_filings(args.inputs, args.output, workers=args.workers, chunk_rows=args.chunk_rows,
+                  model_path=args.model, keep_columns=tuple(args.keep), with_features=args.with_features)
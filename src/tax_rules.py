@@ -0,0 +1,399 @@
+"""
+Shared Tax Rule Engine
+======================
+Single source of truth for New Tax Regime slabs, the Section 87A rebate,
+Health & Education Cess and the standard deduction.
+
+Rule sets are versioned by financial year. Each one is compiled once (and
+kept in a bounded cache) into an immutable table of cumulative-tax
+breakpoints, so computing tax is a table lookup:
+    tax = base_tax[slab] + (income - lower[slab]) * rate[slab]
+
+Scalar entry points serve the UI and chat paths; batch entry points take
+arrays and evaluate every row in one searchsorted pass. The columnar API
+accepts NumPy arrays, pandas Series or pyarrow columns and works through
+them in fixed-size chunks.
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    PYARROW_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class TaxRuleSet:
+    """Raw rule definition for one financial year (New Regime)"""
+    financial_year: str
+    slabs: Tuple[Tuple[float, float, float], ...]  # (lower, upper, rate)
+    rebate_87a_limit: float
+    cess_rate: float
+    standard_deduction: float
+    # Section limits (deduction caps used by the optimizer and risk checks)
+    limit_80c: float = 150000
+    limit_80d_self: float = 25000
+    limit_80d_parents: float = 25000
+    limit_80d_senior: float = 50000
+    limit_80ccd_1b: float = 50000
+    limit_24b: float = 200000
+    limit_80tta: float = 10000
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledTaxTable:
+    """Precomputed lookup table built from a TaxRuleSet by compile_rules()"""
+    financial_year: str
+    lowers: Tuple[float, ...]
+    rates: Tuple[float, ...]
+    base_tax: Tuple[float, ...]  # tax owed at each slab's lower bound
+    rebate_87a_limit: float
+    cess_rate: float
+    standard_deduction: float
+    lowers_array: np.ndarray
+    rates_array: np.ndarray
+    base_tax_array: np.ndarray
+    # Inverse of take-home pay above the 87A cliff: gross salary and net
+    # pay at each breakpoint, and d(net)/d(gross) on the segment after it
+    gross_breaks_array: np.ndarray
+    net_breaks_array: np.ndarray
+    net_slopes_array: np.ndarray
+
+
+# ======================================================
+# RULE SETS
+# ======================================================
+
+_SLABS_2023 = (
+    (0, 300000, 0.0),
+    (300000, 600000, 0.05),
+    (600000, 900000, 0.10),
+    (900000, 1200000, 0.15),
+    (1200000, 1500000, 0.20),
+    (1500000, float("inf"), 0.30),
+)
+
+RULE_SETS: Dict[str, TaxRuleSet] = {
+    rules.financial_year: rules
+    for rules in (
+        # Post-Budget 2023 New Regime
+        TaxRuleSet(
+            financial_year="2023-24",
+            slabs=_SLABS_2023,
+            rebate_87a_limit=700000,
+            cess_rate=0.04,
+            standard_deduction=50000,
+        ),
+        # Tables the app has used as "FY 2024-25" throughout
+        TaxRuleSet(
+            financial_year="2024-25",
+            slabs=_SLABS_2023,
+            rebate_87a_limit=700000,
+            cess_rate=0.04,
+            standard_deduction=50000,
+        ),
+        # Budget 2025: ₹4L slab steps, 87A rebate up to ₹12L, ₹75K standard deduction
+        TaxRuleSet(
+            financial_year="2025-26",
+            slabs=(
+                (0, 400000, 0.0),
+                (400000, 800000, 0.05),
+                (800000, 1200000, 0.10),
+                (1200000, 1600000, 0.15),
+                (1600000, 2000000, 0.20),
+                (2000000, 2400000, 0.25),
+                (2400000, float("inf"), 0.30),
+            ),
+            rebate_87a_limit=1200000,
+            cess_rate=0.04,
+            standard_deduction=75000,
+        ),
+    )
+}
+
+DEFAULT_FINANCIAL_YEAR = "2024-25"
+
+# New Regime (Mandatory from FY 2025-26)
+NEW_REGIME_RULES = RULE_SETS[DEFAULT_FINANCIAL_YEAR]
+
+# Compiled tables kept in memory at once (one per financial year in use)
+TABLE_CACHE_SIZE = 8
+
+_YEAR_PATTERN = re.compile(r"^(?:(FY|AY)\s*)?(\d{4})\s*-\s*(\d{2}|\d{4})$", re.IGNORECASE)
+
+
+def normalize_financial_year(year) -> str:
+    """
+    Map 'FY 2024-25', '2024-2025' or 'AY 2025-26' to the '2024-25' key
+    used by RULE_SETS (an assessment year is the following financial year).
+    """
+    match = _YEAR_PATTERN.match(str(year).strip())
+    if not match:
+        raise ValueError(f"Unrecognised financial year: {year!r}")
+
+    prefix, start = match.group(1), int(match.group(2))
+    if prefix and prefix.upper() == "AY":
+        start -= 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+
+def get_rules(financial_year=DEFAULT_FINANCIAL_YEAR) -> TaxRuleSet:
+    """Look up the rule set for a financial year"""
+    key = normalize_financial_year(financial_year)
+    if key not in RULE_SETS:
+        raise ValueError(f"No tax rules for FY {key}; available: {', '.join(sorted(RULE_SETS))}")
+    return RULE_SETS[key]
+
+
+def _readonly(values) -> np.ndarray:
+    array = np.array(values, dtype=float)
+    array.setflags(write=False)
+    return array
+
+
+def compile_rules(rules: TaxRuleSet) -> CompiledTaxTable:
+    """Compile a rule set into cumulative-tax breakpoints"""
+    lowers = tuple(float(lower) for lower, _, _ in rules.slabs)
+    rates = tuple(float(rate) for _, _, rate in rules.slabs)
+
+    base_tax = [0.0]
+    for (lower, upper, rate) in rules.slabs[:-1]:
+        base_tax.append(base_tax[-1] + (upper - lower) * rate)
+
+    # Take-home pay (gross - tax) is piecewise linear in gross salary. Up to
+    # standard deduction + rebate limit no tax is due, so net == gross; past
+    # the cliff it is continuous and increasing, with kinks at slab bounds.
+    cess_factor = 1.0 + rules.cess_rate
+    taxable_breaks = [float(rules.rebate_87a_limit)] + [
+        lower for lower in lowers if lower > rules.rebate_87a_limit
+    ]
+    gross_breaks, net_breaks, net_slopes = [], [], []
+    for taxable in taxable_breaks:
+        slab = bisect_right(lowers, taxable) - 1
+        slab_tax = base_tax[slab] + (taxable - lowers[slab]) * rates[slab]
+        gross = taxable + rules.standard_deduction
+        gross_breaks.append(gross)
+        net_breaks.append(gross - slab_tax * cess_factor)
+        net_slopes.append(1.0 - rates[slab] * cess_factor)
+
+    return CompiledTaxTable(
+        financial_year=rules.financial_year,
+        lowers=lowers,
+        rates=rates,
+        base_tax=tuple(base_tax),
+        rebate_87a_limit=float(rules.rebate_87a_limit),
+        cess_rate=float(rules.cess_rate),
+        standard_deduction=float(rules.standard_deduction),
+        lowers_array=_readonly(lowers),
+        rates_array=_readonly(rates),
+        base_tax_array=_readonly(base_tax),
+        gross_breaks_array=_readonly(gross_breaks),
+        net_breaks_array=_readonly(net_breaks),
+        net_slopes_array=_readonly(net_slopes),
+    )
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def _compiled_table(key: str) -> CompiledTaxTable:
+    return compile_rules(get_rules(key))
+
+
+def get_tax_table(financial_year=DEFAULT_FINANCIAL_YEAR) -> CompiledTaxTable:
+    """Compiled table for a financial year, built on first use and cached"""
+    return _compiled_table(normalize_financial_year(financial_year))
+
+
+DEFAULT_TAX_TABLE = get_tax_table(DEFAULT_FINANCIAL_YEAR)
+
+
+# ======================================================
+# SCALAR ENTRY POINTS
+# ======================================================
+
+def tax_before_cess(taxable_income: float, table: CompiledTaxTable = DEFAULT_TAX_TABLE) -> float:
+    """Slab tax after the Section 87A rebate, before cess"""
+    # Written as `not >` so NaN incomes fall into the rebate branch
+    if not taxable_income > table.rebate_87a_limit:
+        return 0.0
+
+    slab = bisect_right(table.lowers, taxable_income) - 1
+    return table.base_tax[slab] + (taxable_income - table.lowers[slab]) * table.rates[slab]
+
+
+def compute_tax(taxable_income: float, table: CompiledTaxTable = DEFAULT_TAX_TABLE) -> float:
+    """Total tax payable (slab tax + cess) on a taxable income"""
+    return tax_before_cess(taxable_income, table) * (1.0 + table.cess_rate)
+
+
+def taxable_income_from_gross(gross_income: float, table: CompiledTaxTable = DEFAULT_TAX_TABLE) -> float:
+    """Apply the standard deduction to a gross salary"""
+    return max(0, gross_income - table.standard_deduction)
+
+
+# ======================================================
+# BATCH ENTRY POINTS
+# ======================================================
+
+def tax_before_cess_batch(taxable_income, table: CompiledTaxTable = DEFAULT_TAX_TABLE) -> np.ndarray:
+    """Array version of tax_before_cess (one searchsorted pass)"""
+    income = np.asarray(taxable_income, dtype=float)
+
+    slab = np.clip(np.searchsorted(table.lowers_array, income, side="right") - 1, 0, len(table.lowers) - 1)
+
+    tax = table.base_tax_array[slab] + (income - table.lowers_array[slab]) * table.rates_array[slab]
+    # Section 87A rebate; the comparison is False for NaN, so those rows are zeroed too
+    return np.where(income > table.rebate_87a_limit, tax, 0.0)
+
+
+def compute_tax_batch(taxable_income, table: CompiledTaxTable = DEFAULT_TAX_TABLE) -> np.ndarray:
+    """Array version of compute_tax: total tax (slab tax + cess) per row"""
+    tax = tax_before_cess_batch(taxable_income, table)
+    tax *= 1.0 + table.cess_rate
+    return tax
+
+
+def solve_gross_for_net(target_net, table: CompiledTaxTable = DEFAULT_TAX_TABLE) -> np.ndarray:
+    """
+    Smallest gross salary whose take-home pay (gross - tax incl. cess) is at
+    least target_net; the exact inverse of the compiled slab function.
+
+    Because of the Section 87A cliff, take-home just above standard
+    deduction + rebate limit is lower than at the limit itself, so targets
+    up to that limit are met with gross == target. Larger targets are found
+    with one searchsorted over the precomputed net-pay breakpoints.
+    """
+    target = np.asarray(target_net, dtype=float)
+
+    segment = np.clip(
+        np.searchsorted(table.net_breaks_array, target, side="right") - 1,
+        0, len(table.net_breaks_array) - 1,
+    )
+    gross = table.gross_breaks_array[segment] + (
+        (target - table.net_breaks_array[segment]) / table.net_slopes_array[segment]
+    )
+
+    tax_free_limit = table.standard_deduction + table.rebate_87a_limit
+    return np.where(target <= tax_free_limit, np.maximum(target, 0.0), gross)
+
+
+def compute_tax_by_year(taxable_income, financial_year) -> np.ndarray:
+    """
+    Total tax for a batch that mixes financial years (e.g. re-checking past
+    returns). Rows are grouped by year and each group is evaluated with one
+    vectorized pass against that year's compiled table.
+    """
+    income = np.asarray(taxable_income, dtype=float)
+    years = np.asarray(financial_year)
+
+    if years.ndim == 0:
+        return compute_tax_batch(income, get_tax_table(years.item()))
+    if years.shape != income.shape:
+        raise ValueError(f"financial_year has shape {years.shape}, taxable_income has {income.shape}")
+
+    # Group on normalized keys so 'FY 2024-25' and '2024-25' share one pass
+    labels, label_index = np.unique(years, return_inverse=True)
+    keys = sorted({normalize_financial_year(label) for label in labels})
+    label_to_key = np.array([keys.index(normalize_financial_year(label)) for label in labels])
+    group = label_to_key[label_index].reshape(income.shape)
+
+    tax = np.empty_like(income)
+    for k, key in enumerate(keys):
+        rows = group == k
+        tax[rows] = compute_tax_batch(income[rows], get_tax_table(key))
+    return tax
+
+
+# ======================================================
+# COLUMNAR BATCH API
+# ======================================================
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def _column_pieces(column) -> Iterator[np.ndarray]:
+    """Yield float64 NumPy views/copies of a column, one per storage chunk"""
+    if PYARROW_AVAILABLE and isinstance(column, pa.ChunkedArray):
+        for chunk in column.chunks:
+            yield chunk.to_numpy(zero_copy_only=False).astype(float, copy=False)
+    elif PYARROW_AVAILABLE and isinstance(column, pa.Array):
+        yield column.to_numpy(zero_copy_only=False).astype(float, copy=False)
+    elif hasattr(column, "to_numpy"):
+        # pandas Series / Index (nullable dtypes map <NA> to NaN)
+        yield column.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        yield np.asarray(column, dtype=float)
+
+
+def _fill_tax_columns(out: Dict[str, np.ndarray], start: int, income: np.ndarray,
+                      gross: Optional[np.ndarray], table: CompiledTaxTable) -> None:
+    stop = start + len(income)
+    slab_tax = tax_before_cess_batch(income, table)
+    cess = slab_tax * table.cess_rate
+    tax = slab_tax + cess
+
+    base = income if gross is None else gross
+    rate = np.zeros_like(tax)
+    np.divide(tax * 100.0, base, out=rate, where=base > 0)
+
+    out["tax"][start:stop] = tax
+    out["cess"][start:stop] = cess
+    out["rebate_applied"][start:stop] = income <= table.rebate_87a_limit
+    out["effective_rate"][start:stop] = rate
+
+
+def compute_tax_columns(taxable_income, table: CompiledTaxTable = DEFAULT_TAX_TABLE,
+                        gross_income=None, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[str, np.ndarray]:
+    """
+    Columnar tax for a whole column of taxable incomes.
+
+    Accepts a NumPy array, pandas Series or pyarrow Array/ChunkedArray and
+    returns NumPy columns: tax (incl. cess), cess, rebate_applied (bool) and
+    effective_rate (% of gross_income when given, else of taxable income).
+    Rows are processed chunk_rows at a time, so temporaries stay bounded.
+    """
+    pieces = list(_column_pieces(taxable_income))
+    n = sum(len(piece) for piece in pieces)
+    gross = None if gross_income is None else np.concatenate(list(_column_pieces(gross_income)))
+    if gross is not None and len(gross) != n:
+        raise ValueError(f"gross_income has {len(gross)} rows, taxable_income has {n}")
+
+    out = {
+        "tax": np.empty(n, dtype=float),
+        "cess": np.empty(n, dtype=float),
+        "rebate_applied": np.empty(n, dtype=bool),
+        "effective_rate": np.empty(n, dtype=float),
+    }
+
+    offset = 0
+    for piece in pieces:
+        for start in range(0, len(piece), chunk_rows):
+            income = piece[start:start + chunk_rows]
+            row = offset + start
+            _fill_tax_columns(out, row, income,
+                              None if gross is None else gross[row:row + len(income)], table)
+        offset += len(piece)
+
+    return out
+
+
+def iter_tax_columns(chunks: Iterable, table: CompiledTaxTable = DEFAULT_TAX_TABLE,
+                     chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Streaming form of compute_tax_columns for inputs larger than RAM.
+
+    `chunks` yields taxable-income columns, e.g. the Taxable_Income column
+    of each frame from pd.read_csv(..., chunksize=n) or of each pyarrow
+    RecordBatch from ParquetFile.iter_batches(). One result dict is yielded
+    per input chunk, so memory is bounded by the chunk size.
+    """
+    for chunk in chunks:
+        yield compute_tax_columns(chunk, table, chunk_rows=chunk_rows)
@@ -1,8 +1,18 @@
+import argparse
+import io
+import itertools
 import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import train_test_split
 from sklearn.utils import shuffle
+from sklearn.utils.class_weight import compute_class_weight
 import joblib
 
 # Get project root directory
@@ -10,13 +20,39 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATASETS_DIR = os.path.join(BASE_DIR, "datasets")
 MODEL_DIR = os.path.join(BASE_DIR, "models")
 
-DATA_PATH = os.path.join(DATASETS_DIR, "final_preprocessed_dataset.csv")
 MODEL_PATH = os.path.join(MODEL_DIR, "itr_risk_rf.pkl")
+SEARCH_REPORT_PATH = os.path.join(MODEL_DIR, "itr_risk_search_report.csv")
 
-# Legal/typical limits (change when law changes)
-LIMIT_80C = 150000
-LIMIT_80D = 25000
-LIMIT_NPS = 50000
+# Default forest (the original configuration) and the search grid
+DEFAULT_N_ESTIMATORS = 300
+SEARCH_N_ESTIMATORS = [100, 300]
+SEARCH_MAX_DEPTH = [12, 20, None]
+SEARCH_MAX_SAMPLES = [0.3, None]
+LATENCY_CALLS = 200
+
+# Incremental refresh: trees added per labelled batch, the forest's tree
+# budget (oldest trees retire past it) and versioned artifacts kept
+DEFAULT_REFRESH_TREES = 50
+DEFAULT_MAX_TREES = DEFAULT_N_ESTIMATORS
+VERSIONS_KEPT = 5
+LABEL_COL = "label"
+RANDOM_STATE = 42
+
+# Allow `python src/train_itr_risk_model.py` as well as package imports
+sys.path.insert(0, BASE_DIR)
+
+from src.tax_rules import NEW_REGIME_RULES
+from src.dataset_io import DEFAULT_FORMAT, intermediate_path, read_frame, resolve_intermediate, write_frame
+from src.forest_inference import export_flat
+from src.risk_features import MODEL_FEATURES, build_features_frame, make_artifact, validate_artifact
+
+# Model columns, defined once in src/risk_features.py
+FEATURE_COLS = list(MODEL_FEATURES)
+
+# Legal/typical limits (versioned per financial year in src/tax_rules.py)
+LIMIT_80C = NEW_REGIME_RULES.limit_80c
+LIMIT_80D = NEW_REGIME_RULES.limit_80d_self
+LIMIT_NPS = NEW_REGIME_RULES.limit_80ccd_1b
 
 
 def load_base_data():
@@ -24,26 +60,14 @@ def load_base_data():
     Load the cleaned dataset and keep only the numeric columns
     needed for risk modelling.
     """
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"{DATA_PATH} not found. Run data_preprocessing.py first.")
-
-    df = pd.read_csv(DATA_PATH)
-
-    required_cols = [
-        "Annual_Salary",
-        "Total_Deductions",
-        "Taxable_Income",
-        "Rent_Paid",
-        "Investment_80C",
-        "Medical_Insurance_80D",
-        "NPS_Contribution_80CCD",
-        "Home_Loan_Interest_24b",
-        "Donations_80G",
-        "Groceries",
-        "Utilities",
-        "Entertainment",
-        "Healthcare",
-    ]
+    data_path = resolve_intermediate(DATASETS_DIR, "final_preprocessed_dataset")
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"{data_path} not found. Run data_preprocessing.py first.")
+
+    required_cols = FEATURE_COLS
+    # Parquet intermediates load only these columns
+    df = read_frame(data_path, columns=required_cols)
+
     for c in required_cols:
         if c not in df.columns:
             df[c] = 0
@@ -59,54 +83,56 @@ def generate_synthetic_anomalies(base_df: pd.DataFrame, frac: float = 0.4) -> pd
       - Extreme donations vs income
       - Very high rent vs salary
       - Overall deductions too high
+    Each anomaly type is applied column-wise to its rows with masked
+    assignments, all drawn from one seeded Generator.
     """
     n = len(base_df)
     n_anom = max(1, int(frac * n))
     rng = np.random.default_rng(42)
 
     sample = base_df.sample(n_anom, random_state=42).copy()
+    anomaly_type = rng.integers(0, 4, n_anom)  # 0,1,2,3
 
-    for idx in sample.index:
-        row = sample.loc[idx]
-        anomaly_type = rng.integers(0, 4)  # 0,1,2,3
-
-        # Ensure a reasonable base income
-        base_income = max(row["Annual_Salary"], 200000)
-
-        # 1) Over-claim 80C
-        if anomaly_type == 0:
-            row["Investment_80C"] = LIMIT_80C * rng.uniform(1.3, 2.0)
-            row["Total_Deductions"] = row["Total_Deductions"] + (row["Investment_80C"] - LIMIT_80C)
+    # Ensure a reasonable base income
+    salary = sample["Annual_Salary"].to_numpy(dtype=float)
+    base_income = np.maximum(salary, 200000)
+    deductions = sample["Total_Deductions"].to_numpy(dtype=float, copy=True)
 
-        # 2) Extreme donations vs income
-        elif anomaly_type == 1:
-            row["Donations_80G"] = base_income * rng.uniform(0.4, 0.8)
-            row["Total_Deductions"] = row["Total_Deductions"] + row["Donations_80G"]
+    # 1) Over-claim 80C
+    mask = anomaly_type == 0
+    investment_80c = LIMIT_80C * rng.uniform(1.3, 2.0, mask.sum())
+    sample.loc[mask, "Investment_80C"] = investment_80c
+    deductions[mask] += investment_80c - LIMIT_80C
 
-        # 3) Very high rent vs salary
-        elif anomaly_type == 2:
-            row["Rent_Paid"] = base_income * rng.uniform(0.7, 1.2)
+    # 2) Extreme donations vs income
+    mask = anomaly_type == 1
+    donations = base_income[mask] * rng.uniform(0.4, 0.8, mask.sum())
+    sample.loc[mask, "Donations_80G"] = donations
+    deductions[mask] += donations
 
-        # 4) Overall deductions too high
-        elif anomaly_type == 3:
-            row["Total_Deductions"] = base_income * rng.uniform(0.8, 1.2)
+    # 3) Very high rent vs salary
+    mask = anomaly_type == 2
+    sample.loc[mask, "Rent_Paid"] = base_income[mask] * rng.uniform(0.7, 1.2, mask.sum())
 
-        # Recompute taxable income approx
-        row["Taxable_Income"] = max(
-            0.0, row["Annual_Salary"] - (row["Total_Deductions"] + 50000.0)
-        )
+    # 4) Overall deductions too high
+    mask = anomaly_type == 3
+    deductions[mask] = base_income[mask] * rng.uniform(0.8, 1.2, mask.sum())
 
-        sample.loc[idx] = row
+    # Recompute taxable income approx
+    sample["Total_Deductions"] = deductions
+    sample["Taxable_Income"] = np.maximum(0.0, salary - (deductions + 50000.0))
 
     sample["label"] = 1  # risky/anomalous
     return sample
 
 
-def build_training_data():
+def build_training_data(save_training_data: bool = False):
     """
     Build labelled training data:
       - base data labelled 0 (normal)
       - synthetic anomalies labelled 1 (risky)
+    The full table is written for inspection only when save_training_data
+    is set. X is float32, the dtype the trees use internally.
     """
     base = load_base_data()
     base = base.copy()
@@ -117,48 +143,288 @@ def build_training_data():
     training_df = pd.concat([base, anomalies], ignore_index=True)
     training_df = shuffle(training_df, random_state=42).reset_index(drop=True)
 
-    # Save for inspection
-    out_path = os.path.join(DATASETS_DIR, "itr_risk_training_data.csv")
-    training_df.to_csv(out_path, index=False)
-    print(f"📝 Training data saved to {out_path}")
-
-    feature_cols = [
-        "Annual_Salary",
-        "Total_Deductions",
-        "Taxable_Income",
-        "Rent_Paid",
-        "Investment_80C",
-        "Medical_Insurance_80D",
-        "NPS_Contribution_80CCD",
-        "Home_Loan_Interest_24b",
-        "Donations_80G",
-        "Groceries",
-        "Utilities",
-        "Entertainment",
-        "Healthcare",
-    ]
-    X = training_df[feature_cols].values
-    y = training_df["label"].values
+    if save_training_data:
+        out_path = intermediate_path(DATASETS_DIR, "itr_risk_training_data", DEFAULT_FORMAT)
+        write_frame(training_df, out_path)
+        print(f"📝 Training data saved to {out_path}")
+
+    feature_cols = list(FEATURE_COLS)
+    # The same matrix builder that serves the model
+    X = build_features_frame(training_df, feature_cols).matrix
+    y = training_df["label"].to_numpy(dtype=np.int64)
 
     return X, y, feature_cols
 
 
-def train_and_save_model():
-    X, y, feature_cols = build_training_data()
-    print("📊 Training shape:", X.shape, "labels:", np.bincount(y))
-
-    model = RandomForestClassifier(
-        n_estimators=300,
-        max_depth=None,
-        random_state=42,
+def make_model(n_estimators: int = DEFAULT_N_ESTIMATORS, max_depth=None, max_samples=None,
+               n_jobs: int = -1) -> RandomForestClassifier:
+    """
+    The risk forest. max_depth and max_samples bound tree size and the
+    per-tree bootstrap, and so the memory of fitting and of the artifact.
+    """
+    return RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        max_samples=max_samples,
+        n_jobs=n_jobs,
+        random_state=RANDOM_STATE,
         class_weight="balanced",
     )
+
+
+def train_and_save_model(n_estimators: int = DEFAULT_N_ESTIMATORS, max_depth=None, max_samples=None,
+                         n_jobs: int = -1, save_training_data: bool = False, model_path: str = MODEL_PATH):
+    X, y, feature_cols = build_training_data(save_training_data)
+    print("📊 Training shape:", X.shape, "labels:", np.bincount(y))
+
+    model = make_model(n_estimators, max_depth, max_samples, n_jobs)
+    start = time.perf_counter()
     model.fit(X, y)
+    print(f"⏱️  Fit in {time.perf_counter() - start:.1f}s on n_jobs={n_jobs}")
+
+    # Serving scores one filing at a time, where a thread pool only adds overhead
+    model.set_params(n_jobs=None)
+
+    history = [_history_entry("train", rows=len(X), trees_added=len(model.estimators_))]
+    version_path = save_artifact({**make_artifact(model, feature_cols), "history": history}, model_path)
+    print("✅ Risk model saved to:", model_path, f"({os.path.basename(version_path)})")
+
+    # Flat arrays for memory-mapped, shared loading by the serving processes
+    flat_dir = export_flat(model, model_path, feature_cols)
+    print(f"✅ Flat forest exported to: {flat_dir}")
+    return model
+
+
+# ======================================================
+# Versioned artifacts and incremental refresh
+# ======================================================
+def versions_dir_for(model_path: str) -> str:
+    """models/itr_risk_rf.pkl -> models/itr_risk_rf_versions/"""
+    return os.path.splitext(model_path)[0] + "_versions"
+
+
+def _saved_versions(directory: str) -> list:
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    return sorted(int(name[1:-4]) for name in names if name.startswith("v") and name.endswith(".pkl"))
+
+
+def _history_entry(action: str, **details) -> dict:
+    return {"action": action, "at": datetime.now(timezone.utc).isoformat(timespec="seconds"), **details}
+
+
+def save_artifact(artifact: dict, model_path: str = MODEL_PATH) -> str:
+    """
+    Save artifact as the next version (<model>_versions/vNNNN.pkl), then
+    swap a copy in as model_path with os.replace: readers see the old or
+    the new model, never a partial file. Keeps the last VERSIONS_KEPT
+    versions and returns the versioned path.
+    """
+    directory = versions_dir_for(model_path)
+    os.makedirs(directory, exist_ok=True)
+    versions = _saved_versions(directory)
+    version = (versions[-1] if versions else 0) + 1
+    version_path = os.path.join(directory, f"v{version:04d}.pkl")
+
+    joblib.dump({**artifact, "version": version}, version_path + ".tmp")
+    os.replace(version_path + ".tmp", version_path)
+    shutil.copyfile(version_path, model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+
+    for old in (versions + [version])[:-VERSIONS_KEPT]:
+        os.remove(os.path.join(directory, f"v{old:04d}.pkl"))
+    return version_path
+
+
+def load_labelled_batch(batch_path: str, feature_cols: list):
+    """X (the model's features, from the feature store) and y of newly labelled returns"""
+    df = read_frame(batch_path)
+    if LABEL_COL not in df.columns:
+        raise SystemExit(f"❌ {batch_path} has no '{LABEL_COL}' column (1 = risky, 0 = normal)")
+    X = build_features_frame(df, feature_cols).matrix
+    y = df[LABEL_COL].to_numpy(dtype=np.int64)
+    return X, y
+
+
+def refresh_model(batch_path: str, n_new_trees: int = DEFAULT_REFRESH_TREES, max_trees: int = DEFAULT_MAX_TREES,
+                  n_jobs: int = -1, model_path: str = MODEL_PATH):
+    """
+    Add n_new_trees trees fitted on the labelled batch only (warm_start)
+    to the saved forest, retire the oldest trees past max_trees, and save
+    the result as a new artifact version. Cost grows with the batch, not
+    with the data the forest was trained on before.
+    """
+    try:
+        artifact = joblib.load(model_path)
+        model, feature_cols = validate_artifact(artifact, model_path)
+    except Exception as e:
+        raise SystemExit(f"❌ No trained forest at {model_path} ({e}). Run train_itr_risk_model.py first.")
+    if not isinstance(model, RandomForestClassifier):
+        raise SystemExit(f"❌ {model_path} holds a {type(model).__name__}; only a RandomForestClassifier can be refreshed")
+
+    X, y = load_labelled_batch(batch_path, feature_cols)
+    if not np.array_equal(np.unique(y), model.classes_):
+        raise SystemExit(f"❌ The batch must contain every label the forest predicts {model.classes_.tolist()}, "
+                         f"got {np.unique(y).tolist()}")
+
+    n_before = len(model.estimators_)
+    version = artifact.get("version", 0)
+    class_weight = model.class_weight
+    # warm_start keeps the fitted trees and fits only the new ones; a fresh
+    # seed per version keeps new trees distinct from retired ones
+    model.set_params(warm_start=True, n_estimators=n_before + n_new_trees, n_jobs=n_jobs,
+                     random_state=RANDOM_STATE + version + 1)
+    if class_weight in ("balanced", "balanced_subsample"):
+        # New trees are balanced on the batch's own label mix, given explicitly
+        # (sklearn does not apply the presets across warm-start fits)
+        weights = compute_class_weight("balanced", classes=model.classes_, y=y)
+        model.set_params(class_weight=dict(zip(model.classes_.tolist(), weights)))
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_s = time.perf_counter() - start
+
+    retired = max(0, len(model.estimators_) - max_trees)
+    if retired:
+        model.estimators_ = model.estimators_[retired:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_), n_jobs=None, class_weight=class_weight)
+    print(f"🌲 {n_before} trees + {n_new_trees} fitted on {len(X):,} new rows in {fit_s:.1f}s"
+          f" - {retired} oldest retired = {len(model.estimators_)} trees")
+
+    history = artifact.get("history", []) + [_history_entry(
+        "refresh", rows=len(X), batch=os.path.basename(batch_path), trees_added=n_new_trees, trees_retired=retired)]
+    version_path = save_artifact({**make_artifact(model, feature_cols), "parent_version": version,
+                                  "history": history}, model_path)
+    print(f"✅ Risk model v{version} -> {os.path.basename(version_path)} saved to: {model_path}")
+
+    flat_dir = export_flat(model, model_path, feature_cols)
+    print(f"✅ Flat forest exported to: {flat_dir}")
+    return model
+
+
+# ======================================================
+# Configuration search (measured cost vs accuracy)
+# ======================================================
+def model_size_mb(model) -> float:
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell() / 1e6
+
+
+def single_row_latency_ms(model, X: np.ndarray, calls: int = LATENCY_CALLS) -> float:
+    """Median predict_proba latency for one row, as the API scores a filing"""
+    model.set_params(n_jobs=None)
+    timings = []
+    for i in range(calls):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def evaluate_configuration(X_train, y_train, X_test, y_test, n_estimators, max_depth, max_samples,
+                           n_jobs: int = -1) -> dict:
+    model = make_model(n_estimators, max_depth, max_samples, n_jobs)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proba = model.predict_proba(X_test)[:, 1]
+    batch_s = time.perf_counter() - start
+
+    return {
+        "n_estimators": n_estimators,
+        "max_depth": max_depth if max_depth is not None else "none",
+        "max_samples": max_samples if max_samples is not None else 1.0,
+        "fit_s": round(fit_s, 2),
+        "size_mb": round(model_size_mb(model), 2),
+        "latency_ms": round(single_row_latency_ms(model, X_test), 3),
+        "batch_rows_per_s": round(len(X_test) / batch_s),
+        "accuracy": round(accuracy_score(y_test, proba >= 0.5), 4),
+        "roc_auc": round(roc_auc_score(y_test, proba), 4),
+    }
+
+
+def search_configurations(n_estimators_grid=SEARCH_N_ESTIMATORS, max_depth_grid=SEARCH_MAX_DEPTH,
+                          max_samples_grid=SEARCH_MAX_SAMPLES, n_jobs: int = -1, workers: int = -1,
+                          report_path: str = SEARCH_REPORT_PATH) -> pd.DataFrame:
+    """
+    Fit every (trees, depth, max_samples) setting on a stratified 80/20
+    split and report fit time, artifact size, single-row latency, batch
+    throughput and hold-out accuracy/AUC.
+
+    Settings run in parallel on a pool of workers processes (-1 = all
+    cores), each fitting on one core, so fit_s is every setting's
+    single-core cost. With workers=1 they run one after another, each fit
+    using n_jobs cores, which keeps the latencies free of contention.
+    """
+    X, y, _ = build_training_data()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    grid = list(itertools.product(n_estimators_grid, max_depth_grid, max_samples_grid))
+    mode = f"{joblib.effective_n_jobs(n_jobs)} cores per fit" if workers == 1 else f"{joblib.effective_n_jobs(workers)} workers, 1 core per fit"
+    print(f"🔎 Searching {len(grid)} configurations on {len(X_train):,} training rows ({mode})")
+
+    start = time.perf_counter()
+    fit_n_jobs = n_jobs if workers == 1 else 1
+    # The training arrays are memory-mapped into the workers, not copied per setting
+    rows = joblib.Parallel(n_jobs=workers)(
+        joblib.delayed(evaluate_configuration)(X_train, y_train, X_test, y_test, n_estimators, max_depth,
+                                               max_samples, fit_n_jobs)
+        for n_estimators, max_depth, max_samples in grid
+    )
+    for result in rows:
+        print(f"   trees={result['n_estimators']:<4} depth={str(result['max_depth']):<5} "
+              f"max_samples={result['max_samples']:<4} fit={result['fit_s']:7.2f}s "
+              f"size={result['size_mb']:8.2f}MB latency={result['latency_ms']:6.2f}ms "
+              f"acc={result['accuracy']:.4f} auc={result['roc_auc']:.4f}")
+    print(f"⏱️  Search took {time.perf_counter() - start:.1f}s")
+
+    report = pd.DataFrame(rows)
+    if report_path:
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        report.to_csv(report_path, index=False)
+        print(f"📝 Search report saved to {report_path}")
+    return report
+
+
+def _max_depth(value: str):
+    return None if value.lower() == "none" else int(value)
+
 
-    os.makedirs(MODEL_DIR, exist_ok=True)
-    joblib.dump({"model": model, "features": feature_cols}, MODEL_PATH)
-    print("✅ Risk model saved to:", MODEL_PATH)
+def _max_samples(value: str):
+    value = float(value)
+    return None if value >= 1.0 else value
 
 
 if __name__ == "__main__":
-    train_and_save_model()
+    parser = argparse.ArgumentParser(description="Train the ITR risk Random Forest")
+    parser.add_argument("--n-estimators", type=int, default=DEFAULT_N_ESTIMATORS)
+    parser.add_argument("--max-depth", type=_max_depth, default=None, help="tree depth limit ('none' = unbounded)")
+    parser.add_argument("--max-samples", type=_max_samples, default=None,
+                        help="bootstrap fraction per tree (1.0 = all rows)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores used for fitting (-1 = all)")
+    parser.add_argument("--save-training-data", action="store_true",
+                        help="also write itr_risk_training_data for inspection")
+    parser.add_argument("--search", action="store_true",
+                        help="benchmark a grid of configurations in parallel instead of training the final model")
+    parser.add_argument("--search-trees", type=int, nargs="+", default=SEARCH_N_ESTIMATORS)
+    parser.add_argument("--search-depth", type=_max_depth, nargs="+", default=SEARCH_MAX_DEPTH)
+    parser.add_argument("--search-max-samples", type=_max_samples, nargs="+", default=SEARCH_MAX_SAMPLES)
+    parser.add_argument("--search-workers", type=int, default=-1,
+                        help="settings fitted in parallel, one core each (-1 = all cores; 1 = one at a time on --n-jobs cores)")
+    parser.add_argument("--refresh", metavar="BATCH",
+                        help="add trees fitted on a newly labelled CSV/Parquet batch instead of retraining")
+    parser.add_argument("--refresh-trees", type=int, default=DEFAULT_REFRESH_TREES, help="trees added per refresh")
+    parser.add_argument("--max-trees", type=int, default=DEFAULT_MAX_TREES,
+                        help="tree budget; the oldest trees retire past it")
+    parser.add_argument("--model", default=MODEL_PATH, help="risk model artifact to write (or refresh)")
+    args = parser.parse_args()
+
+    if args.refresh:
+        refresh_model(args.refresh, args.refresh_trees, args.max_trees, n_jobs=args.n_jobs, model_path=args.model)
+    elif args.search:
+        search_configurations(args.search_trees, args.search_depth, args.search_max_samples, n_jobs=args.n_jobs,
+                              workers=args.search_workers)
+    else:
+        train_and_save_model(args.n_estimators, args.max_depth, args.max_samples, n_jobs=args.n_jobs,
+                             save_training_data=args.save_training_data, model_path=args.model)